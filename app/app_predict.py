@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from src.predict import predict_churn
+from src.oof import load_ensemble_config, ensemble_weights
 
 def run_predict():
     st.title("🔮 KeepTune AI : 이탈 방어 시뮬레이터")
@@ -78,8 +79,8 @@ def run_predict():
             with st.spinner('하이브리드 엔진이 엔터프라이즈급 전략을 수립 중입니다...'):
                 p_xgb, p_resnet, _ = predict_churn(input_data)
                 
-                # 데이터 숙련도에 따른 가중치 최적화
-                w_xgb, w_resnet = (0.7, 0.3) if txn_cnt >= 5 else (0.3, 0.7)
+                # 데이터 숙련도에 따른 가중치 (scripts/tune_ensemble.py로 OOF 예측에서 조정, 없으면 0.7/0.3)
+                w_xgb, w_resnet = ensemble_weights(load_ensemble_config(), txn_cnt)
                 final_score = (p_xgb * w_xgb) + (p_resnet * w_resnet)
                 
                 st.session_state.result_data = {
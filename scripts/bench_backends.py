@@ -0,0 +1,144 @@
+"""
+bench_backends.py - XGBoost vs LightGBM 학습/추론 비교 (같은 X, 같은 8:2 분할, 각 백엔드 기본 파라미터).
+
+측정 항목
+  - 학습 시간: 학습/검증 행렬 생성 + 최종 학습 (early stopping 포함)
+  - 최대 메모리: 학습 중 프로세스 RSS 최대 증가량 (/proc/self/statm을 주기적으로 읽음, Linux 전용)
+  - 추론 지연: 검증 전체 배치 predict_proba / 1행 predict_proba의 p50, p99
+  - 검증 AP
+
+사용법:
+    python scripts/bench_backends.py
+    python scripts/bench_backends.py --native-categorical --single-rows 500
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from sklearn.metrics import average_precision_score
+from sklearn.model_selection import train_test_split
+
+from src.backends import BACKENDS, get_backend
+from src.feature_cache import load_preprocessed
+
+
+class PeakRSS:
+    """with 블록 동안 RSS를 interval초마다 읽어 시작 시점 대비 최대 증가량(MB)을 기록합니다."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak_mb = float("nan")
+
+    @staticmethod
+    def _rss_mb():
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+    def _poll(self):
+        while not self._stop.is_set():
+            self._peak = max(self._peak, self._rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if not os.path.exists("/proc/self/statm"):
+            return self
+        self._start = self._peak = self._rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._poll, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if hasattr(self, "_thread"):
+            self._stop.set()
+            self._thread.join()
+            self.peak_mb = max(self._peak, self._rss_mb()) - self._start
+
+
+def bench(backend, X_tr, y_tr, X_va, y_va, enable_categorical, n_jobs, single_rows):
+    backend = get_backend(backend)
+    scale_pos_weight = (y_tr == 0).sum() / (y_tr == 1).sum()
+    params = {**backend.default_params(), **backend.base_params(scale_pos_weight, enable_categorical),
+              'n_jobs': n_jobs}
+
+    with PeakRSS() as mem:
+        start = time.perf_counter()
+        dtrain, dvalid = backend.build(X_tr, y_tr, X_va, y_va, enable_categorical)
+        model = backend.fit_final(params, dtrain, dvalid, X_tr, y_tr, X_va, y_va)
+        train_sec = time.perf_counter() - start
+    del dtrain, dvalid
+
+    start = time.perf_counter()
+    proba = model.predict_proba(X_va)[:, 1]
+    batch_ms = (time.perf_counter() - start) * 1000
+
+    # 1행 추론: 스트림릿 단일 예측과 같은 (1, n_features) float32 입력 (native 모드는 범주 코드)
+    X_rows = X_va.iloc[:single_rows].copy()
+    for col in X_rows.select_dtypes(include="category").columns:
+        X_rows[col] = X_rows[col].cat.codes.replace(-1, np.nan)
+    X_rows = X_rows.to_numpy(dtype=np.float32)
+    model.predict_proba(X_rows[:1])  # 워밍업
+    latency = []
+    for i in range(len(X_rows)):
+        start = time.perf_counter()
+        model.predict_proba(X_rows[i:i + 1])
+        latency.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "backend": backend.name,
+        "train_sec": train_sec,
+        "peak_mb": mem.peak_mb,
+        "batch_ms": batch_ms,
+        "row_p50_ms": float(np.percentile(latency, 50)),
+        "row_p99_ms": float(np.percentile(latency, 99)),
+        "ap": average_precision_score(y_va, proba),
+        "n_trees": _n_trees(model),
+    }
+
+
+def _n_trees(model):
+    if hasattr(model, "get_booster"):
+        return model.best_iteration + 1
+    return model.best_iteration_ or model.n_estimators
+
+
+def main():
+    parser = argparse.ArgumentParser(description="XGBoost vs LightGBM 학습 시간/메모리/추론 지연/AP 비교")
+    parser.add_argument("--data", default=str(ROOT_DIR / "data" / "kkbox_v3.parquet"))
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--native-categorical", action="store_true", help="범주형 컬럼을 category로 유지")
+    parser.add_argument("--n-jobs", type=int, default=os.cpu_count() or 1, help="학습/추론 스레드 수")
+    parser.add_argument("--single-rows", type=int, default=200, help="1행 추론 지연 측정 횟수")
+    args = parser.parse_args()
+
+    enable_categorical = args.native_categorical
+    X, y = load_preprocessed(args.data, encode_categoricals=not enable_categorical)
+    X_tr, X_va, y_tr, y_va = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    print(f"학습 {X_tr.shape} / 검증 {X_va.shape} / 스레드 {args.n_jobs}")
+
+    results = []
+    for name in args.backends:
+        print(f"\n[{name}] 학습 및 측정 중...")
+        results.append(bench(name, X_tr, y_tr, X_va, y_va, enable_categorical, args.n_jobs, args.single_rows))
+
+    print("\n" + "=" * 96)
+    print(f"{'백엔드':<10}{'트리':>6}{'학습(초)':>10}{'최대 메모리(MB)':>16}{'배치 추론(ms)':>14}"
+          f"{'1행 p50(ms)':>13}{'1행 p99(ms)':>13}{'AP':>9}")
+    for r in results:
+        print(f"{r['backend']:<10}{r['n_trees']:>6}{r['train_sec']:>10.2f}{r['peak_mb']:>16.1f}{r['batch_ms']:>14.1f}"
+              f"{r['row_p50_ms']:>13.3f}{r['row_p99_ms']:>13.3f}{r['ap']:>9.4f}")
+    print("=" * 96)
+    print(f"(검증 {len(X_va):,}행 배치 추론, 1행 추론 {args.single_rows}회)")
+
+
+if __name__ == "__main__":
+    main()
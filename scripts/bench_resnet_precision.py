@@ -0,0 +1,134 @@
+"""
+bench_resnet_precision.py - ChurnResNet 학습/추론 모드별 처리량과 AP 비교 (fp32 / bf16 / compile / bf16+compile).
+
+측정 항목 (모드마다 같은 시드의 새 모델)
+  - 학습 처리량: train_dl_model과 같은 학습 step(samples/sec, 워밍업 step 이후)
+  - 추론 처리량: 검증 전체를 predict_dl_proba로 배치 추론 (samples/sec, 워밍업 1회 이후)
+  - 해당 모드로 --epochs 에폭 학습한 모델의 Val AP와, 같은 모델의 fp32 eager 추론 대비 AP 검증 (check_ap_parity)
+
+bf16은 CPU의 AVX512-BF16/AMX 지원 여부를 함께 출력합니다. (지원하지 않으면 fp32보다 느릴 수 있음)
+compile 모드는 컴파일 시간(에폭 마지막의 짧은 배치에서 생기는 재컴파일 포함)을 빼기 위해 한 에폭 이상 워밍업합니다.
+
+사용법:
+    python scripts/bench_resnet_precision.py
+    python scripts/bench_resnet_precision.py --modes fp32 bf16 --epochs 5 --batch-size 2048
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import torch
+import torch.nn as nn
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from src.dl_model import ChurnResNet, autocast, bf16_supported, compile_model, get_device
+from src.dl_preprocessing import prepare_dl_data
+from src.dl_train import check_ap_parity, predict_dl_proba, train_dl_model
+from src.feature_cache import load_preprocessed
+
+MODES = {
+    "fp32":         dict(bf16=False, use_compile=False),
+    "bf16":         dict(bf16=True,  use_compile=False),
+    "compile":      dict(bf16=False, use_compile=True),
+    "bf16+compile": dict(bf16=True,  use_compile=True),
+}
+
+
+def train_throughput(model, loader, device, bf16, use_compile, steps, warmup_steps, lr):
+    """train_dl_model과 같은 학습 step의 처리량 (samples/sec, 워밍업 step 제외)"""
+    forward = compile_model(model, use_compile)
+    if use_compile:
+        warmup_steps = max(warmup_steps, len(loader) + 1)
+    criterion = nn.BCELoss()
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    model.train()
+    step, n_rows, start = 0, 0, None
+    while True:  # steps가 한 에폭보다 많으면 다음 에폭으로 이어서
+        for X_batch, y_batch in loader:
+            if step == warmup_steps:
+                start = time.perf_counter()
+            X_batch, y_batch = X_batch.to(device), y_batch.to(device)
+            optimizer.zero_grad()
+            with autocast(device, bf16):
+                outputs = forward(X_batch)
+            loss = criterion(outputs.float(), y_batch)
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(model.parameters(), max_norm=1.0)
+            optimizer.step()
+            step += 1
+            if start is not None:
+                n_rows += len(X_batch)
+            if step >= warmup_steps + steps:
+                return n_rows / (time.perf_counter() - start)
+
+
+def score_throughput(model, X_val, device, bf16, use_compile, batch_size, repeats):
+    """검증 전체 배치 추론 처리량 (samples/sec, 워밍업 1회 제외)"""
+    forward = compile_model(model, use_compile)
+    predict_dl_proba(forward, X_val, batch_size, device, bf16)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        predict_dl_proba(forward, X_val, batch_size, device, bf16)
+    return repeats * len(X_val) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ChurnResNet fp32 / bf16 / torch.compile 학습·추론 처리량과 AP 비교")
+    parser.add_argument("--data", default=str(ROOT_DIR / "data" / "kkbox_v3.parquet"))
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--epochs", type=int, default=3, help="모드별 AP 비교용 학습 에폭 수")
+    parser.add_argument("--steps", type=int, default=50, help="학습 처리량 측정 step 수")
+    parser.add_argument("--warmup-steps", type=int, default=3, help="학습 처리량 측정 전 워밍업 step 수")
+    parser.add_argument("--batch-size", type=int, default=1024, help="학습 배치 크기")
+    parser.add_argument("--score-batch-size", type=int, default=8192, help="추론 배치 크기")
+    parser.add_argument("--repeats", type=int, default=5, help="추론 처리량 측정 반복 횟수")
+    parser.add_argument("--hidden-dim", type=int, default=256)
+    parser.add_argument("--num-blocks", type=int, default=5)
+    parser.add_argument("--lr", type=float, default=0.01121)
+    args = parser.parse_args()
+
+    device = get_device()
+    print(f"장치: {device} (CPU 명령어: {torch.backends.cpu.get_cpu_capability()}, "
+          f"bf16 하드웨어 지원: {bf16_supported(device)}, torch 스레드 {torch.get_num_threads()}개)")
+
+    X, y = load_preprocessed(args.data)
+    train_loader, val_loader, _, input_dim = prepare_dl_data(X, y, args.batch_size, use_weighted_sampler=False,
+                                                             pin_memory=device.type == "cuda")
+    X_val = val_loader.X.numpy()
+
+    def new_model():
+        torch.manual_seed(42)
+        return ChurnResNet(input_dim=input_dim, hidden_dim=args.hidden_dim, num_blocks=args.num_blocks).to(device)
+
+    rows = []
+    for name in args.modes:
+        mode = MODES[name]
+        print(f"\n[{name}] 측정 중...")
+        train_sps = train_throughput(new_model(), train_loader, device, mode["bf16"], mode["use_compile"],
+                                     args.steps, args.warmup_steps, args.lr)
+        model = new_model()
+        val_ap, _ = train_dl_model(model, train_loader, val_loader, epochs=args.epochs, lr=args.lr, device=device,
+                                   verbose=False, eval_every=args.epochs, **mode)
+        parity = check_ap_parity(model, val_loader, device, **mode)
+        score_sps = score_throughput(model, X_val, device, mode["bf16"], mode["use_compile"],
+                                     args.score_batch_size, args.repeats)
+        rows.append((name, train_sps, score_sps, val_ap, parity))
+
+    base = dict((r[0], r) for r in rows).get("fp32")
+    print("\n" + "=" * 100)
+    print(f"{'모드':<14}{'학습(samples/s)':>17}{'추론(samples/s)':>17}{'학습 배속':>10}{'추론 배속':>10}"
+          f"{'Val AP':>9}{'fp32 추론 AP':>14}{'확률 최대 차이':>15}  AP 검증")
+    for name, train_sps, score_sps, val_ap, parity in rows:
+        speedup = (f"{train_sps / base[1]:>9.2f}x{score_sps / base[2]:>9.2f}x" if base else f"{'-':>10}{'-':>10}")
+        print(f"{name:<14}{train_sps:>17,.0f}{score_sps:>17,.0f}{speedup}{val_ap:>9.4f}{parity['ap_fp32']:>14.4f}"
+              f"{parity['max_abs_diff']:>15.2e}  {'통과' if parity['ok'] else '실패'}")
+    print("=" * 100)
+    print("Val AP: 해당 모드로 학습·검증한 best AP / fp32 추론 AP: 같은 모델을 fp32 eager로 추론한 AP")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+bench_tree_predictor.py - 저장된 XGBoost 모델과 NumPy 트리 예측기(src/tree_predictor.py)의 일치 여부/지연 비교.
+
+측정 항목
+  - 확률 최대 오차 (검증 전체 배치, 1행 단위)
+  - 1행 predict_proba 지연 p50, p99 (스트림릿 단일 예측과 같은 (1, n_features) float32 입력)
+  - 작은 배치 predict_proba 지연
+
+사용법:
+    python scripts/bench_tree_predictor.py
+    python scripts/bench_tree_predictor.py --single-rows 1000 --batch-rows 64
+"""
+import argparse
+import pickle
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from src.backends import model_path
+from src.feature_cache import load_preprocessed
+from src.tree_predictor import compile_xgboost
+
+
+def _latency_ms(predict, rows, batch_rows):
+    predict(rows[:batch_rows])  # 워밍업
+    latency = []
+    for i in range(0, len(rows) - batch_rows + 1, batch_rows):
+        start = time.perf_counter()
+        predict(rows[i:i + batch_rows])
+        latency.append((time.perf_counter() - start) * 1000)
+    return float(np.percentile(latency, 50)), float(np.percentile(latency, 99))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="XGBoost predict_proba vs NumPy 트리 예측기 일치/지연 비교")
+    parser.add_argument("--data", default=str(ROOT_DIR / "data" / "kkbox_v3.parquet"))
+    parser.add_argument("--results-dir", default=str(ROOT_DIR / "results"))
+    parser.add_argument("--single-rows", type=int, default=500, help="1행 추론 지연 측정 횟수")
+    parser.add_argument("--batch-rows", type=int, default=32, help="작은 배치 크기")
+    parser.add_argument("--atol", type=float, default=1e-5, help="확률 허용 오차")
+    args = parser.parse_args()
+
+    path = model_path(args.results_dir)
+    with open(path, "rb") as f:
+        model = pickle.load(f)
+    if not hasattr(model, "get_booster"):
+        raise SystemExit(f"XGBoost 모델이 아닙니다: {path}")
+
+    start = time.perf_counter()
+    predictor = compile_xgboost(model)
+    print(f"변환: 트리 {predictor.n_trees}개, 노드 {len(predictor.feature):,}개, 최대 깊이 {predictor.max_depth} "
+          f"({(time.perf_counter() - start) * 1000:.0f}ms)")
+
+    X, _ = load_preprocessed(args.data, encode_categoricals=not hasattr(model, "category_mapping_"))
+    X_rows = predictor._as_array(X)
+
+    diff_batch = np.abs(model.predict_proba(X)[:, 1] - predictor.predict_proba(X)[:, 1]).max()
+    diff_one = max(abs(model.predict_proba(X_rows[i:i + 1])[0, 1] - predictor.predict_proba(X_rows[i:i + 1])[0, 1])
+                   for i in range(min(args.single_rows, len(X_rows))))
+    print(f"최대 오차: 배치 {diff_batch:.2e} / 1행 {diff_one:.2e} (허용 {args.atol:.0e})")
+
+    rows = X_rows[:args.single_rows]
+    batches = X_rows[:args.single_rows * args.batch_rows]
+    print("\n" + "=" * 64)
+    print(f"{'예측기':<14}{'1행 p50(ms)':>13}{'1행 p99(ms)':>13}{f'{args.batch_rows}행 p50(ms)':>12}"
+          f"{f'{args.batch_rows}행 p99(ms)':>12}")
+    for name, predict in (("xgboost", model.predict_proba), ("numpy", predictor.predict_proba)):
+        one = _latency_ms(predict, rows, 1)
+        batch = _latency_ms(predict, batches, args.batch_rows)
+        print(f"{name:<14}{one[0]:>13.3f}{one[1]:>13.3f}{batch[0]:>12.3f}{batch[1]:>12.3f}")
+    print("=" * 64)
+
+    if max(diff_batch, diff_one) > args.atol:
+        raise SystemExit("⚠️ NumPy 예측기의 결과가 XGBoost와 허용 오차 넘게 다릅니다.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+compact_model.py - 저장된 XGBoost 모델의 트리 수 절단 / 피처 제거 후보를 만들어 AP-지연 trade-off 비교.
+
+후보
+  - 트리 절단: best iteration까지의 트리 중 앞쪽 일부만 사용 (iteration_range, 재학습 없음)
+  - 피처 제거: 검증 표본의 평균 |SHAP| 하위 피처를 결측(NaN)으로 가린 X로 같은 파라미터 재학습 후 트리 절단
+    (가린 피처에서는 분기가 생기지 않으므로 컬럼 구성은 그대로 → 저장된 피처 변환기/feature_names 그대로 사용)
+
+각 후보의 검증 AP, 배치 predict_proba 지연 p50/p99, 모델 크기를 표로 출력하고 AP-지연 Pareto 후보를 표시합니다.
+최고 AP에서 --ap-tolerance 이내인 후보 중 p50 지연이 가장 짧은 모델을 results/compact/에 저장합니다.
+
+사용법:
+    python scripts/compact_model.py
+    python scripts/compact_model.py --keep-frac 1.0 0.5 0.3 --ap-tolerance 0.01
+    python scripts/compact_model.py --apply    # 선택한 모델로 results/xgboost_model.pkl 교체
+"""
+import argparse
+import pickle
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from sklearn.metrics import average_precision_score
+from sklearn.model_selection import train_test_split
+
+from src.backends import active_backend, model_path, save_model
+from src.feature_cache import load_preprocessed
+from src.model_train import build_dmatrices, classifier_params, to_classifier, train_booster
+
+SHAP_SAMPLE_ROWS = 2000
+
+
+def shap_importance(booster, X, enable_categorical, n_rows=SHAP_SAMPLE_ROWS):
+    """피처별 평균 |SHAP| (xgboost pred_contribs, 마지막 열은 bias)"""
+    sample = X.sample(min(n_rows, len(X)), random_state=42)
+    contribs = booster.predict(xgb.DMatrix(sample, enable_categorical=enable_categorical), pred_contribs=True)
+    return pd.Series(np.abs(contribs[:, :-1]).mean(axis=0), index=X.columns).sort_values(ascending=False)
+
+
+def mask_features(X, keep):
+    """keep에 없는 피처를 NaN으로 가린 복사본 (범주형은 결측 범주)"""
+    X = X.copy()
+    for col in X.columns.difference(keep):
+        X[col] = pd.Series(pd.NA, index=X.index, dtype=X[col].dtype) if X[col].dtype == "category" else np.nan
+    return X
+
+
+def used_rounds(model):
+    """predict_proba가 사용하는 부스팅 라운드 수 (best iteration까지, early stopping 기록이 없으면 전체)"""
+    best_iteration = getattr(model, "best_iteration", None)
+    return best_iteration + 1 if best_iteration is not None else model.get_booster().num_boosted_rounds()
+
+
+def truncate(model, n_rounds):
+    """앞쪽 n_rounds개 트리만 남긴 분류기 (native 모델은 범주 사전도 유지)"""
+    booster = model.get_booster()[:n_rounds]
+    booster.best_iteration = n_rounds - 1
+    params = {**classifier_params(model), "n_estimators": n_rounds}
+    compact = to_classifier(booster, params)
+    if hasattr(model, "category_mapping_"):
+        compact.category_mapping_ = model.category_mapping_
+    return compact
+
+
+def batch_latency_ms(model, X, batch_rows, repeats):
+    """batch_rows행 predict_proba 지연 (p50, p99)"""
+    starts = np.random.default_rng(42).integers(0, max(1, len(X) - batch_rows), size=repeats)
+    model.predict_proba(X.iloc[:batch_rows])  # 워밍업
+    latency = []
+    for start in starts:
+        batch = X.iloc[start:start + batch_rows]
+        t = time.perf_counter()
+        model.predict_proba(batch)
+        latency.append((time.perf_counter() - t) * 1000)
+    return float(np.percentile(latency, 50)), float(np.percentile(latency, 99))
+
+
+def pareto_front(df, maximize="ap", minimize="p50_ms"):
+    """다른 어떤 후보보다도 (AP가 낮고 지연이 긴) 관계가 아닌 후보 여부"""
+    ap, ms = df[maximize].to_numpy(), df[minimize].to_numpy()
+    dominated = [
+        bool(np.any((ap >= ap[i]) & (ms <= ms[i]) & ((ap > ap[i]) | (ms < ms[i])))) for i in range(len(df))
+    ]
+    return ~np.asarray(dominated)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="XGBoost 트리 절단/피처 제거 AP-지연 trade-off 비교")
+    parser.add_argument("--data", default=str(ROOT_DIR / "data" / "kkbox_v3.parquet"))
+    parser.add_argument("--results-dir", default=str(ROOT_DIR / "results"))
+    parser.add_argument("--rounds-frac", type=float, nargs="+", default=[0.1, 0.25, 0.5, 0.75, 1.0],
+                        help="남길 트리 비율 (best iteration 기준)")
+    parser.add_argument("--keep-frac", type=float, nargs="+", default=[1.0, 0.5, 0.25],
+                        help="평균 |SHAP| 상위로 남길 피처 비율 (1.0 = 재학습 없이 저장된 모델)")
+    parser.add_argument("--batch-rows", type=int, default=1024, help="지연 측정 배치 행 수")
+    parser.add_argument("--repeats", type=int, default=50, help="지연 측정 반복 횟수")
+    parser.add_argument("--ap-tolerance", type=float, default=0.005, help="최고 AP 대비 허용 감소폭")
+    parser.add_argument("--apply", action="store_true", help="선택한 모델을 results의 추론 모델로 저장")
+    args = parser.parse_args()
+
+    results_dir = Path(args.results_dir)
+    if active_backend(results_dir).name != "xgboost":
+        raise SystemExit("현재 추론 모델이 XGBoost가 아닙니다. (python src/main.py로 먼저 학습하세요)")
+    with open(model_path(results_dir), "rb") as f:
+        model = pickle.load(f)
+    enable_categorical = hasattr(model, "category_mapping_")
+
+    # train_model과 같은 8:2 분할
+    X, y = load_preprocessed(args.data, encode_categoricals=not enable_categorical)
+    X_tr, X_va, y_tr, y_va = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    importance = shap_importance(model.get_booster(), X_va, enable_categorical)
+
+    candidates, models = [], {}
+    for keep_frac in sorted(set(args.keep_frac), reverse=True):
+        n_keep = max(1, int(round(len(importance) * keep_frac)))
+        if keep_frac >= 1.0:
+            base = model
+        else:
+            keep = list(importance.index[:n_keep])
+            print(f"\n[피처 {n_keep}/{len(importance)}개] 평균 |SHAP| 하위 피처를 가리고 재학습 중...")
+            params = classifier_params(model)
+            dtrain, dvalid = build_dmatrices(mask_features(X_tr, keep), y_tr, mask_features(X_va, keep), y_va,
+                                             enable_categorical)
+            base = to_classifier(train_booster(params, dtrain, dvalid), params)
+            if enable_categorical:
+                base.category_mapping_ = model.category_mapping_
+            del dtrain, dvalid
+
+        best_rounds = used_rounds(base)
+        for rounds in sorted({max(1, int(round(best_rounds * f))) for f in args.rounds_frac}):
+            compact = truncate(base, rounds)
+            p50, p99 = batch_latency_ms(compact, X_va, args.batch_rows, args.repeats)
+            name = f"keep{n_keep}_trees{rounds}"
+            models[name] = compact
+            candidates.append({
+                "name": name, "features": n_keep, "trees": rounds,
+                "ap": average_precision_score(y_va, compact.predict_proba(X_va)[:, 1]),
+                "p50_ms": p50, "p99_ms": p99,
+                "size_kb": len(compact.get_booster().save_raw("ubj")) / 1024,
+            })
+            print(f"  {name}: AP {candidates[-1]['ap']:.4f}, p50 {p50:.2f}ms")
+
+    report = pd.DataFrame(candidates)
+    report["pareto"] = pareto_front(report)
+    eligible = report[report["ap"] >= report["ap"].max() - args.ap_tolerance]
+    chosen = eligible.sort_values(["p50_ms", "size_kb"]).iloc[0]
+    report["chosen"] = report["name"] == chosen["name"]
+
+    print("\n" + "=" * 92)
+    print(f"{'후보':<22}{'피처':>6}{'트리':>6}{'AP':>9}{f'{args.batch_rows}행 p50(ms)':>16}"
+          f"{f'{args.batch_rows}행 p99(ms)':>16}{'크기(KB)':>11}  비고")
+    for r in report.sort_values("p50_ms").itertuples():
+        note = ("Pareto " if r.pareto else "") + ("← 선택" if r.chosen else "")
+        print(f"{r.name:<22}{r.features:>6}{r.trees:>6}{r.ap:>9.4f}{r.p50_ms:>16.2f}{r.p99_ms:>16.2f}"
+              f"{r.size_kb:>11.1f}  {note}")
+    print("=" * 92)
+    print(f"선택: {chosen['name']} (최고 AP {report['ap'].max():.4f} - {args.ap_tolerance} 이내 중 p50 최소)")
+
+    out_dir = results_dir / "compact"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    report.to_csv(out_dir / "pareto.csv", index=False)
+    with open(out_dir / "xgboost_model.pkl", "wb") as f:
+        pickle.dump(models[chosen["name"]], f)
+    print(f"\n저장: {out_dir / 'pareto.csv'}, {out_dir / 'xgboost_model.pkl'}")
+
+    if args.apply:
+        print(f"추론 모델 교체: {save_model(models[chosen['name']], 'xgboost', results_dir)}")
+
+
+if __name__ == "__main__":
+    main()
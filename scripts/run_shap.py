@@ -28,12 +28,10 @@ data_file = DATA_DIR / "kkbox_v3.parquet"
 if not data_file.exists():
     raise FileNotFoundError(f"데이터 파일 없음: {data_file}")
 
-from src.preprocessing import preprocess_for_modeling
-from src.data_loader import load_data
+from src.feature_cache import load_preprocessed
 
 print("데이터 로딩 중...")
-df = load_data(DATA_DIR/'kkbox_v3.parquet')
-X, y = preprocess_for_modeling(df)
+X, y = load_preprocessed(data_file)
 
 # =========================
 # 원핫 인코딩 추가 (XGBoost용)
@@ -1,9 +1,19 @@
 import pandas as pd
+import sys
 from pathlib import Path
 import numpy as np
 
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from src.data_loader import load_data
+
 TARGET = 'is_churn'
 
+# EDA 요약에 필요한 컬럼만 parquet에서 읽음 (나머지 컬럼은 디코딩하지 않음)
+EDA_COLUMNS = [TARGET, 'total_secs_mean', 'gender', 'age_group', 'registered_via', 'total_paid', 'total_secs_sum']
+
 def prepare_eda_data():
     ROOT_DIR = Path(__file__).resolve().parents[1]
     DATA_PATH = ROOT_DIR / "data" / "kkbox_v3.parquet"
@@ -11,7 +21,7 @@ def prepare_eda_data():
 
     
     print("데이터 로딩 중...")
-    df = pd.read_parquet(DATA_PATH)
+    df = load_data(DATA_PATH, columns=EDA_COLUMNS)
     
 
     # 1. 기초 통계 값 저장
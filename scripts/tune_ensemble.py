@@ -0,0 +1,55 @@
+"""
+tune_ensemble.py - 저장된 OOF 예측으로 앙상블 가중치/임계값 조정 (재학습 없음).
+
+먼저 같은 fold 수로 두 모델의 OOF 예측을 만들어 둡니다.
+    python src/main.py --kfold 5
+    PYTHONPATH=. python src/dl_main.py --kfold 5
+
+사용법:
+    python scripts/tune_ensemble.py            # results/oof/ensemble.json 저장
+    python scripts/tune_ensemble.py --dry-run  # 결과만 출력
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from src.data_loader import load_data
+from src.oof import OOF_DIR, SEGMENT_MIN_TXN, load_oof, save_ensemble_config, tune_ensemble
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OOF 예측 기반 앙상블 가중치/임계값 조정")
+    parser.add_argument("--data", default=str(ROOT_DIR / "data" / "kkbox_v3.parquet"))
+    parser.add_argument("--oof-dir", default=str(OOF_DIR))
+    parser.add_argument("--dry-run", action="store_true", help="ensemble.json을 저장하지 않음")
+    args = parser.parse_args()
+
+    oof = load_oof(args.oof_dir)
+    missing = [name for name in ("xgb", "resnet") if name not in oof.columns]
+    if missing:
+        raise SystemExit(f"OOF 예측이 없는 모델: {missing} (--kfold로 먼저 학습하세요)")
+    if oof[["xgb", "resnet"]].isna().any().any():
+        raise SystemExit("OOF 예측에 빈 행이 있습니다. (k-fold 학습이 중간에 끊겼는지 확인하세요)")
+
+    txn_cnt = load_data(args.data, columns=["txn_cnt"])["txn_cnt"].to_numpy()
+    if len(txn_cnt) != len(oof):
+        raise SystemExit("OOF 저장소와 데이터의 행 수가 다릅니다. (데이터가 바뀌었으면 --kfold를 다시 실행하세요)")
+
+    start = time.perf_counter()
+    config = tune_ensemble(oof["y"].to_numpy(), oof["xgb"].to_numpy(), oof["resnet"].to_numpy(),
+                           segment=txn_cnt >= SEGMENT_MIN_TXN)
+    print(f"\n조정 완료 ({(time.perf_counter() - start) * 1000:.0f}ms)")
+    print(json.dumps(config, indent=2, ensure_ascii=False))
+
+    if not args.dry_run:
+        print(f"\n저장: {save_ensemble_config(config, args.oof_dir)}")
+
+
+if __name__ == "__main__":
+    main()
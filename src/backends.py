@@ -0,0 +1,252 @@
+"""
+backends.py - 트리 모델 학습 백엔드 (XGBoost / LightGBM).
+
+model_train의 탐색(run_tuning)과 최종 학습(train_model)은 백엔드 객체의 공통 인터페이스만 사용합니다.
+
+    backend = get_backend("lightgbm")
+    dtrain, dvalid = backend.build(X_tr, y_tr, X_va, y_va, enable_categorical)  # 한 번 만들고 재사용
+    booster = backend.train(params, dtrain, dvalid, trial)     # 탐색 trial (trial이 있으면 라운드별 AP pruning)
+    va_proba = backend.predict(booster, dvalid)                # best iteration까지의 검증 확률
+    proba = backend.predict_batch(booster, X_batch, n_threads) # 원본 피처 배치 추론 (다목적 탐색의 지연 측정)
+    model = backend.fit_final(params, dtrain, dvalid, X_tr, y_tr, X_va, y_va)  # predict_proba/pickle/SHAP 가능한 분류기
+    save_model(model, backend)                                 # results/<백엔드>_model.pkl + 사용 중인 백엔드 기록
+
+predict.py / model_loader.py는 model_path()로 마지막에 저장한 백엔드의 모델을 불러옵니다.
+"""
+import pickle
+from pathlib import Path
+
+import numpy as np
+import optuna
+
+from src.model_train import EARLY_STOPPING_ROUNDS, OptunaPruningCallback, build_dmatrices, to_classifier, train_booster
+from src.tuning import OPTUNA_STORAGE
+
+
+ACTIVE_BACKEND_FILE = "model_backend.txt"
+
+
+class _Backend:
+    name = None
+    model_file = None
+    storage = None
+    study_prefix = None
+
+    def base_params(self, scale_pos_weight, enable_categorical):
+        """탐색하지 않는 고정 파라미터 (불균형 가중치, 시드 등)"""
+        return {'scale_pos_weight': scale_pos_weight, 'random_state': 42, 'enable_categorical': enable_categorical}
+
+    def save(self, model, path):
+        with open(path, "wb") as f:
+            pickle.dump(model, f)
+
+    def load(self, path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+
+class XGBoostBackend(_Backend):
+    name = "xgboost"
+    model_file = "xgboost_model.pkl"
+    storage = OPTUNA_STORAGE
+    study_prefix = "xgb"
+
+    def default_params(self):
+        return {'n_estimators': 300, 'max_depth': 10, 'learning_rate': 0.05}
+
+    def suggest_params(self, trial):
+        return {
+            'n_estimators': trial.suggest_int('n_estimators', 100, 500),
+            'max_depth': trial.suggest_int('max_depth', 3, 10),
+            'learning_rate': trial.suggest_float('learning_rate', 0.01, 0.3, log=True),
+            'subsample': trial.suggest_float('subsample', 0.5, 1.0),
+            'colsample_bytree': trial.suggest_float('colsample_bytree', 0.5, 1.0),
+            'min_child_weight': trial.suggest_int('min_child_weight', 1, 10),
+        }
+
+    def base_params(self, scale_pos_weight, enable_categorical):
+        return {**super().base_params(scale_pos_weight, enable_categorical), 'eval_metric': 'logloss'}
+
+    def build(self, X_tr, y_tr, X_va, y_va, enable_categorical=False):
+        return build_dmatrices(X_tr, y_tr, X_va, y_va, enable_categorical)
+
+    def train(self, params, dtrain, dvalid, trial=None):
+        return train_booster(params, dtrain, dvalid, callbacks=[OptunaPruningCallback(trial)] if trial else None)
+
+    def predict(self, booster, dvalid):
+        return booster.predict(dvalid, iteration_range=(0, booster.best_iteration + 1))
+
+    def predict_batch(self, booster, X, n_threads=None):
+        if n_threads is not None:
+            booster.set_param({"nthread": n_threads})
+        return booster.inplace_predict(X, iteration_range=(0, booster.best_iteration + 1))
+
+    def fit_final(self, params, dtrain, dvalid, X_tr, y_tr, X_va, y_va):
+        return to_classifier(self.train(params, dtrain, dvalid), params)
+
+    def feature_names(self, model):
+        return model.get_booster().feature_names
+
+
+class _LightGBMPruningCallback:
+    """매 라운드 검증 AP를 Optuna trial에 보고하고, pruner가 판단하면 학습을 중단합니다. (lgb.train 콜백)"""
+    order = 30
+
+    def __init__(self, trial, data_name="valid", metric="average_precision"):
+        self.trial = trial
+        self.data_name = data_name
+        self.metric = metric
+
+    def __call__(self, env):
+        for data_name, metric, score, _ in env.evaluation_result_list:
+            if data_name == self.data_name and metric == self.metric:
+                self.trial.report(score, step=env.iteration)
+                if self.trial.should_prune():
+                    raise optuna.TrialPruned(f"{env.iteration}라운드에서 중단 (valid-{metric}: {score:.4f})")
+
+
+class LightGBMClassifier:
+    """
+    lgb.train으로 학습한 Booster를 분류기 인터페이스(predict_proba / predict / booster_)로 감쌉니다.
+    (XGBoost의 to_classifier와 같은 용도, LGBMClassifier 내부 상태에 의존하지 않고 공개 Booster API만 사용)
+    pickle은 Booster의 모델 문자열로 저장되고, SHAP(plot_shap_values)은 booster_를 설명합니다.
+    """
+    def __init__(self, booster, params):
+        self.booster_ = booster
+        self.params = dict(params)
+        self.classes_ = np.array([0, 1])
+
+    @property
+    def n_estimators(self):
+        return self.params["n_estimators"]
+
+    @property
+    def best_iteration_(self):
+        return self.booster_.best_iteration
+
+    @property
+    def n_features_in_(self):
+        return self.booster_.num_feature()
+
+    @property
+    def feature_names_in_(self):
+        return np.array(self.booster_.feature_name())
+
+    def predict_proba(self, X):
+        proba = self.booster_.predict(X, num_iteration=self.best_iteration_ or None)
+        return np.column_stack([1 - proba, proba])
+
+    def predict(self, X):
+        return (self.predict_proba(X)[:, 1] >= 0.5).astype(int)
+
+
+class LightGBMBackend(_Backend):
+    name = "lightgbm"
+    model_file = "lightgbm_model.pkl"
+    storage = OPTUNA_STORAGE.with_name("lgbm_tuning.log")
+    study_prefix = "lgbm"
+
+    def default_params(self):
+        return {'n_estimators': 300, 'num_leaves': 63, 'learning_rate': 0.05}
+
+    def suggest_params(self, trial):
+        return {
+            'n_estimators': trial.suggest_int('n_estimators', 100, 500),
+            'num_leaves': trial.suggest_int('num_leaves', 15, 255, log=True),
+            'learning_rate': trial.suggest_float('learning_rate', 0.01, 0.3, log=True),
+            'subsample': trial.suggest_float('subsample', 0.5, 1.0),
+            'colsample_bytree': trial.suggest_float('colsample_bytree', 0.5, 1.0),
+            'min_child_samples': trial.suggest_int('min_child_samples', 5, 100, log=True),
+        }
+
+    @staticmethod
+    def _params(params):
+        """train_model 형식 파라미터 → (lgb.train 파라미터, 부스팅 라운드 수)"""
+        params = dict(params)
+        n_rounds = params.pop("n_estimators")
+        params.pop("enable_categorical", None)
+        params.update(objective="binary", verbosity=-1)
+        if params.get("subsample", 1.0) < 1.0:
+            params["subsample_freq"] = 1
+        return params, n_rounds
+
+    def build(self, X_tr, y_tr, X_va, y_va, enable_categorical=False):
+        """
+        학습/검증 Dataset을 한 번만 binning 합니다. (검증은 학습의 bin 경계 공유)
+        category 컬럼은 LightGBM이 자동으로 범주형으로 처리하므로 enable_categorical은 X의 dtype으로 정해집니다.
+        trial마다 min_child_samples가 바뀌므로 feature_pre_filter는 끕니다.
+        """
+        import lightgbm as lgb
+
+        dataset_params = {"feature_pre_filter": False, "verbosity": -1}
+        dtrain = lgb.Dataset(X_tr, np.asarray(y_tr), params=dataset_params, free_raw_data=False)
+        dvalid = lgb.Dataset(X_va, np.asarray(y_va), reference=dtrain, params=dataset_params, free_raw_data=False)
+        return dtrain.construct(), dvalid.construct()
+
+    def train(self, params, dtrain, dvalid, trial=None):
+        import lightgbm as lgb
+
+        lgb_params, n_rounds = self._params(params)
+        lgb_params["metric"] = ["binary_logloss"] + (["average_precision"] if trial else [])
+        callbacks = [lgb.early_stopping(EARLY_STOPPING_ROUNDS, first_metric_only=True, verbose=False)]
+        if trial:
+            callbacks.append(_LightGBMPruningCallback(trial))
+        return lgb.train(lgb_params, dtrain, num_boost_round=n_rounds,
+                         valid_sets=[dvalid], valid_names=["valid"], callbacks=callbacks)
+
+    def predict(self, booster, dvalid):
+        return self.predict_batch(booster, dvalid.get_data())
+
+    def predict_batch(self, booster, X, n_threads=None):
+        if n_threads is not None:
+            return booster.predict(X, num_iteration=booster.best_iteration, num_threads=n_threads)
+        return booster.predict(X, num_iteration=booster.best_iteration)
+
+    def fit_final(self, params, dtrain, dvalid, X_tr, y_tr, X_va, y_va):
+        """
+        탐색과 같은 Dataset(이미 binning 완료)으로 lgb.train 후 LightGBMClassifier로 감쌉니다.
+        (LGBMClassifier.fit은 X를 다시 binning하므로 사용하지 않음)
+        """
+        return LightGBMClassifier(self.train(params, dtrain, dvalid), params)
+
+    def feature_names(self, model):
+        return model.booster_.feature_name()
+
+
+BACKENDS = {backend.name: backend for backend in (XGBoostBackend(), LightGBMBackend())}
+
+
+def get_backend(backend="xgboost"):
+    """이름("xgboost"/"lightgbm") 또는 백엔드 객체 → 백엔드 객체"""
+    if isinstance(backend, _Backend):
+        return backend
+    if backend not in BACKENDS:
+        raise ValueError(f"지원하지 않는 백엔드입니다: {backend} (가능: {list(BACKENDS)})")
+    return BACKENDS[backend]
+
+
+def save_model(model, backend, results_dir="results"):
+    """모델을 저장하고, 추론 시 불러올 백엔드로 기록합니다."""
+    backend = get_backend(backend)
+    results_dir = Path(results_dir)
+    path = results_dir / backend.model_file
+    backend.save(model, path)
+    (results_dir / ACTIVE_BACKEND_FILE).write_text(backend.name)
+    return path
+
+
+def active_backend(results_dir="results"):
+    """마지막으로 저장한 모델의 백엔드 (기록이 없으면 기존처럼 xgboost)"""
+    path = Path(results_dir) / ACTIVE_BACKEND_FILE
+    return get_backend(path.read_text().strip() if path.exists() else "xgboost")
+
+
+def model_path(results_dir="results"):
+    return Path(results_dir) / active_backend(results_dir).model_file
+
+
+def feature_names(model):
+    """학습된 분류기(XGBClassifier / LightGBMClassifier)의 피처 이름"""
+    if hasattr(model, "get_booster"):
+        return BACKENDS["xgboost"].feature_names(model)
+    return BACKENDS["lightgbm"].feature_names(model)
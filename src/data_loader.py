@@ -1,11 +1,229 @@
+import re
 from pathlib import Path
+import numpy as np
 import pandas as pd
 
 
-def load_data(filepath):
+# 🔹 KKBox 테이블별 스키마 (로드 시점에 다운캐스트)
+# - 0/1 플래그: int8, 횟수/일수: int16/int32, 연속값: float32
+# - 날짜(YYYYMMDD): "date" → 1970-01-01 기준 일 번호(int32)
+# - 범주형: category
+SCHEMAS = {
+    "train": {
+        "is_churn": "int8",
+    },
+    "transactions": {
+        "payment_method_id": "int8",
+        "payment_plan_days": "int16",
+        "plan_list_price": "int16",
+        "actual_amount_paid": "int16",
+        "is_auto_renew": "int8",
+        "transaction_date": "date",
+        "membership_expire_date": "date",
+        "is_cancel": "int8",
+    },
+    "user_logs": {
+        "date": "date",
+        "num_25": "int32",
+        "num_50": "int32",
+        "num_75": "int32",
+        "num_985": "int32",
+        "num_100": "int32",
+        "num_unq": "int32",
+        "total_secs": "float32",
+    },
+    "members": {
+        "city": "category",
+        "bd": "int16",
+        "gender": "category",
+        "registered_via": "category",
+        "registration_init_time": "date",
+    },
+    "kkbox": {
+        "is_churn": "int8",
+        "txn_cnt": "float32",
+        "total_paid": "float32",
+        "avg_paid": "float32",
+        "avg_plan_days": "float32",
+        "auto_renew_rate": "float32",
+        "cancel_rate": "float32",
+        "total_cancel": "float32",
+        "avg_duration": "float32",
+        "max_duration": "float32",
+        # 결제 순서(시퀀스) 피처
+        "last_plan_days": "int16",
+        "last_paid": "int32",
+        "last_auto_renew": "int8",
+        "last_cancel": "int8",
+        "days_to_expire": "int32",
+        "renewal_gap_mean": "float32",
+        "renewal_gap_max": "int32",
+        "plan_change_cnt": "int16",
+        "total_secs_sum": "float32",
+        "total_secs_mean": "float32",
+        "num_unq_mean": "float32",
+        "num_100_sum": "int32",
+        "num_985_sum": "int32",
+        "num_75_sum": "int32",
+        "num_50_sum": "int32",
+        "num_25_sum": "int32",
+        "city": "category",
+        "gender": "category",
+        "registered_via": "category",
+        "age_group": "category",
+        "no_log_flag": "int8",
+        "days_since_last_log": "int16",
+    },
+}
+
+# 🔹 최근 N일 윈도우 피처 "<컬럼>_<N>d" (feature_build의 LOG_WINDOWS)는 기준 컬럼의 dtype을 따름
+# (윈도우 설정이 바뀌어도 스키마 수정 불필요)
+WINDOW_COLUMN = re.compile(r"^(?P<base>.+)_\d+d$")
+
+
+def to_day_number(yyyymmdd):
+    """
+    20170331 형태의 정수 날짜를 1970-01-01 기준 일(day) 번호(int32)로 변환합니다.
+    pd.to_datetime(astype(str)) 보다 훨씬 빠른 순수 numpy 연산입니다.
+    """
+    v = np.asarray(yyyymmdd, dtype=np.int64)
+    months = (v // 10000 - 1970) * 12 + (v // 100 % 100 - 1)
+    days = months.astype("datetime64[M]").astype("datetime64[D]") + (v % 100 - 1)
+    return days.astype(np.int64).astype(np.int32)
+
+
+def infer_table(filepath):
+    """파일명(train_v2.csv, kkbox_v3.parquet 등)으로 스키마 테이블 이름을 추정합니다."""
+    stem = re.sub(r"_v\d+$", "", Path(filepath).stem)
+    return stem if stem in SCHEMAS else None
+
+
+def with_window_columns(schema, columns):
+    """columns 중 스키마에 없는 윈도우 컬럼(<컬럼>_<N>d)에 기준 컬럼의 dtype을 붙인 스키마"""
+    extra = {}
+    for col in columns:
+        match = WINDOW_COLUMN.match(str(col))
+        if col not in schema and match and match["base"] in schema:
+            extra[col] = schema[match["base"]]
+    return {**schema, **extra} if extra else schema
+
+
+def apply_schema(df, schema):
+    """
+    스키마에 정의된 컬럼만 지정 dtype으로 변환합니다.
+    결측치가 있는 정수 컬럼은 NaN을 유지하기 위해 float32로 대신 변환합니다.
+    최근 N일 윈도우 컬럼(<컬럼>_<N>d)은 기준 컬럼의 dtype으로 변환합니다. (with_window_columns)
+    """
+    for col, dtype in with_window_columns(schema, df.columns).items():
+        if col not in df.columns:
+            continue
+        if dtype == "date":
+            if pd.api.types.is_datetime64_any_dtype(df[col]):
+                df[col] = (df[col].to_numpy().astype("datetime64[D]").astype(np.int64)).astype(np.int32)
+            elif df[col].notna().all():
+                df[col] = to_day_number(df[col])
+        elif dtype != "category" and np.dtype(dtype).kind in "iu" and df[col].isna().any():
+            df[col] = df[col].astype("float32")
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def memory_mb(df):
+    """데이터프레임 메모리 사용량(MB, object 포함)"""
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+_FILTER_OPS = {
+    "==": lambda s, v: s == v,
+    "=": lambda s, v: s == v,
+    "!=": lambda s, v: s != v,
+    "<": lambda s, v: s < v,
+    "<=": lambda s, v: s <= v,
+    ">": lambda s, v: s > v,
+    ">=": lambda s, v: s >= v,
+    "in": lambda s, v: s.isin(v),
+    "not in": lambda s, v: ~s.isin(v),
+}
+
+
+def _filter_frame(df, filters):
+    """
+    pyarrow 형식의 filters를 pandas 데이터프레임에 적용합니다. (CSV/PKL용)
+    [(col, op, val), ...] 는 AND, [[...], [...]] 는 OR로 해석합니다.
+    """
+    groups = filters if isinstance(filters[0], list) else [filters]
+    mask = np.zeros(len(df), dtype=bool)
+    for group in groups:
+        group_mask = np.ones(len(df), dtype=bool)
+        for col, op, val in group:
+            group_mask &= _FILTER_OPS[op](df[col], val).to_numpy()
+        mask |= group_mask
+    return df[mask]
+
+
+def _sample_size(sample, n_rows):
+    """sample이 int면 행 수, float면 전체 행 대비 비율로 해석합니다."""
+    if isinstance(sample, float):
+        return int(round(sample * n_rows))
+    return int(sample)
+
+
+def _read_parquet(filepath, columns=None, filters=None, sample=None, random_state=42):
+    """
+    parquet을 읽을 때 컬럼/행 필터/샘플링을 리더 단계로 내려보냅니다.
+    - columns: 필요한 컬럼만 디코딩
+    - filters: row group 통계(min/max)로 해당 없는 row group은 건너뜀
+    - sample: 무작위 row group만 골라 읽은 뒤 그 안에서 샘플링
+      (목표 행 수는 필터 적용 전 전체 행 수 기준, 필터를 통과한 행이 목표에 닿을 때까지 row group을 읽음)
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    expr = pq.filters_to_expression(filters) if filters else None
+    dataset = ds.dataset(filepath, format="parquet")
+    if sample is None:
+        return dataset.to_table(columns=columns, filter=expr).to_pandas()
+
+    row_groups = [rg for frag in dataset.get_fragments() for rg in frag.split_by_row_group()]
+    n_total = sum(rg.row_groups[0].num_rows for rg in row_groups)
+    target = _sample_size(sample, n_total)
+
+    rng = np.random.default_rng(random_state)
+    tables, n_read = [], 0
+    for i in rng.permutation(len(row_groups)):
+        if n_read >= target:
+            break
+        table = row_groups[i].to_table(columns=columns, filter=expr)
+        tables.append(table)
+        n_read += table.num_rows
+
+    if not tables:
+        empty = dataset.schema.empty_table()
+        return (empty.select(columns) if columns else empty).to_pandas()
+    df = pa.concat_tables(tables).to_pandas()
+    if len(df) > target:
+        df = df.sample(n=target, random_state=random_state)
+    return df.reset_index(drop=True)
+
+
+def load_data(filepath, schema="auto", columns=None, filters=None, sample=None, random_state=42):
     """
     CSV, PKL, 또는 Parquet 파일로부터 데이터를 로드합니다.
     Path 객체와 문자열 모두 지원합니다.
+
+    schema="auto" 이면 파일명으로 KKBox 테이블을 추정하여 SCHEMAS의 dtype을 적용합니다.
+    테이블 이름("kkbox" 등)이나 {컬럼: dtype} dict를 직접 넘길 수도 있으며,
+    None이면 원래 dtype 그대로 반환합니다.
+
+    columns / filters / sample:
+    - columns: 읽을 컬럼 목록
+    - filters: pyarrow 형식 행 필터, 예) [("is_churn", "==", 1), ("txn_cnt", ">", 3)]
+    - sample: int면 행 수, float면 (필터 적용 전) 전체 행 대비 비율
+      → 필터를 통과한 행에서 그 수만큼 샘플링 (통과한 행이 더 적으면 전부)
+    parquet은 리더 단계에서 처리되어 필요한 row group/컬럼만 디코딩하고,
+    CSV/PKL은 로드 후 동일한 의미로 적용합니다.
     """
 
     # 🔹 Path 객체로 통일
@@ -22,14 +240,32 @@ def load_data(filepath):
 
     print(f"{filepath}에서 데이터를 로드하는 중...")
 
-    if filepath.suffix == ".csv":
-        df = pd.read_csv(filepath)
-    elif filepath.suffix == ".pkl":
-        df = pd.read_pickle(filepath)
-    elif filepath.suffix == ".parquet":
-        df = pd.read_parquet(filepath)
+    if filepath.suffix == ".parquet":
+        df = _read_parquet(filepath, columns, filters, sample, random_state)
     else:
-        raise ValueError("지원되지 않는 형식입니다. (.csv, .pkl, .parquet)")
+        if filepath.suffix == ".csv":
+            df = pd.read_csv(filepath, usecols=columns)
+        elif filepath.suffix == ".pkl":
+            df = pd.read_pickle(filepath)
+            if columns is not None:
+                df = df[columns]
+        else:
+            raise ValueError("지원되지 않는 형식입니다. (.csv, .pkl, .parquet)")
+        n_total = len(df)  # parquet과 같이 sample 비율은 필터 적용 전 행 수 기준
+        if filters:
+            df = _filter_frame(df, filters)
+        if sample is not None:
+            df = df.sample(n=min(_sample_size(sample, n_total), len(df)), random_state=random_state)
+
+    # 🔹 스키마 적용 (dtype 다운캐스트)
+    if schema == "auto":
+        schema = infer_table(filepath)
+    if isinstance(schema, str):
+        schema = SCHEMAS[schema]
+    if schema:
+        before = memory_mb(df)
+        df = apply_schema(df, schema)
+        print(f"스키마 적용: 메모리 {before:.1f}MB → {memory_mb(df):.1f}MB")
 
     print(f"데이터 로드 완료: {df.shape}")
-    return df
\ No newline at end of file
+    return df
@@ -1,11 +1,34 @@
+import argparse
 import os
-from src.data_loader import load_data
-from src.preprocessing import preprocess_for_modeling
+from src.feature_cache import load_preprocessed, cache_key
 from src.dl_preprocessing import prepare_dl_data
-from src.dl_model import ChurnResNet, get_device
-from src.dl_train import train_dl_model, evaluate_dl_model, finetune_resnet
+from src.dl_model import ChurnResNet, bf16_supported, get_device
+from src.dl_train import train_dl_model, evaluate_dl_model, finetune_resnet, train_resnet_kfold, check_ap_parity
+from src.oof import open_store
 
 def main():
+    parser = argparse.ArgumentParser(description="KKBox 이탈 예측 파이프라인 (ResNet)")
+    parser.add_argument("--kfold", type=int, default=None,
+                        help="k-fold로 학습하여 OOF 예측만 results/oof/에 저장 (모델 저장 없음)")
+    parser.add_argument("--finetune", type=int, default=None, metavar="N_TRIALS",
+                        help="확정 하이퍼파라미터 대신 Optuna Full Fine-tuning으로 구조 재탐색")
+    parser.add_argument("--multi-objective", action="store_true",
+                        help="--finetune: 검증 AP와 배치 추론 지연을 함께 탐색 (Pareto 표 저장)")
+    parser.add_argument("--latency-budget", type=float, default=None,
+                        help="--multi-objective: 이 지연(ms) 이내 Pareto 후보 중 AP가 가장 높은 구조 선택")
+    parser.add_argument("--n-workers", type=int, default=None,
+                        help="--finetune: 병렬 탐색 프로세스 수 (기본: 코어 수 / 2, torch 스레드를 나눠 씀)")
+    parser.add_argument("--study-name", default=None,
+                        help="--finetune: Optuna study 이름 (기본: resnet_finetune_<데이터 캐시 키>, "
+                             "같은 이름이면 results/optuna/dl_tuning.log에서 이어서 탐색)")
+    parser.add_argument("--bf16", action="store_true",
+                        help="bfloat16 autocast로 학습/추론 (fp32 대비 Val AP를 확인해 통과하면 추론 설정으로 저장)")
+    parser.add_argument("--compile", action="store_true",
+                        help="torch.compile한 모델로 학습/추론 (--bf16과 같이 AP 확인)")
+    args = parser.parse_args()
+    if (args.multi_objective or args.latency_budget is not None) and not args.finetune:
+        parser.error("--multi-objective/--latency-budget은 --finetune과 함께 사용하세요.")
+
     print("="*50)
     print("KKBox 이탈 예측 파이프라인 (Deep Learning - ResNet Fine-tuned)")
     print("[확정 모델] 임계값 0.8 고정")
@@ -15,18 +38,21 @@ def main():
     data_path = "data/kkbox_v3.parquet"
     if not os.path.exists(data_path):
         data_path = "kkbox_v3.parquet"
-    df = load_data(data_path)
 
-    # 2. 기초 전처리
+    # 2. 기초 전처리 (전처리 캐시가 있으면 memory-map으로 바로 로드)
     print("\n[Step 1] 기초 전처리 중...")
-    X, y = preprocess_for_modeling(df)
-
-    # 3. 딥러닝용 데이터 준비 (ResNet: WeightedRandomSampler 미사용)
-    print("\n[Step 2] 딥러닝용 데이터 준비 중...")
-    train_loader, val_loader, scaler, input_dim = prepare_dl_data(X, y, use_weighted_sampler=False)
+    X, y = load_preprocessed(data_path)
 
-    # 4. 장치 설정
+    # 3. 장치 설정
     device = get_device()
+    if args.bf16 and not bf16_supported(device):
+        print(f"⚠️ {device}에서 bfloat16 하드웨어 연산을 지원하지 않아 오히려 느릴 수 있습니다.")
+
+    # 4. 딥러닝용 데이터 준비 (ResNet: WeightedRandomSampler 미사용, CUDA면 배치를 page-locked 메모리로)
+    print("\n[Step 2] 딥러닝용 데이터 준비 중...")
+    train_loader, val_loader, scaler, input_dim = prepare_dl_data(
+        X, y, use_weighted_sampler=False, pin_memory=device.type == "cuda"
+    )
 
     # 5. 확정 하이퍼파라미터 (Fine-tuning Trial 5 Best, Val AP: 0.9378)
     #    lr=0.01121, hidden_dim=256, num_blocks=5, dropout=0.1669
@@ -35,18 +61,35 @@ def main():
     BEST_NUM_BLOCKS = 5
     BEST_DROPOUT    = 0.1669
 
-    # --- [Optuna 재탐색 - 필요 시 주석 해제] ---
-    # print("\n[Step 3] ResNet Full Fine-tuning 시작 (10회 구조 탐색 중)...")
-    # best_params = finetune_resnet(input_dim, train_loader, val_loader, device=device, n_trials=10)
-    # BEST_LR         = best_params['lr']
-    # BEST_HIDDEN_DIM = best_params['hidden_dim']
-    # BEST_NUM_BLOCKS = best_params['num_blocks']
-    # BEST_DROPOUT    = best_params['dropout']
+    # --- [Optuna 재탐색: --finetune N_TRIALS] ---
+    if args.finetune:
+        print(f"\n[Step 3] ResNet Full Fine-tuning 시작 ({args.finetune}회 구조 탐색 중)...")
+        # 같은 데이터/전처리면 같은 study를 이어서 탐색하고, 데이터가 바뀌면 새 study (main.py와 같은 규칙)
+        study_name = args.study_name or (
+            f"resnet_finetune_{'latency_' if args.multi_objective else ''}{cache_key(data_path)}"
+        )
+        best_params = finetune_resnet(input_dim, train_loader, val_loader, device=device, n_trials=args.finetune,
+                                      multi_objective=args.multi_objective, latency_budget_ms=args.latency_budget,
+                                      n_workers=args.n_workers, study_name=study_name)
+        BEST_LR         = best_params['lr']
+        BEST_HIDDEN_DIM = best_params['hidden_dim']
+        BEST_NUM_BLOCKS = best_params['num_blocks']
+        BEST_DROPOUT    = best_params['dropout']
     # -------------------------------------------
 
     print(f"\n[Step 3] 확정 하이퍼파라미터:")
     print(f"  lr={BEST_LR}, hidden_dim={BEST_HIDDEN_DIM}, num_blocks={BEST_NUM_BLOCKS}, dropout={BEST_DROPOUT}")
 
+    # [K-Fold] 확정 하이퍼파라미터로 fold 모델을 학습하여 OOF 예측 저장 (XGBoost와 같은 fold 배정 사용)
+    if args.kfold:
+        folds = open_store(y, n_splits=args.kfold, data_key=cache_key(data_path))
+        train_resnet_kfold(
+            X, y, folds,
+            dict(hidden_dim=BEST_HIDDEN_DIM, num_blocks=BEST_NUM_BLOCKS, dropout=BEST_DROPOUT),
+            lr=BEST_LR, epochs=50, device=device
+        )
+        return
+
     # 6. 모델 학습
     print(f"\n[Step 4] 모델 학습 시작 (Max Epochs: 50)...")
     model = ChurnResNet(
@@ -57,13 +100,18 @@ def main():
     ).to(device)
     best_ap, history = train_dl_model(
         model, train_loader, val_loader,
-        epochs=50, lr=BEST_LR, device=device
+        epochs=50, lr=BEST_LR, device=device, bf16=args.bf16, use_compile=args.compile
     )
 
     # 7. 평가 (임계값 0.8 확정)
     print("\n[Step 5] 모델 평가 중... (확정 임계값: 0.8)")
     evaluate_dl_model(model, val_loader, device=device, threshold=0.8)
 
+    # bf16 / compile 추론이 fp32와 같은 AP를 내는 경우에만 추론 설정으로 저장 (predict_resnet 기본값)
+    fast_inference = False
+    if args.bf16 or args.compile:
+        fast_inference = check_ap_parity(model, val_loader, device, bf16=args.bf16, use_compile=args.compile)['ok']
+
     # 8. 모델 및 스케일러 저장 (나중에 재학습 없이 바로 호출 가능)
     import pickle, torch
     results_dir = "results"
@@ -75,7 +123,9 @@ def main():
         'num_blocks':       BEST_NUM_BLOCKS,
         'dropout':          BEST_DROPOUT,
         'threshold':        0.8,
-        'best_val_ap':      best_ap
+        'best_val_ap':      best_ap,
+        'bf16':             args.bf16 and fast_inference,
+        'compile':          args.compile and fast_inference
     }, os.path.join(results_dir, "resnet_model.pth"))
     with open(os.path.join(results_dir, "resnet_scaler.pkl"), "wb") as f:
         pickle.dump(scaler, f)
@@ -94,3 +94,31 @@ def get_device():
     사용 가능한 장치(CUDA 또는 CPU)를 반환합니다.
     """
     return torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+def bf16_supported(device='cpu'):
+    """
+    device가 bfloat16 연산을 하드웨어로 지원하는지 (CPU: AVX512-BF16/AMX 등 oneDNN bf16 지원 여부)
+    CPU 확인은 공개 API가 없어 torch 내부 op를 쓰므로, 해당 op가 없는 torch 버전에서는 False (경고 출력용 판단만)
+    """
+    device = torch.device(device)
+    if device.type == "cuda":
+        return torch.cuda.is_bf16_supported()
+    try:
+        return torch.backends.mkldnn.is_available() and bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+def autocast(device='cpu', bf16=False):
+    """
+    bf16=True면 device에서 bfloat16 autocast 컨텍스트를 반환합니다. (False면 아무 일도 하지 않는 컨텍스트)
+    Linear 등 행렬곱은 bf16으로, BatchNorm/손실 등 정밀도가 필요한 연산은 fp32로 실행됩니다.
+    """
+    return torch.autocast(device_type=torch.device(device).type, dtype=torch.bfloat16, enabled=bf16)
+
+def compile_model(model, enabled=True):
+    """
+    torch.compile로 forward(학습 시 backward 포함)를 컴파일한 모듈을 반환합니다. (enabled=False면 model 그대로)
+    가중치는 원래 model과 공유하므로 state_dict 저장/복원은 원래 model로 합니다.
+    (컴파일 모듈의 state_dict 키에는 '_orig_mod.' 접두사가 붙음)
+    """
+    return torch.compile(model) if enabled else model
@@ -1,56 +1,145 @@
 import pandas as pd
 import numpy as np
 import torch
-from torch.utils.data import Dataset, DataLoader, WeightedRandomSampler
+from torch.utils.data import WeightedRandomSampler
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
 
-class KKBoxDataset(Dataset):
+class BalancedBatchSampler:
     """
-    KKBox 데이터를 PyTorch Dataset으로 변환합니다.
+    클래스 비율을 맞춘 배치 인덱스를 에폭 단위로 한 번에 만드는 샘플러. (WeightedRandomSampler 대체)
+    - 모든 배치에 양성(이탈)이 batch_size * pos_ratio개씩 들어가도록 층화
+    - 각 클래스는 무작위 순열을 이어 붙여 뽑으므로, 한 클래스를 다 쓰기 전에는 같은 행이 다시 나오지 않음
+      (양성처럼 필요한 수가 클래스 크기보다 많을 때만 다음 순열에서 반복)
+    epoch_indices()가 (num_samples,) 인덱스 배열을 반환하며, TensorBatchLoader가 그대로 배치로 자릅니다.
     """
-    def __init__(self, X, y):
-        self.X = torch.FloatTensor(X)
-        self.y = torch.FloatTensor(y.values).view(-1, 1) if isinstance(y, (pd.Series, pd.DataFrame)) else torch.FloatTensor(y).view(-1, 1)
+    def __init__(self, y, batch_size=1024, pos_ratio=0.5, num_samples=None, seed=None):
+        y = np.asarray(y).astype(int).ravel()
+        self.pos = np.flatnonzero(y == 1)
+        self.neg = np.flatnonzero(y == 0)
+        if not 0.0 < pos_ratio < 1.0 or len(self.pos) == 0 or len(self.neg) == 0:
+            raise ValueError("양성/음성이 모두 있어야 하고 pos_ratio는 0과 1 사이여야 합니다.")
+        self.batch_size = batch_size
+        self.pos_ratio = pos_ratio
+        self.num_samples = len(y) if num_samples is None else num_samples
+        self.rng = np.random.default_rng(seed)
 
     def __len__(self):
-        return len(self.y)
+        return self.num_samples
 
-    def __getitem__(self, idx):
-        return self.X[idx], self.y[idx]
+    def _draw(self, rows, n):
+        """rows에서 n개: 무작위 순열을 필요한 만큼 이어 붙임 (한 순열 안에서는 중복 없음)"""
+        n_perm = -(-n // len(rows))
+        return np.concatenate([self.rng.permutation(rows) for _ in range(n_perm)])[:n]
 
-def prepare_dl_data(X, y, batch_size=1024, use_weighted_sampler=True):
+    def epoch_indices(self):
+        n_batches = -(-self.num_samples // self.batch_size)
+        n_pos = max(1, int(round(self.batch_size * self.pos_ratio)))
+        batches = np.concatenate([
+            self._draw(self.pos, n_batches * n_pos).reshape(n_batches, n_pos),
+            self._draw(self.neg, n_batches * (self.batch_size - n_pos)).reshape(n_batches, -1),
+        ], axis=1)
+        return self.rng.permuted(batches, axis=1).ravel()[:self.num_samples]
+
+
+class TensorBatchLoader:
     """
-    데이터를 스케일링하고 DataLoader로 변환합니다.
-    WeightedRandomSampler로 클래스 불균형(이탈 10:1)을 해결합니다.
+    전체 (X, y) 텐서에서 배치를 한 번에 잘라 내는 DataLoader 대체.
+    DataLoader + Dataset은 배치마다 행 수만큼 __getitem__을 호출하고 default_collate로 쌓지만,
+    여기서는 배치당 연산 한 번으로 만듭니다.
+    - 순서대로(shuffle=False, sampler 없음): X[i:i+batch_size] 연속 슬라이스 (복사 없음)
+    - shuffle / sampler: 에폭마다 인덱스를 한 번에 만들고 배치마다 index_select 한 번
+      (sampler: BalancedBatchSampler는 epoch_indices()를 그대로, WeightedRandomSampler는 torch.multinomial 한 번으로,
+       그 외 Sampler는 인덱스 목록으로 변환)
+    - X, y는 공유 메모리에 두어 fork한 프로세스가 복사 없이 사용하고,
+      pin_memory=True이면(CUDA 사용 시) 배치를 page-locked 메모리로 옮겨 GPU 전송을 non_blocking으로 할 수 있습니다.
+    """
+    def __init__(self, X, y, batch_size=1024, shuffle=False, sampler=None, pin_memory=False, drop_last=False):
+        y = y.values if isinstance(y, (pd.Series, pd.DataFrame)) else y
+        self.X = torch.as_tensor(np.ascontiguousarray(X, dtype=np.float32)).share_memory_()
+        self.y = torch.as_tensor(np.asarray(y, dtype=np.float32)).view(-1, 1).share_memory_()
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.sampler = sampler
+        self.pin_memory = pin_memory and torch.cuda.is_available()
+        self.drop_last = drop_last
+
+    def _epoch_indices(self):
+        """이번 에폭의 행 순서 (None이면 원래 순서)"""
+        if self.sampler is None:
+            return torch.randperm(len(self.y)) if self.shuffle else None
+        if hasattr(self.sampler, "epoch_indices"):
+            return torch.from_numpy(self.sampler.epoch_indices())
+        if isinstance(self.sampler, WeightedRandomSampler):
+            s = self.sampler
+            return torch.multinomial(s.weights, s.num_samples, s.replacement, generator=s.generator)
+        return torch.as_tensor(list(self.sampler), dtype=torch.long)
+
+    @property
+    def n_rows(self):
+        """한 에폭에 나오는 행 수"""
+        if self.sampler is None:
+            return len(self.y)
+        return self.sampler.num_samples if hasattr(self.sampler, "num_samples") else len(self.sampler)
+
+    def __len__(self):
+        n = self.n_rows
+        return n // self.batch_size if self.drop_last else -(-n // self.batch_size)
+
+    def __iter__(self):
+        idx = self._epoch_indices()
+        n = len(self.y) if idx is None else len(idx)
+        stop = n - n % self.batch_size if self.drop_last else n
+        for start in range(0, stop, self.batch_size):
+            if idx is None:
+                X_batch = self.X[start:start + self.batch_size]
+                y_batch = self.y[start:start + self.batch_size]
+            else:
+                rows = idx[start:start + self.batch_size]
+                X_batch = self.X.index_select(0, rows)
+                y_batch = self.y.index_select(0, rows)
+            if self.pin_memory:
+                X_batch, y_batch = X_batch.pin_memory(), y_batch.pin_memory()
+            yield X_batch, y_batch
+
+
+def make_loaders(X_train, y_train, X_val, y_val, batch_size=1024, use_weighted_sampler=True, pin_memory=False,
+                 pos_ratio=0.5, random_state=42):
+    """
+    학습 데이터로 StandardScaler를 fit하여 스케일링하고 배치 로더(TensorBatchLoader)로 변환합니다.
+    use_weighted_sampler=True면 BalancedBatchSampler로 모든 배치의 이탈 비율을 pos_ratio로 맞춰
+    클래스 불균형(이탈 10:1)을 해결합니다.
+    pin_memory: CUDA 학습 시 배치를 page-locked 메모리로 (TensorBatchLoader 참고)
+    random_state: BalancedBatchSampler 시드 (shuffle 순서는 torch.manual_seed를 따름)
     """
-    X_train, X_val, y_train, y_val = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y
-    )
-    
     scaler = StandardScaler()
     X_train_scaled = scaler.fit_transform(X_train)
     X_val_scaled = scaler.transform(X_val)
     
-    train_dataset = KKBoxDataset(X_train_scaled, y_train)
-    val_dataset = KKBoxDataset(X_val_scaled, y_val)
-    
     if use_weighted_sampler:
-        # 이탈(1) 클래스를 더 자주 샘플링하여 클래스 불균형 해소
-        y_train_np = np.array(y_train)
-        class_counts = np.bincount(y_train_np.astype(int))
-        class_weights = 1.0 / class_counts
-        sample_weights = class_weights[y_train_np.astype(int)]
-        sampler = WeightedRandomSampler(
-            weights=torch.FloatTensor(sample_weights),
-            num_samples=len(sample_weights),
-            replacement=True
-        )
-        train_loader = DataLoader(train_dataset, batch_size=batch_size, sampler=sampler)
-        print(f"WeightedRandomSampler 적용 (이탈:{class_counts[1]}, 정상:{class_counts[0]})")
+        # 이탈(1) 클래스를 더 자주 샘플링하여 클래스 불균형 해소 (배치마다 이탈 비율 pos_ratio)
+        class_counts = np.bincount(np.asarray(y_train).astype(int))
+        sampler = BalancedBatchSampler(y_train, batch_size, pos_ratio=pos_ratio, seed=random_state)
+        train_loader = TensorBatchLoader(X_train_scaled, y_train, batch_size, sampler=sampler, pin_memory=pin_memory)
+        print(f"BalancedBatchSampler 적용 (이탈:{class_counts[1]}, 정상:{class_counts[0]}, 배치 내 이탈 비율 {pos_ratio})")
     else:
-        train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True)
+        train_loader = TensorBatchLoader(X_train_scaled, y_train, batch_size, shuffle=True, pin_memory=pin_memory)
     
-    val_loader = DataLoader(val_dataset, batch_size=batch_size, shuffle=False)
+    val_loader = TensorBatchLoader(X_val_scaled, y_val, batch_size, pin_memory=pin_memory)
     
+    return train_loader, val_loader, scaler
+
+
+def prepare_dl_data(X, y, batch_size=1024, use_weighted_sampler=True, pin_memory=False, pos_ratio=0.5,
+                    random_state=42):
+    """
+    데이터를 8:2로 층화 분할한 뒤 스케일링하고 배치 로더로 변환합니다. (make_loaders 참고)
+    random_state는 분할과 BalancedBatchSampler에 같이 써서 같은 값이면 배치 구성이 재현됩니다.
+    """
+    X_train, X_val, y_train, y_val = train_test_split(
+        X, y, test_size=0.2, random_state=random_state, stratify=y
+    )
+    train_loader, val_loader, scaler = make_loaders(
+        X_train, y_train, X_val, y_val, batch_size, use_weighted_sampler, pin_memory, pos_ratio, random_state
+    )
     return train_loader, val_loader, scaler, X_train.shape[1]
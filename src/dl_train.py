@@ -2,30 +2,84 @@ import torch
 import torch.nn as nn
 import torch.optim as optim
 from tqdm import tqdm
-from sklearn.metrics import average_precision_score, precision_score, recall_score, f1_score, classification_report, confusion_matrix
+from sklearn.metrics import average_precision_score
+import os
+from functools import partial
+
 import numpy as np
 import optuna
 
+from src.dl_model import autocast, compile_model
+from src.tuning import OPTUNA_STORAGE, finished_trials, get_storage, run_processes
+from src.oof import OOF_DIR, fold_split, oof_writer, record_model
+
+# ResNet/LSTM 탐색 study 저장소 (같은 study_name으로 다시 실행하면 남은 trial만 이어서 실행)
+DL_OPTUNA_STORAGE = OPTUNA_STORAGE.with_name("dl_tuning.log")
+# successive halving: 1 에폭부터 시작해 trial의 1/3만 다음 단계(에폭 수 ×3)로 진행
+PRUNER_MIN_EPOCHS = 1
+PRUNER_REDUCTION_FACTOR = 3
+# bf16 / torch.compile 추론이 fp32 eager 대비 이만큼 넘게 Val AP가 다르면 fp32로 추론 (check_ap_parity)
+AP_PARITY_TOLERANCE = 0.002
+
+def predict_loader(model, loader, device='cpu', out=None, bf16=False):
+    """
+    loader 전체의 (예측 확률, 라벨)을 device 위의 1차원 텐서로 모읍니다. (배치마다 CPU/numpy 변환 없음)
+    out: 미리 할당한 (확률, 라벨) 버퍼 (에폭마다 재사용, 없으면 loader.n_rows 크기로 할당)
+    bf16: bfloat16 autocast로 추론 (확률은 fp32 버퍼에 저장)
+    """
+    if out is None:
+        n = loader.n_rows if hasattr(loader, "n_rows") else len(loader.dataset)
+        out = (torch.empty(n, device=device), torch.empty(n, device=device))
+    proba, labels = out
+    model.eval()
+    start = 0
+    with torch.no_grad(), autocast(device, bf16):
+        for X_batch, y_batch in loader:
+            end = start + len(X_batch)
+            proba[start:end] = model(X_batch.to(device, non_blocking=True)).reshape(-1)
+            labels[start:end] = y_batch.reshape(-1).to(device, non_blocking=True)
+            start = end
+    return proba[:start], labels[:start]
+
+
+def average_precision_t(labels, proba):
+    """
+    sklearn average_precision_score와 같은 값을 device 위에서 정렬 한 번으로 계산합니다. (oof.average_precision의 torch 버전)
+    """
+    proba, order = torch.sort(proba, descending=True, stable=True)
+    tp_cum = torch.cumsum(labels[order], 0, dtype=torch.float64)
+    last = torch.nonzero(proba[1:] != proba[:-1]).reshape(-1)   # 같은 점수는 한 임계값으로 묶음
+    last = torch.cat([last, last.new_tensor([len(proba) - 1])])
+    tp = tp_cum[last]
+    if tp[-1] == 0:
+        return 0.0
+    precision = tp / (last + 1)
+    recall = tp / tp[-1]
+    return float(torch.sum(torch.diff(recall, prepend=recall.new_zeros(1)) * precision))
+
+
+def threshold_metrics(labels, proba, thresholds):
+    """임계값별 (precision, recall, f1, tp, 예측 양성 수) 텐서 (임계값 × 행 비교 한 번)"""
+    thresholds = torch.as_tensor(thresholds, dtype=torch.float64, device=proba.device)
+    pred = proba.double()[None, :] >= thresholds[:, None]
+    tp = (pred & (labels[None, :] > 0.5)).sum(1).double()
+    n_pred = pred.sum(1).double()
+    n_pos = (labels > 0.5).sum().double()
+    precision = torch.where(n_pred > 0, tp / n_pred.clamp(min=1), torch.zeros_like(tp))
+    recall = tp / n_pos.clamp(min=1)
+    f1 = torch.where(precision + recall > 0, 2 * precision * recall / (precision + recall).clamp(min=1e-12),
+                     torch.zeros_like(tp))
+    return precision, recall, f1, tp, n_pred
+
+
 def evaluate_dl_model(model, val_loader, device='cpu', threshold=None):
     """
     딥러닝 모델을 평가합니다.
     threshold=None 이면 F1-Score 기준 최적 임계값을 자동 탐색합니다.
+    (예측/라벨은 device 위 텐서에 모으고, AP와 임계값별 지표는 한 번에 계산)
     """
-    model.eval()
-    all_preds_proba = []
-    all_labels = []
-    
-    with torch.no_grad():
-        for X_batch, y_batch in val_loader:
-            X_batch = X_batch.to(device)
-            outputs = model(X_batch)
-            all_preds_proba.extend(outputs.cpu().numpy())
-            all_labels.extend(y_batch.numpy())
-            
-    all_preds_proba = np.array(all_preds_proba).flatten()
-    all_labels = np.array(all_labels).flatten()
-    
-    ap = average_precision_score(all_labels, all_preds_proba)
+    proba, labels = predict_loader(model, val_loader, device)
+    ap = average_precision_t(labels, proba)
     
     if threshold is not None:
         # 확정 임계값 사용 - 탐색 없이 바로 평가
@@ -33,45 +87,48 @@ def evaluate_dl_model(model, val_loader, device='cpu', threshold=None):
     else:
         # 최적 임계값 자동 탐색
         thresholds = np.arange(0.1, 0.95, 0.05)
+        precision, recall, f1, _, _ = (m.tolist() for m in threshold_metrics(labels, proba, thresholds))
         print(f"\n[임계값별 성능 비교]")
         print(f"{'임계값':>8} {'F1':>8} {'Precision':>10} {'Recall':>8}")
         print("-" * 40)
         
         best_thr, best_f1 = 0.5, 0.0
-        for thr in thresholds:
-            preds = (all_preds_proba >= thr).astype(int)
-            p = precision_score(all_labels, preds, zero_division=0)
-            r = recall_score(all_labels, preds, zero_division=0)
-            f1 = f1_score(all_labels, preds, zero_division=0)
-            marker = " <-- 최적" if f1 > best_f1 else ""
-            print(f"{thr:>8.2f} {f1:>8.4f} {p:>10.4f} {r:>8.4f}{marker}")
-            if f1 > best_f1:
-                best_f1, best_thr = f1, thr
+        for thr, p, r, f in zip(thresholds, precision, recall, f1):
+            marker = " <-- 최적" if f > best_f1 else ""
+            print(f"{thr:>8.2f} {f:>8.4f} {p:>10.4f} {r:>8.4f}{marker}")
+            if f > best_f1:
+                best_f1, best_thr = f, thr
 
     # 확정 임계값으로 최종 평가
-    best_preds = (all_preds_proba >= best_thr).astype(int)
-    p_best = precision_score(all_labels, best_preds)
-    r_best = recall_score(all_labels, best_preds)
-    f1_best = f1_score(all_labels, best_preds)
+    precision, recall, f1, tp, n_pred = (float(m[0]) for m in threshold_metrics(labels, proba, [best_thr]))
+    n_pos = float((labels > 0.5).sum())
+    fp, fn = n_pred - tp, n_pos - tp
+    tn = len(labels) - tp - fp - fn
     
     print(f"\n{'='*50}")
     label = f"확정 임계값: {best_thr:.2f}" if threshold is not None else f"최적 임계값: {best_thr:.2f}"
     print(f"[ResNet 최종 평가 결과 - {label}]")
     print(f"{'='*50}")
     print(f"Average Precision (AP): {ap:.4f}")
-    print(f"Precision:              {p_best:.4f}")
-    print(f"Recall:                 {r_best:.4f}")
-    print(f"F1-Score:               {f1_best:.4f}")
+    print(f"Precision:              {precision:.4f}")
+    print(f"Recall:                 {recall:.4f}")
+    print(f"F1-Score:               {f1:.4f}")
     print(f"\n혼동 행렬(Confusion Matrix):")
-    print(confusion_matrix(all_labels, best_preds))
+    print(np.array([[tn, fp], [fn, tp]], dtype=np.int64))
     
-    return {'ap': ap, 'precision': p_best, 'recall': r_best, 'f1': f1_best, 'threshold': best_thr}
+    return {'ap': ap, 'precision': precision, 'recall': recall, 'f1': f1, 'threshold': best_thr}
 
 
-def train_dl_model(model, train_loader, val_loader, epochs=50, lr=0.001, device='cpu', verbose=True):
+def train_dl_model(model, train_loader, val_loader, epochs=50, lr=0.001, device='cpu', verbose=True, eval_every=1,
+                   trial=None, bf16=False, use_compile=False):
     """
     딥러닝 모델을 학습합니다.
     (Early Stopping, LR Scheduler, 메모리 내 최적 가중치 복원)
+    검증은 eval_every 에폭마다(마지막 에폭은 항상) 하며, 예측은 device 위 버퍼에 모아 AP를 한 번에 계산합니다.
+    (LR Scheduler / Early Stopping의 patience는 검증한 에폭 기준)
+    trial: Optuna trial이면 검증한 에폭마다 Val AP를 보고하고, pruner가 판단하면 optuna.TrialPruned로 중단
+    bf16: 학습 step과 검증 추론을 bfloat16 autocast로 실행 (가중치/optimizer 상태/손실은 fp32)
+    use_compile: torch.compile한 모델로 학습/검증 (가중치는 model과 공유, 첫 에폭에 컴파일 시간 추가)
     
     [과적합 방지 핵심]
     - 이전 학습과 완전히 독립: 파일이 아닌 메모리(copy.deepcopy)에 best 가중치 저장
@@ -79,6 +136,7 @@ def train_dl_model(model, train_loader, val_loader, epochs=50, lr=0.001, device=
     """
     import copy
     model.to(device)
+    forward = compile_model(model, use_compile)
     criterion = nn.BCELoss()
     optimizer = optim.Adam(model.parameters(), lr=lr)
     scheduler = optim.lr_scheduler.ReduceLROnPlateau(optimizer, mode='max', factor=0.5, patience=2)
@@ -88,34 +146,34 @@ def train_dl_model(model, train_loader, val_loader, epochs=50, lr=0.001, device=
     patience = 5
     counter = 0
     history = {'val_ap': []}
+    n_val = val_loader.n_rows if hasattr(val_loader, "n_rows") else len(val_loader.dataset)
+    val_buffers = (torch.empty(n_val, device=device), torch.empty(n_val, device=device))  # 에폭마다 재사용
     
     for epoch in range(epochs):
         model.train()
         for X_batch, y_batch in tqdm(train_loader, desc=f"Epoch {epoch+1}/{epochs}", disable=not verbose):
-            X_batch, y_batch = X_batch.to(device), y_batch.to(device)
+            X_batch, y_batch = X_batch.to(device, non_blocking=True), y_batch.to(device, non_blocking=True)
             optimizer.zero_grad()
-            outputs = model(X_batch)
-            loss = criterion(outputs, y_batch)
+            with autocast(device, bf16):
+                outputs = forward(X_batch)
+            loss = criterion(outputs.float(), y_batch)
             loss.backward()
             torch.nn.utils.clip_grad_norm_(model.parameters(), max_norm=1.0)
             optimizer.step()
             
-        # 검증
-        model.eval()
-        all_preds_proba = []
-        all_labels = []
-        with torch.no_grad():
-            for X_batch, y_batch in val_loader:
-                X_batch, y_batch = X_batch.to(device), y_batch.to(device)
-                outputs = model(X_batch)
-                all_preds_proba.extend(outputs.cpu().numpy())
-                all_labels.extend(y_batch.cpu().numpy())
-        
-        val_ap = average_precision_score(all_labels, all_preds_proba)
+        # 검증 (지표가 필요 없는 에폭은 건너뜀)
+        if (epoch + 1) % eval_every and epoch + 1 < epochs:
+            continue
+        val_proba, val_labels = predict_loader(forward, val_loader, device, out=val_buffers, bf16=bf16)
+        val_ap = average_precision_t(val_labels, val_proba)
         history['val_ap'].append(val_ap)
         
         if verbose:
             print(f"Epoch {epoch+1}: Val AP: {val_ap:.4f} (LR: {optimizer.param_groups[0]['lr']:.6f})")
+        if trial is not None:
+            trial.report(val_ap, step=epoch + 1)
+            if trial.should_prune():
+                raise optuna.TrialPruned(f"{epoch+1} 에폭에서 중단 (Val AP: {val_ap:.4f})")
         
         scheduler.step(val_ap)
         
@@ -141,33 +199,150 @@ def train_dl_model(model, train_loader, val_loader, epochs=50, lr=0.001, device=
             
     return best_ap, history
 
-def tune_dl_lr(input_dim, train_loader, val_loader, device='cpu', n_trials=10, model_type='resnet'):
+def _dl_tuning_worker(storage, study_name, n_trials, objective, n_threads=None):
     """
-    Optuna를 사용하여 최적의 Learning Rate를 탐색합니다.
+    탐색 워커. 저장소의 완료+중단 trial 수가 n_trials에 도달할 때까지 objective로 trial을 실행합니다.
+    n_threads: 이 프로세스의 torch 연산 스레드 수 (워커끼리 코어를 나눠 씀)
     """
+    if n_threads is not None:
+        torch.set_num_threads(n_threads)
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    study = optuna.load_study(study_name=study_name, storage=get_storage(storage))
+    stop = optuna.study.MaxTrialsCallback(
+        n_trials, states=(optuna.trial.TrialState.COMPLETE, optuna.trial.TrialState.PRUNED)
+    )
+    if len(finished_trials(study)) < n_trials:
+        study.optimize(objective, callbacks=[stop])
+
+
+def run_dl_tuning(objective, n_trials, max_epochs, study_name, n_workers=None, storage=DL_OPTUNA_STORAGE,
+                  device='cpu', multi_objective=False):
+    """
+    objective(trial)로 Optuna 탐색을 실행하고 study를 반환합니다. (model_train.run_tuning의 딥러닝 버전)
+    - n_workers개의 프로세스가 torch 스레드를 나눠 쓰며 trial을 병렬 실행 (CPU 학습일 때만, GPU는 1개)
+    - 에폭마다 보고한 Val AP로 successive halving(HyperbandPruner, 1 ~ max_epochs 에폭)하여
+      가망 없는 trial은 적은 에폭에서 중단 (다목적 study는 중간값 보고를 지원하지 않아 pruning 없음)
+    - study는 저장소(기본 results/optuna/dl_tuning.log)에 남아, 같은 study_name으로 다시 실행하면 이어서 탐색
+    """
+    n_cores = os.cpu_count() or 1
+    if str(device) != 'cpu':
+        n_workers = 1
+    elif n_workers is None:
+        n_workers = max(1, n_cores // 2)
+    n_workers = max(1, min(n_workers, n_trials))
+    n_threads = max(1, n_cores // n_workers)
+
+    optuna_storage = get_storage(storage)
+    study = optuna.create_study(
+        study_name=study_name, storage=optuna_storage, load_if_exists=True,
+        directions=["maximize", "minimize"] if multi_objective else ["maximize"],
+        pruner=optuna.pruners.HyperbandPruner(min_resource=PRUNER_MIN_EPOCHS, max_resource=max_epochs,
+                                              reduction_factor=PRUNER_REDUCTION_FACTOR)
+    )
+    print(f"study '{study_name}': 완료된 trial {len(finished_trials(study))}개 / 목표 {n_trials}개")
+    print(f"워커 {n_workers}개 × torch 스레드 {n_threads if n_workers > 1 else torch.get_num_threads()}개")
+
+    args = (storage, study_name, n_trials, objective)
+    if n_workers == 1:
+        _dl_tuning_worker(*args)
+    else:
+        run_processes(_dl_tuning_worker, [args + (n_threads,)] * n_workers, "Optuna 워커")
+
+    study = optuna.load_study(study_name=study_name, storage=optuna_storage)
+    states = [t.state for t in study.trials]
+    print(f"trial 완료 {states.count(optuna.trial.TrialState.COMPLETE)}개, "
+          f"중단(pruned) {states.count(optuna.trial.TrialState.PRUNED)}개")
+    return study
+
+
+def _lr_objective(trial, input_dim, train_loader, val_loader, device, model_type, epochs):
+    """tune_dl_lr의 trial: 기본 구조 모델을 epochs 에폭 학습한 Val AP"""
     from src.dl_model import ChurnResNet, ChurnLSTM
+    lr = trial.suggest_float("lr", 1e-4, 5e-2, log=True)
+    if model_type == 'resnet':
+        model = ChurnResNet(input_dim=input_dim).to(device)
+    elif model_type == 'lstm':
+        model = ChurnLSTM(input_dim=input_dim).to(device)
+    else:
+        raise ValueError(f"Unknown model_type: {model_type}")
+    ap, _ = train_dl_model(model, train_loader, val_loader, epochs=epochs, lr=lr, device=device, verbose=False,
+                           trial=trial)
+    return ap
+
+
+def tune_dl_lr(input_dim, train_loader, val_loader, device='cpu', n_trials=10, model_type='resnet', n_workers=None,
+               storage=DL_OPTUNA_STORAGE, study_name=None):
+    """
+    Optuna를 사용하여 최적의 Learning Rate를 탐색합니다.
+    (병렬 워커 / 에폭 단위 pruning / 저장소에서 이어서 탐색: run_dl_tuning 참고)
+    study_name이 없으면 "<model_type>_lr_<input_dim>d" (피처 구성이 다른 탐색과 섞이지 않게,
+    같은 차원의 다른 데이터라면 dl_main처럼 cache_key를 넣은 이름을 넘기세요)
+    """
+    if model_type not in ('resnet', 'lstm'):
+        raise ValueError(f"Unknown model_type: {model_type}")
     print(f"\n[Optuna] {model_type.upper()} 최적의 Learning Rate 탐색 시작 ({n_trials}회 시도)...")
     
-    def objective(trial):
-        lr = trial.suggest_float("lr", 1e-4, 5e-2, log=True)
-        if model_type == 'resnet':
-            model = ChurnResNet(input_dim=input_dim).to(device)
-        elif model_type == 'lstm':
-            model = ChurnLSTM(input_dim=input_dim).to(device)
-        else:
-            raise ValueError(f"Unknown model_type: {model_type}")
-            
-        # 탐색 정밀도를 위해 7 에폭 학습
-        ap, _ = train_dl_model(model, train_loader, val_loader, epochs=7, lr=lr, device=device, verbose=False)
-        return ap
-
-    study = optuna.create_study(direction="maximize")
-    study.optimize(objective, n_trials=n_trials)
+    # 탐색 정밀도를 위해 최대 7 에폭 학습
+    epochs = 7
+    objective = partial(_lr_objective, input_dim=input_dim, train_loader=train_loader, val_loader=val_loader,
+                        device=device, model_type=model_type, epochs=epochs)
+    study = run_dl_tuning(objective, n_trials, epochs, study_name or f"{model_type}_lr_{input_dim}d", n_workers, storage, device)
     
     print(f"탐색 완료! 최적의 Learning Rate: {study.best_params['lr']:.6f}")
     return study.best_params['lr']
 
-def finetune_resnet(input_dim, train_loader, val_loader, device='cpu', n_trials=20):
+
+def _resnet_latency_ms(model, X_bench, device):
+    """
+    X_bench 배치 추론 지연 (ms): CPU는 LATENCY_THREADS 스레드로 고정하고(측정 후 복원),
+    CUDA는 커널이 끝날 때까지 기다려(synchronize) 잽니다.
+    """
+    from src.model_train import LATENCY_THREADS, measure_latency_ms
+    device = torch.device(device)
+    sync = torch.cuda.synchronize if device.type == "cuda" else None
+    n_threads = torch.get_num_threads()
+    torch.set_num_threads(LATENCY_THREADS)
+    model.eval()
+    try:
+        with torch.no_grad():
+            return measure_latency_ms(lambda: model(X_bench), sync=sync)
+    finally:
+        torch.set_num_threads(n_threads)
+
+
+def _finetune_objective(trial, input_dim, train_loader, val_loader, device, epochs, X_bench=None, model_dir=None):
+    """
+    finetune_resnet의 trial: Val AP (X_bench가 있으면 (AP, X_bench 배치 추론 지연 ms))
+    다목적이면 탐색 후 재측정할 수 있도록 가중치를 model_dir에 저장합니다.
+    """
+    from src.dl_model import ChurnResNet
+    from src.model_train import trial_model_path
+    lr         = trial.suggest_float("lr",         1e-4, 3e-2,  log=True)
+    hidden_dim = trial.suggest_categorical("hidden_dim", [128, 256, 512])
+    num_blocks = trial.suggest_int("num_blocks",   3, 6)
+    dropout    = trial.suggest_float("dropout",    0.1, 0.4)
+    
+    # 매 trial마다 완전히 새로운 모델 (이전 학습 영향 없음)
+    model = ChurnResNet(
+        input_dim=input_dim,
+        hidden_dim=hidden_dim,
+        num_blocks=num_blocks,
+        dropout=dropout
+    ).to(device)
+    
+    # 다목적 study는 중간값 보고(pruning)를 지원하지 않음
+    ap, _ = train_dl_model(
+        model, train_loader, val_loader,
+        epochs=epochs, lr=lr, device=device, verbose=False, trial=trial if X_bench is None else None
+    )
+    if X_bench is None:
+        return ap
+    torch.save(model.state_dict(), trial_model_path(model_dir, trial.number, ".pt"))
+    return ap, _resnet_latency_ms(model, X_bench, device)
+
+
+def finetune_resnet(input_dim, train_loader, val_loader, device='cpu', n_trials=20, multi_objective=False,
+                    latency_budget_ms=None, n_workers=None, storage=DL_OPTUNA_STORAGE, study_name=None):
     """
     ResNet의 모든 핵심 하이퍼파라미터를 동시에 Optuna로 최적화합니다. (Full Fine-tuning)
     
@@ -176,42 +351,129 @@ def finetune_resnet(input_dim, train_loader, val_loader, device='cpu', n_trials=
     - hidden_dim : 레이어 너비 (128 / 256 / 512)
     - num_blocks : Residual Block 개수 (3 / 4 / 5 / 6)
     - dropout    : 드롭아웃 비율 (0.1 ~ 0.4)
+
+    trial은 n_workers개 프로세스에서 병렬로 실행하고, 에폭마다 Val AP를 보고해 successive halving으로
+    가망 없는 구조는 적은 에폭에서 중단합니다. study는 저장소에 남아 중단 후 다시 실행하면 이어서 탐색합니다.
+    (run_dl_tuning 참고)
+
+    multi_objective=True면 검증 AP와 고정 벤치마크 배치(검증 첫 배치) 추론 지연을 함께 최적화하고,
+    Pareto 최적 trial 표를 results/optuna/<study_name>_pareto.csv로 저장합니다.
+    (latency_budget_ms 이내 후보 중 AP가 가장 높은 trial 선택, model_train.select_trial / pruning 없음)
+    지연은 병렬 워커의 학습과 겹쳐 잰 값이므로, 탐색 후 Pareto 후보만 차례로 다시 측정합니다. (model_train.retime_pareto)
+
+    study_name이 없으면 "resnet_finetune_[latency_]<input_dim>d" (dl_main은 데이터 cache_key를 넣은 이름 사용)
     """
-    import copy
     from src.dl_model import ChurnResNet
+    from src.model_train import (
+        LATENCY_BATCH_ROWS, candidate_dir, pareto_path, pareto_table, retime_pareto, select_trial, trial_model_path,
+    )
     print(f"\n[Full Fine-tuning] ResNet 전체 구조 최적화 시작 ({n_trials}회 시도)...")
-    print("탐색 파라미터: lr, hidden_dim, num_blocks, dropout")
+    print("탐색 파라미터: lr, hidden_dim, num_blocks, dropout"
+          + (f" (다목적: AP + {LATENCY_BATCH_ROWS}행 배치 추론 지연)" if multi_objective else ""))
+    X_bench = next(iter(val_loader))[0][:LATENCY_BATCH_ROWS].to(device) if multi_objective else None
     
-    def objective(trial):
-        lr         = trial.suggest_float("lr",         1e-4, 3e-2,  log=True)
-        hidden_dim = trial.suggest_categorical("hidden_dim", [128, 256, 512])
-        num_blocks = trial.suggest_int("num_blocks",   3, 6)
-        dropout    = trial.suggest_float("dropout",    0.1, 0.4)
-        
-        # 매 trial마다 완전히 새로운 모델 (이전 학습 영향 없음)
-        model = ChurnResNet(
-            input_dim=input_dim,
-            hidden_dim=hidden_dim,
-            num_blocks=num_blocks,
-            dropout=dropout
-        ).to(device)
-        
-        # 탐색 당 10 에폭 (정확도와 속도의 균형)
-        ap, _ = train_dl_model(
-            model, train_loader, val_loader,
-            epochs=10, lr=lr, device=device, verbose=False
-        )
-        return ap
+    # 탐색 당 최대 10 에폭 (정확도와 속도의 균형)
+    epochs = 10
+    study_name = study_name or f"resnet_finetune_{'latency_' if multi_objective else ''}{input_dim}d"
+    model_dir = candidate_dir(storage, study_name) if multi_objective else None
+    objective = partial(_finetune_objective, input_dim=input_dim, train_loader=train_loader, val_loader=val_loader,
+                        device=device, epochs=epochs, X_bench=X_bench, model_dir=model_dir)
+    study = run_dl_tuning(objective, n_trials, epochs, study_name, n_workers, storage, device, multi_objective)
 
-    study = optuna.create_study(direction="maximize")
-    study.optimize(objective, n_trials=n_trials)
-    
-    best = study.best_params
+    if multi_objective:
+        def measure(trial):
+            path = trial_model_path(model_dir, trial.number, ".pt")
+            if not path.exists():
+                return None
+            model = ChurnResNet(input_dim=input_dim, hidden_dim=trial.params["hidden_dim"],
+                                num_blocks=trial.params["num_blocks"], dropout=trial.params["dropout"]).to(device)
+            model.load_state_dict(torch.load(path, map_location=device))
+            return _resnet_latency_ms(model, X_bench, device)
+
+        trials = retime_pareto(study, measure, model_dir)
+        front = pareto_table(trials)
+        path = pareto_path(storage, study_name)
+        front.to_csv(path, index=False)
+        print(f"\n[Pareto] AP-추론 지연 최적 trial {len(front)}개 (지연 재측정) → {path}")
+        print(front.to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+        chosen = select_trial(trials, latency_budget_ms)
+        best, best_ap = chosen.params, chosen.values[0]
+    else:
+        best, best_ap = study.best_params, study.best_value
     print(f"\n[Fine-tuning 완료] 최적 하이퍼파라미터:")
     print(f"  lr         = {best['lr']:.6f}")
     print(f"  hidden_dim = {best['hidden_dim']}")
     print(f"  num_blocks = {best['num_blocks']}")
     print(f"  dropout    = {best['dropout']:.2f}")
-    print(f"  Best Val AP (10 epoch)  = {study.best_value:.4f}")
+    print(f"  Best Val AP ({epochs} epoch)  = {best_ap:.4f}")
     
     return best
+
+
+def predict_dl_proba(model, X_scaled, batch_size=8192, device='cpu', bf16=False):
+    """
+    스케일링된 2차원 배열을 배치 단위로 추론하여 이탈 확률(1차원 ndarray)을 반환합니다.
+    bf16: bfloat16 autocast로 추론 (model은 compile_model로 컴파일한 모듈이어도 됨)
+    """
+    model.eval()
+    X_tensor = torch.as_tensor(np.asarray(X_scaled, dtype=np.float32))
+    out = np.empty(len(X_tensor), dtype=np.float32)
+    with torch.no_grad(), autocast(device, bf16):
+        for start in range(0, len(X_tensor), batch_size):
+            batch = X_tensor[start:start + batch_size].to(device)
+            out[start:start + batch_size] = model(batch).float().cpu().numpy().ravel()
+    return out
+
+
+def check_ap_parity(model, val_loader, device='cpu', bf16=False, use_compile=False, tolerance=AP_PARITY_TOLERANCE):
+    """
+    bf16 autocast / torch.compile 추론이 fp32 eager 추론과 같은 Val AP를 내는지 확인합니다.
+    반환: {'ap_fp32', 'ap_fast', 'max_abs_diff'(확률 최대 차이), 'ok'(AP 차이 <= tolerance)}
+    """
+    proba, labels = predict_loader(model, val_loader, device)
+    fast_proba, _ = predict_loader(compile_model(model, use_compile), val_loader, device, bf16=bf16)
+    result = {
+        'ap_fp32': average_precision_t(labels, proba),
+        'ap_fast': average_precision_t(labels, fast_proba),
+        'max_abs_diff': float((fast_proba - proba).abs().max()),
+    }
+    result['ok'] = abs(result['ap_fast'] - result['ap_fp32']) <= tolerance
+    mode = "+".join(name for name, on in (("bf16", bf16), ("compile", use_compile)) if on) or "fp32"
+    print(f"[AP 검증] fp32 {result['ap_fp32']:.4f} / {mode} {result['ap_fast']:.4f} "
+          f"(확률 최대 차이 {result['max_abs_diff']:.2e}, 허용 AP 차이 {tolerance}) → "
+          + ("통과" if result['ok'] else "실패: fp32 추론 사용"))
+    return result
+
+
+def train_resnet_kfold(X, y, folds, model_params, lr, epochs=50, batch_size=1024, device='cpu', oof_dir=OOF_DIR):
+    """
+    층화 k-fold(folds: oof.open_store의 행별 fold 번호)로 ResNet을 학습하여 OOF 예측을 저장합니다.
+    fold마다 스케일러를 새로 fit하고, 학습 fold의 일부로 early stopping 합니다. (OOF 행은 학습/선택에 미사용)
+    model_params: ChurnResNet 인자 (hidden_dim, num_blocks, dropout)
+    반환: fold별 OOF AP 목록
+    """
+    from src.dl_model import ChurnResNet
+    from src.dl_preprocessing import make_loaders
+
+    y = np.asarray(y)
+    n_splits = int(folds.max()) + 1
+    print(f"\n[K-Fold] ResNet {n_splits}-fold 학습")
+    oof = oof_writer("resnet", oof_dir)
+    fold_ap = []
+    for k in range(n_splits):
+        fit_idx, stop_idx, oof_idx = fold_split(folds, y, k)
+        train_loader, val_loader, scaler = make_loaders(
+            X.iloc[fit_idx], y[fit_idx], X.iloc[stop_idx], y[stop_idx], batch_size, use_weighted_sampler=False,
+            pin_memory=torch.device(device).type == "cuda"
+        )
+        model = ChurnResNet(input_dim=X.shape[1], **model_params).to(device)
+        train_dl_model(model, train_loader, val_loader, epochs=epochs, lr=lr, device=device, verbose=False)
+        oof[oof_idx] = predict_dl_proba(model, scaler.transform(X.iloc[oof_idx]), device=device)
+        fold_ap.append(average_precision_score(y[oof_idx], oof[oof_idx]))
+        print(f"  fold {k}: OOF {len(oof_idx):,}행 저장 (AP: {fold_ap[-1]:.4f})")
+    oof.flush()
+
+    total_ap = average_precision_score(y, oof)
+    record_model("resnet", {"params": {**model_params, "lr": lr}, "fold_ap": fold_ap, "ap": total_ap}, oof_dir)
+    print(f"전체 OOF AP: {total_ap:.4f}")
+    return fold_ap
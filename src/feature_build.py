@@ -0,0 +1,807 @@
+"""
+feature_build.py - 원본 KKBox CSV로부터 모델링용 데이터(kkbox_v3.parquet)를 생성합니다.
+
+EDA.ipynb의 txn_agg / log_agg / members 병합 로직을 그대로 재현하되,
+CSV를 청크 단위로 스트리밍 집계하여 원본 로그 전체를 메모리에 올리지 않습니다.
+(메모리 사용량은 로그 행 수가 아니라 train 유저 수에 비례)
+
+전체 빌드 시 msno별 병합 가능한 집계 state(sum/count/max)를 data/feature_state/에 저장하며,
+이후 새로 들어온 일별 파일은 --update-logs / --update-txn 으로 state에 누적하고
+변경된 유저의 행만 다시 계산합니다. (전체 이력 재집계 불필요)
+
+msno 문자열은 청크를 읽는 즉시 영구 사전(msno_dict)의 int32 id로 바꾸고,
+이후 groupby와 train/transactions/logs/members 병합은 정렬된 정수 키 위에서 수행합니다.
+
+결제 순서 피처(마지막 플랜/만료일, 만료 → 다음 결제 간격, 플랜 변경 횟수)는
+같은 transactions 패스에서 인코딩된 청크를 msno_id 범위별 임시 parquet로 내려 두고,
+범위마다 (msno_id, transaction_date) 안정 정렬 한 번과 구간별 numpy reduce로 계산합니다.
+(유저별 Python 루프 없음, 원본 transactions 전체를 메모리에 올리지 않음)
+
+결제 관련 결측치(KNN_COLS)용 IterativeImputer는 최대 IMPUTER_SAMPLE행 표본으로 한 번만 학습해
+data/feature_state/imputer.pkl로 저장하고, 이후 빌드/증분 업데이트/추론 변환기(FeatureTransformer)에서
+재학습 없이 결측 행에만 청크 단위로 적용합니다. (--refit-imputer로 다시 학습)
+
+최근 7/14/30일 윈도우 로그 피처는 같은 스트리밍 패스에서 기준일(as-of, 기본값: 로그의 마지막 날짜)
+이전 RECENCY_CAP일의 (msno_id, 날짜)별 sum/count만 일별 state로 누적하고, 이를 경과 일수
+구간(0~6, 7~13, 14~29일)으로 묶은 뒤 구간 축 누적합(cumsum)으로 세 윈도우를 한 번에 만듭니다.
+(윈도우마다 groupby 반복 없음)
+증분 업데이트는 기준일을 새 로그의 마지막 날짜까지 옮기고, 일별 state로 전체 유저의 윈도우/경과 일수/
+만료 잔여일을 다시 계산합니다. (전체 빌드 기본값과 같은 결과)
+
+사용법:
+    PYTHONPATH=. python src/feature_build.py
+    PYTHONPATH=. python src/feature_build.py --raw-dir data/raw --chunk-size 500000
+    PYTHONPATH=. python src/feature_build.py --as-of 20170331
+    PYTHONPATH=. python src/feature_build.py --update-logs data/raw/user_logs_20170401.csv
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from src.data_loader import SCHEMAS, apply_schema, to_day_number
+from src.msno_dict import load_msno_dict, save_msno_dict, extend_msno_dict, encode_msno, decode_msno
+
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+RAW_DIR = ROOT_DIR / "data" / "raw"
+OUTPUT_PATH = ROOT_DIR / "data" / "kkbox_v3.parquet"
+STATE_DIR = ROOT_DIR / "data" / "feature_state"
+
+# 한 번에 읽어들일 CSV 행 수 (메모리 상한을 결정)
+CHUNK_SIZE = 1_000_000
+
+# 출력 parquet의 row group 크기 (load_data의 컬럼/필터/샘플 pushdown 단위)
+ROW_GROUP_SIZE = 50_000
+
+TRAIN_FILE = "train_v2.csv"
+TXN_FILE = "transactions_v2.csv"
+LOG_FILE = "user_logs_v2.csv"
+MEMBERS_FILE = "members_v3.csv"
+
+TXN_STATE_FILE = "txn_state.parquet"
+TXN_SEQ_STATE_FILE = "txn_seq_state.parquet"
+LOG_STATE_FILE = "log_state.parquet"
+LOG_DAILY_STATE_FILE = "log_daily_state.parquet"
+IMPUTER_FILE = "imputer.pkl"
+
+# 결제 순서 요약을 계산할 msno_id 범위 파티션 수 (한 번에 메모리에 올리는 transactions 행 ≈ 전체 / 파티션 수)
+SEQ_PARTITIONS = 16
+
+# imputer 학습에 쓰는 최대 표본 행 수
+IMPUTER_SAMPLE = 100_000
+LOG_META_FILE = "log_meta.json"
+
+# 청크 단위로 읽을 컬럼과 dtype (필요한 컬럼만, 최소 크기로)
+TXN_DTYPES = {
+    "msno": "object",
+    "payment_plan_days": "int16",
+    "actual_amount_paid": "int32",
+    "is_auto_renew": "int8",
+    "transaction_date": "int32",
+    "membership_expire_date": "int32",
+    "is_cancel": "int8",
+}
+LOG_DTYPES = {
+    "msno": "object",
+    "date": "int32",
+    "num_25": "int32",
+    "num_50": "int32",
+    "num_75": "int32",
+    "num_985": "int32",
+    "num_100": "int32",
+    "num_unq": "int32",
+    "total_secs": "float64",
+}
+MEMBERS_DTYPES = {
+    "msno": "object",
+    "city": "float32",
+    "bd": "float32",
+    "gender": "object",
+    "registered_via": "float32",
+    "registration_init_time": "float64",
+}
+
+# 부분 집계(state)에서 sum이 아니라 max로 병합해야 하는 컬럼
+TXN_MAX_COLS = ["duration_max"]
+
+LOG_COLS = [
+    "total_secs_mean", "num_unq_mean",
+    "num_100_sum", "num_985_sum",
+    "num_75_sum", "num_50_sum", "num_25_sum"
+]
+# 최근 N일 윈도우 로그 피처 (윈도우별로 전체 기간 로그 통계와 같은 항목, 컬럼명 <항목>_<N>d)
+# 출력 dtype은 data_loader가 기준 항목의 dtype으로 정함 (with_window_columns)
+LOG_WINDOWS = (7, 14, 30)
+# 윈도우 구간별로 누적하는 로그 값 (구간 b: LOG_WINDOWS[b-1] <= 경과 일수 < LOG_WINDOWS[b])
+LOG_WINDOW_STATS = ["total_secs", "num_unq", "num_100", "num_985", "num_75", "num_50", "num_25"]
+LOG_WINDOW_COLS = [
+    f"{col}_{w}d"
+    for w in LOG_WINDOWS
+    for col in ["total_secs_sum", "total_secs_mean", "num_unq_mean",
+                "num_100_sum", "num_985_sum", "num_75_sum", "num_50_sum", "num_25_sum"]
+]
+# 마지막 활동 이후 경과 일수 (가장 긴 윈도우 밖이거나 로그가 없으면 LOG_WINDOWS[-1] + 1)
+RECENCY_COL = "days_since_last_log"
+RECENCY_CAP = LOG_WINDOWS[-1] + 1
+
+KNN_COLS = [
+    "txn_cnt", "total_paid", "avg_paid", "avg_plan_days",
+    "auto_renew_rate", "cancel_rate", "total_cancel",
+    "avg_duration", "max_duration", "total_secs_sum"
+]
+CAT_COLS = ["city", "gender", "registered_via", "age_group"]
+
+# 결제 순서 피처 (결제 이력이 없으면 0)
+TXN_SEQ_COLS = [
+    "last_plan_days", "last_paid", "last_auto_renew", "last_cancel",
+    "days_to_expire", "renewal_gap_mean", "renewal_gap_max", "plan_change_cnt"
+]
+
+
+def iter_csv(filepath, dtypes, chunk_size=CHUNK_SIZE):
+    """필요한 컬럼만 지정 dtype으로 청크 단위로 읽습니다."""
+    return pd.read_csv(filepath, usecols=list(dtypes), dtype=dtypes, chunksize=chunk_size)
+
+
+def merge_partials(parts, max_cols=()):
+    """
+    msno_id 인덱스를 가진 부분 집계 결과들을 하나로 합칩니다.
+    sum/count 컬럼은 더하고, max_cols는 최댓값을 취합니다. (결과는 msno_id 정렬)
+    """
+    merged = pd.concat(parts)
+    agg = {col: ("max" if col in max_cols else "sum") for col in merged.columns}
+    return merged.groupby(level=0, sort=True).agg(agg)
+
+
+def sort_merge_left(left_ids, right):
+    """
+    정렬된 정수 키 기준 left join.
+    right는 msno_id로 정렬된 인덱스를 가져야 하며, 매칭되지 않는 행은 NaN이 됩니다.
+    (해시 테이블 없이 searchsorted 한 번으로 위치를 찾음)
+    """
+    right_ids = right.index.to_numpy()
+    if len(right_ids) == 0:
+        return pd.DataFrame(np.nan, index=range(len(left_ids)), columns=right.columns)
+    pos = np.searchsorted(right_ids, left_ids)
+    pos = np.minimum(pos, len(right_ids) - 1)
+    matched = right_ids[pos] == left_ids
+    return right.iloc[pos].reset_index(drop=True).where(pd.Series(matched), axis=0)
+
+
+def txn_partial(chunk):
+    """transactions 청크 → msno별 병합 가능한 부분 집계(sum/count/max)"""
+    chunk = chunk.assign(
+        membership_duration=to_day_number(chunk["membership_expire_date"])
+        - to_day_number(chunk["transaction_date"])
+    )
+    return chunk.groupby("msno_id", sort=True).agg(
+        txn_cnt=("transaction_date", "count"),
+        paid_sum=("actual_amount_paid", "sum"),
+        plan_days_sum=("payment_plan_days", "sum"),
+        auto_renew_sum=("is_auto_renew", "sum"),
+        cancel_sum=("is_cancel", "sum"),
+        duration_sum=("membership_duration", "sum"),
+        duration_max=("membership_duration", "max"),
+    )
+
+
+def log_partial(chunk):
+    """user_logs 청크 → msno별 병합 가능한 전체 기간 부분 집계(sum/count)"""
+    return chunk.groupby("msno_id", sort=True).agg(
+        log_cnt=("total_secs", "count"),
+        total_secs_sum=("total_secs", "sum"),
+        num_unq_sum=("num_unq", "sum"),
+        num_100_sum=("num_100", "sum"),
+        num_985_sum=("num_985", "sum"),
+        num_75_sum=("num_75", "sum"),
+        num_50_sum=("num_50", "sum"),
+        num_25_sum=("num_25", "sum"),
+    )
+
+
+def log_daily_partial(chunk, min_day):
+    """
+    user_logs 청크 → (msno_id, day)별 윈도우 통계 sum과 로그 수(cnt).
+    min_day(일 번호) 이전 날짜는 어떤 윈도우/경과 일수에도 쓰이지 않으므로 버립니다.
+    """
+    day = to_day_number(chunk["date"])
+    keep = day >= min_day
+    return (
+        chunk.loc[keep, ["msno_id"] + LOG_WINDOW_STATS]
+        .assign(day=day[keep], cnt=1)
+        .groupby(["msno_id", "day"], sort=True).sum()
+    )
+
+
+def merge_daily(parts, min_day=None):
+    """일별 부분 집계들을 (msno_id, day)별로 더하고, min_day 이전 날짜는 버립니다."""
+    merged = pd.concat(parts).groupby(level=["msno_id", "day"], sort=True).sum()
+    if min_day is not None:
+        merged = merged[merged.index.get_level_values("day") >= min_day]
+    return merged
+
+
+def daily_min_day(as_of):
+    """기준일 as_of에서 윈도우/경과 일수 계산에 필요한 가장 이른 날짜 (경과 일수 RECENCY_CAP - 1일까지)"""
+    return as_of - (RECENCY_CAP - 1)
+
+
+def log_window_state(daily, as_of):
+    """
+    일별 state → 기준일(as_of, 일 번호) 대비 경과 일수 구간별 sum/count ({값}_b{구간}, cnt_b{구간})와
+    기준일 이전 마지막 활동일(last_day). (기준일 이후 날짜는 제외)
+    """
+    days = daily.index.get_level_values("day").to_numpy()
+    days_ago = as_of - days
+    bucket = np.searchsorted(LOG_WINDOWS, days_ago, side="right")
+    recent = (days_ago >= 0) & (bucket < len(LOG_WINDOWS))
+
+    # (msno_id, 구간) 한 번의 groupby → 구간을 컬럼으로 펼침
+    windowed = (
+        daily[recent].reset_index("day", drop=True)
+        .assign(bucket=bucket[recent])
+        .groupby(["msno_id", "bucket"], sort=True).sum()
+        .unstack("bucket", fill_value=0)
+        .reindex(columns=pd.MultiIndex.from_product(
+            [LOG_WINDOW_STATS + ["cnt"], range(len(LOG_WINDOWS))]), fill_value=0)
+    )
+    windowed.columns = [f"{col}_b{b}" for col, b in windowed.columns]
+    last_day = (
+        pd.Series(days, index=daily.index.get_level_values("msno_id"), name="last_day")[days_ago >= 0]
+        .groupby(level=0).max()
+    )
+    # last_day가 있는 유저 ⊇ 윈도우 구간이 있는 유저 (경과 일수 30일은 윈도우 밖)
+    windowed = windowed.reindex(last_day.index, fill_value=0)
+    windowed["last_day"] = last_day.astype("float64")
+    return windowed
+
+
+def finalize_txn(state):
+    """부분 집계 state → 노트북의 txn_agg 컬럼"""
+    cnt = state["txn_cnt"]
+    return pd.DataFrame({
+        "txn_cnt": cnt,
+        "total_paid": state["paid_sum"],
+        "avg_paid": state["paid_sum"] / cnt,
+        "avg_plan_days": state["plan_days_sum"] / cnt,
+        "auto_renew_rate": state["auto_renew_sum"] / cnt,
+        "cancel_rate": state["cancel_sum"] / cnt,
+        "total_cancel": state["cancel_sum"],
+        "avg_duration": state["duration_sum"] / cnt,
+        "max_duration": state["duration_max"],
+    }, index=state.index)
+
+
+def txn_unit_sequences(rows):
+    """
+    transactions 행 → 행 하나짜리 결제 순서 요약.
+    요약 = 구간의 첫/마지막 결제 정보 + 구간 내부의 갱신 간격 합/개수/최댓값, 플랜 변경 횟수
+    """
+    txn_day = to_day_number(rows["transaction_date"])
+    plan = rows["payment_plan_days"].to_numpy()
+    n = len(rows)
+    return pd.DataFrame({
+        "first_day": txn_day,
+        "first_plan": plan,
+        "last_day": txn_day,
+        "last_expire": to_day_number(rows["membership_expire_date"]),
+        "last_plan": plan,
+        "last_paid": rows["actual_amount_paid"].to_numpy(),
+        "last_auto_renew": rows["is_auto_renew"].to_numpy(),
+        "last_cancel": rows["is_cancel"].to_numpy(),
+        "gap_sum": np.zeros(n),
+        "gap_cnt": np.zeros(n, dtype=np.int32),
+        "gap_max": np.full(n, -np.inf),
+        "plan_change_cnt": np.zeros(n, dtype=np.int32),
+    }, index=pd.Index(rows["msno_id"].to_numpy(), name="msno_id"))
+
+
+def combine_sequences(summary):
+    """
+    결제 순서 요약들을 msno_id별로 시간 순서대로 이어 붙입니다.
+    (msno_id, first_day) 안정 정렬 한 번 후, 같은 유저의 이웃한 요약 사이에서
+    갱신 간격(다음 결제일 - 이전 만료일)과 플랜 변경 여부를 구하고 구간별로 reduce 합니다.
+    """
+    if len(summary) == 0:
+        return summary.iloc[:0].copy()
+    order = np.lexsort((summary["first_day"].to_numpy(), summary.index.to_numpy()))
+    s = summary.iloc[order]
+    ids = s.index.to_numpy()
+
+    same = ids[1:] == ids[:-1]
+    is_start = np.r_[True, ~same]
+    starts = np.flatnonzero(is_start)
+    ends = np.r_[starts[1:], len(ids)] - 1
+    seg = np.cumsum(is_start) - 1
+    n = len(starts)
+
+    # 이웃한 두 요약 사이의 값 (다른 유저끼리는 무시)
+    gap = np.where(same, s["first_day"].to_numpy()[1:] - s["last_expire"].to_numpy()[:-1], 0)
+    change = same & (s["first_plan"].to_numpy()[1:] != s["last_plan"].to_numpy()[:-1])
+    pair_max = np.r_[-np.inf, np.where(same, gap, -np.inf)]
+
+    first = s.iloc[starts]
+    last = s.iloc[ends]
+    return pd.DataFrame({
+        "first_day": first["first_day"].to_numpy(),
+        "first_plan": first["first_plan"].to_numpy(),
+        "last_day": last["last_day"].to_numpy(),
+        "last_expire": last["last_expire"].to_numpy(),
+        "last_plan": last["last_plan"].to_numpy(),
+        "last_paid": last["last_paid"].to_numpy(),
+        "last_auto_renew": last["last_auto_renew"].to_numpy(),
+        "last_cancel": last["last_cancel"].to_numpy(),
+        "gap_sum": np.bincount(seg, s["gap_sum"], n) + np.bincount(seg[1:], gap, n),
+        "gap_cnt": (np.bincount(seg, s["gap_cnt"], n) + np.bincount(seg[1:], same, n)).astype(np.int32),
+        "gap_max": np.maximum.reduceat(np.maximum(s["gap_max"].to_numpy(), pair_max), starts),
+        "plan_change_cnt": (np.bincount(seg, s["plan_change_cnt"], n)
+                            + np.bincount(seg[1:], change, n)).astype(np.int32),
+    }, index=pd.Index(ids[starts], name="msno_id"))
+
+
+def finalize_txn_sequence(state, as_of):
+    """결제 순서 요약 → 결제 순서 피처 (만료일은 기준일 대비 남은 일수)"""
+    has_gap = state["gap_cnt"] > 0
+    return pd.DataFrame({
+        "last_plan_days": state["last_plan"],
+        "last_paid": state["last_paid"],
+        "last_auto_renew": state["last_auto_renew"],
+        "last_cancel": state["last_cancel"],
+        "days_to_expire": state["last_expire"] - as_of,
+        "renewal_gap_mean": (state["gap_sum"] / state["gap_cnt"]).where(has_gap),
+        "renewal_gap_max": state["gap_max"].where(has_gap),
+        "plan_change_cnt": state["plan_change_cnt"],
+    }, index=state.index)
+
+
+def finalize_log(state, daily, as_of):
+    """부분 집계 state + 일별 state → 노트북의 log_agg 컬럼 + 최근 윈도우 컬럼"""
+    cnt = state["log_cnt"]
+    lifetime = pd.DataFrame({
+        "total_secs_sum": state["total_secs_sum"],
+        "total_secs_mean": state["total_secs_sum"] / cnt,
+        "num_unq_mean": state["num_unq_sum"] / cnt,
+        "num_100_sum": state["num_100_sum"],
+        "num_985_sum": state["num_985_sum"],
+        "num_75_sum": state["num_75_sum"],
+        "num_50_sum": state["num_50_sum"],
+        "num_25_sum": state["num_25_sum"],
+    }, index=state.index)
+    windows = log_window_state(daily, as_of).reindex(state.index)
+    windows = windows.fillna({c: 0 for c in windows.columns if c != "last_day"})
+    return pd.concat([lifetime, finalize_log_windows(windows, as_of)], axis=1)
+
+
+def finalize_log_windows(state, as_of):
+    """
+    구간별 sum/count(log_window_state) → 최근 7/14/30일 윈도우 통계.
+    구간 축 누적합으로 모든 윈도우를 한 번에 계산합니다. (윈도우 k = 구간 0..k의 합)
+    """
+    n = len(LOG_WINDOWS)
+
+    def cumulative(col):
+        return state[[f"{col}_b{b}" for b in range(n)]].to_numpy(dtype=np.float64).cumsum(axis=1)
+
+    cnt = cumulative("cnt")
+    safe_cnt = np.where(cnt > 0, cnt, 1)
+    secs, unq = cumulative("total_secs"), cumulative("num_unq")
+    plays = {col: cumulative(col) for col in ["num_100", "num_985", "num_75", "num_50", "num_25"]}
+
+    out = {}
+    for k, w in enumerate(LOG_WINDOWS):
+        out[f"total_secs_sum_{w}d"] = secs[:, k]
+        out[f"total_secs_mean_{w}d"] = secs[:, k] / safe_cnt[:, k]
+        out[f"num_unq_mean_{w}d"] = unq[:, k] / safe_cnt[:, k]
+        for col, values in plays.items():
+            out[f"{col}_sum_{w}d"] = values[:, k]
+    out[RECENCY_COL] = np.minimum(as_of - state["last_day"].to_numpy(), RECENCY_CAP)
+    return pd.DataFrame(out, index=state.index)[LOG_WINDOW_COLS + [RECENCY_COL]]
+
+
+def find_log_as_of(filepath, chunk_size=CHUNK_SIZE):
+    """로그 파일의 마지막 날짜(일 번호)를 date 컬럼만 읽어 찾습니다. (--as-of 미지정 시)"""
+    last = max(chunk["date"].max() for chunk in iter_csv(filepath, {"date": "int32"}, chunk_size))
+    return int(to_day_number([last])[0])
+
+
+def fill_log_cols(df):
+    """로그가 없는 유저 no_log_flag 생성, 로그/윈도우 컬럼 0 채움, 경과 일수는 RECENCY_CAP"""
+    df["no_log_flag"] = df[LOG_COLS].isna().all(axis=1).astype(int)
+    df[LOG_COLS + LOG_WINDOW_COLS] = df[LOG_COLS + LOG_WINDOW_COLS].fillna(0)
+    df[RECENCY_COL] = df[RECENCY_COL].fillna(RECENCY_CAP)
+    return df
+
+
+def fill_txn_seq_cols(df):
+    """결제 이력이 없는 유저의 결제 순서 피처를 0으로 채웁니다."""
+    df[TXN_SEQ_COLS] = df[TXN_SEQ_COLS].fillna(0)
+    return df
+
+
+def iter_encoded(filepath, dtypes, msno_dict, chunk_size=CHUNK_SIZE):
+    """
+    CSV 청크의 msno를 msno_id로 바꿔 돌려줍니다.
+    사전(train 유저)에 없는 유저는 어차피 left join에서 버려지므로 청크 단계에서 먼저 걸러냅니다.
+    """
+    for chunk in iter_csv(filepath, dtypes, chunk_size):
+        ids = encode_msno(chunk["msno"], msno_dict)
+        keep = ids >= 0
+        chunk = chunk.drop(columns="msno")[keep]
+        chunk.insert(0, "msno_id", ids[keep])
+        yield chunk
+
+
+def empty_encoded(dtypes):
+    """iter_encoded 청크와 같은 컬럼/dtype의 빈 프레임 (사전에 있는 유저가 없는 파일용)"""
+    return pd.DataFrame({"msno_id": pd.Series(dtype="int32"),
+                         **{col: pd.Series(dtype=dtype) for col, dtype in dtypes.items() if col != "msno"}})
+
+
+def stream_aggregate(filepath, dtypes, partial_fn, msno_dict, max_cols=(), chunk_size=CHUNK_SIZE,
+                     collect=None):
+    """
+    CSV를 청크 단위로 읽어 msno_id별 부분 집계를 누적합니다.
+    collect가 주어지면 인코딩된 청크를 함께 넘깁니다. (같은 패스에서 다른 계산에 재사용)
+    """
+    state = None
+    n_rows = 0
+    for chunk in iter_encoded(filepath, dtypes, msno_dict, chunk_size):
+        n_rows += len(chunk)
+        if collect is not None:
+            collect(chunk)
+        part = partial_fn(chunk)
+        state = part if state is None else merge_partials([state, part], max_cols)
+        print(f"  {filepath.name}: {n_rows:,}행 집계 (집계 유저 {len(state):,}명)")
+    if state is None:
+        # 사전에 있는 유저가 하나도 없는 파일 (예: 새 유저만 있는 일별 파일) → 빈 집계
+        print(f"  {filepath.name}: 집계할 유저 없음")
+        state = partial_fn(empty_encoded(dtypes))
+    return state
+
+
+def stream_logs(filepath, msno_dict, min_day, chunk_size=CHUNK_SIZE, daily=None):
+    """
+    user_logs를 한 번 읽어 (전체 기간 집계 state, 일별 state)를 함께 만듭니다.
+    일별 state는 min_day 이후 날짜만 청크마다 누적합니다. (메모리는 유저 수 × RECENCY_CAP일에 비례)
+    daily: 이어서 누적할 기존 일별 state (증분 업데이트)
+    """
+    parts = [] if daily is None else [daily]
+
+    def fold_daily(chunk):
+        parts[:] = [merge_daily(parts + [log_daily_partial(chunk, min_day)])]
+
+    log_state = stream_aggregate(filepath, LOG_DTYPES, log_partial, msno_dict, chunk_size=chunk_size,
+                                 collect=fold_daily)
+    daily = parts[0] if parts else log_daily_partial(empty_encoded(LOG_DTYPES), min_day)
+    return log_state, daily
+
+
+def stream_transactions(filepath, msno_dict, chunk_size=CHUNK_SIZE, n_partitions=SEQ_PARTITIONS):
+    """
+    transactions를 한 번 읽어 (집계 state, 결제 순서 요약)을 함께 만듭니다.
+    순서 요약은 결제 순서가 파일 순서와 무관하도록, 인코딩된 청크를 msno_id 범위별 임시 parquet로 내려 두었다가
+    범위(파티션)마다 안정 정렬 한 번으로 계산합니다. (메모리에는 파티션 하나의 행 + 유저별 요약만 유지)
+    """
+    n_ids = max(len(msno_dict), 1)
+    with tempfile.TemporaryDirectory(prefix="txn_seq_") as spill_dir:
+        spill_dir = Path(spill_dir)
+        n_chunks = 0
+
+        def spill(chunk):
+            nonlocal n_chunks
+            partition = chunk["msno_id"].to_numpy().astype(np.int64) * n_partitions // n_ids
+            for k, rows in chunk.groupby(partition, sort=False):
+                rows.to_parquet(spill_dir / f"p{k:04d}_c{n_chunks:06d}.parquet", index=False)
+            n_chunks += 1
+
+        txn_state = stream_aggregate(filepath, TXN_DTYPES, txn_partial, msno_dict, TXN_MAX_COLS, chunk_size,
+                                     collect=spill)
+        # msno_id 범위가 겹치지 않으므로 파티션 순서대로 이어 붙이면 msno_id 정렬 유지
+        seq_parts = []
+        for k in range(n_partitions):
+            files = sorted(spill_dir.glob(f"p{k:04d}_c*.parquet"))
+            if files:
+                rows = pd.concat([pd.read_parquet(f) for f in files], ignore_index=True)
+                seq_parts.append(combine_sequences(txn_unit_sequences(rows)))
+    seq_state = pd.concat(seq_parts) if seq_parts else txn_unit_sequences(empty_encoded(TXN_DTYPES))
+    return txn_state, seq_state
+
+
+def load_members(filepath, msno_dict, chunk_size=CHUNK_SIZE):
+    """members를 청크 단위로 읽어 사전에 있는 유저만 msno_id 정렬로 남깁니다."""
+    parts = list(iter_encoded(filepath, MEMBERS_DTYPES, msno_dict, chunk_size))
+    members = pd.concat(parts).drop_duplicates("msno_id")
+    return members.set_index("msno_id").sort_index()
+
+
+def finalize_features(df):
+    """
+    병합된 데이터에 노트북의 후처리를 적용합니다.
+    - bd 이상치 제거 후 age_group 생성, bd/registration_init_time 제거
+    - city/registered_via/gender/age_group 범주형 + 'unknown' 채움
+    - 로그가 없는 유저 no_log_flag 생성 및 로그 컬럼 0 채움 (fill_log_cols)
+    """
+    df["bd"] = df["bd"].where((df["bd"] >= 0) & (df["bd"] <= 100))
+    bins = [15, 20, 30, 40, 50, 60, 70, 80]
+    labels = ["10s", "20s", "30s", "40s", "50s", "60s", "70s"]
+    df["age_group"] = pd.cut(df["bd"], bins=bins, labels=labels)
+    df = df.drop(columns=["bd", "registration_init_time"])
+
+    # parquet 저장을 위해 범주 값은 문자열로 통일 (숫자 코드 + 'unknown' 혼합 방지)
+    # 숫자 코드는 노트북(float 컬럼의 astype("category"))과 같은 "7.0" 형식 → 원-핫 컬럼 city_7.0 등 기존 산출물과 일치
+    for col in CAT_COLS:
+        values = df[col].astype(object)
+        values = values.map(lambda v: v if isinstance(v, str) else str(float(v)), na_action="ignore")
+        df[col] = values.fillna("unknown").astype("category")
+
+    df = fill_txn_seq_cols(df)
+    return fill_log_cols(df)
+
+
+def fit_imputer(df, sample=IMPUTER_SAMPLE, random_state=42):
+    """
+    노트북과 같은 설정의 IterativeImputer를 최대 sample행의 무작위 표본으로 한 번 학습합니다.
+    (전체 프레임 fit_transform 대신, 학습된 imputer는 state와 추론 변환기에서 재사용)
+    """
+    from sklearn.experimental import enable_iterative_imputer  # noqa: F401
+    from sklearn.impute import IterativeImputer
+
+    values = df[KNN_COLS].to_numpy(dtype=np.float64)
+    if sample is not None and len(values) > sample:
+        rng = np.random.default_rng(random_state)
+        values = values[np.sort(rng.choice(len(values), sample, replace=False))]
+
+    imputer = IterativeImputer(
+        random_state=42,
+        max_iter=10,
+        initial_strategy="median",
+        sample_posterior=False
+    )
+    return imputer.fit(values)
+
+
+def impute_knn_cols(df, imputer=None, chunk_size=CHUNK_SIZE):
+    """
+    결제 관련 결측치를 IterativeImputer로 채웁니다.
+    imputer가 없으면 표본으로 한 번 학습하고(fit_imputer), 있으면 재학습 없이 transform만 적용합니다.
+    transform은 결측이 있는 행만 chunk_size 단위로 처리합니다. (관측값은 바뀌지 않으므로 결과 동일)
+    """
+    if imputer is None:
+        imputer = fit_imputer(df)
+
+    values = df[KNN_COLS].to_numpy(dtype=np.float64)
+    missing = np.flatnonzero(np.isnan(values).any(axis=1))
+    for start in range(0, len(missing), chunk_size):
+        rows = missing[start:start + chunk_size]
+        values[rows] = imputer.transform(values[rows])
+    df[KNN_COLS] = values
+    return df, imputer
+
+
+def load_imputer(state_dir=STATE_DIR):
+    """저장된 imputer를 불러옵니다. 없으면 None."""
+    path = Path(state_dir) / IMPUTER_FILE
+    return joblib.load(path) if path.exists() else None
+
+
+def write_parquet(df, output_path):
+    """
+    모델링용 parquet 저장.
+    row group 단위 min/max 통계를 함께 기록하여 읽는 쪽에서 필요한 row group만 디코딩할 수 있게 합니다.
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(output_path, index=False, row_group_size=ROW_GROUP_SIZE, write_statistics=True)
+
+
+def save_state(txn_state, seq_state, log_state, log_daily, imputer, msno_dict, as_of, state_dir=STATE_DIR):
+    """증분 업데이트에 필요한 집계/결제 순서/일별 로그 state, imputer, msno 사전, 윈도우 기준일을 저장합니다."""
+    state_dir = Path(state_dir)
+    state_dir.mkdir(parents=True, exist_ok=True)
+    save_msno_dict(msno_dict, state_dir)
+    txn_state.to_parquet(state_dir / TXN_STATE_FILE)
+    seq_state.to_parquet(state_dir / TXN_SEQ_STATE_FILE)
+    log_state.to_parquet(state_dir / LOG_STATE_FILE)
+    log_daily.to_parquet(state_dir / LOG_DAILY_STATE_FILE)
+    joblib.dump(imputer, state_dir / IMPUTER_FILE)
+    (state_dir / LOG_META_FILE).write_text(json.dumps({"as_of": as_of, "windows": list(LOG_WINDOWS)}))
+
+
+def load_state(state_dir=STATE_DIR):
+    """저장된 집계/결제 순서/일별 로그 state, imputer, msno 사전, 윈도우 기준일을 불러옵니다."""
+    state_dir = Path(state_dir)
+    if not (state_dir / TXN_STATE_FILE).exists() or not (state_dir / TXN_SEQ_STATE_FILE).exists():
+        raise FileNotFoundError(f"집계 state 없음: {state_dir}\n→ 먼저 전체 빌드를 실행하세요.")
+    meta_path = state_dir / LOG_META_FILE
+    meta = json.loads(meta_path.read_text()) if meta_path.exists() else {}
+    if meta.get("windows") != list(LOG_WINDOWS) or not (state_dir / LOG_DAILY_STATE_FILE).exists():
+        raise ValueError(f"윈도우 로그 state가 현재 설정({LOG_WINDOWS})과 다릅니다.\n→ 전체 빌드를 다시 실행하세요.")
+    txn_state = pd.read_parquet(state_dir / TXN_STATE_FILE)
+    seq_state = pd.read_parquet(state_dir / TXN_SEQ_STATE_FILE)
+    log_state = pd.read_parquet(state_dir / LOG_STATE_FILE)
+    log_daily = pd.read_parquet(state_dir / LOG_DAILY_STATE_FILE)
+    imputer = joblib.load(state_dir / IMPUTER_FILE)
+    return txn_state, seq_state, log_state, log_daily, imputer, load_msno_dict(state_dir), meta["as_of"]
+
+
+def fold_state(state, delta, max_cols=()):
+    """
+    새로 집계된 delta를 기존 state에 누적합니다.
+    delta에 등장한 유저(touched)의 행만 다시 병합합니다.
+    """
+    touched = delta.index
+    is_touched = state.index.isin(touched)
+    merged = merge_partials([state[is_touched], delta], max_cols)
+    return pd.concat([state[~is_touched], merged]).sort_index()
+
+
+def fold_sequence_state(state, delta):
+    """
+    새 결제 순서 요약(delta)을 기존 state에 이어 붙입니다.
+    delta에 등장한 유저의 요약만 다시 합치며, 새 결제가 기존 결제 이후라고 가정합니다. (일별 증분)
+    """
+    is_touched = state.index.isin(delta.index)
+    merged = combine_sequences(pd.concat([state[is_touched], delta]))
+    return pd.concat([state[~is_touched], merged]).sort_index()
+
+
+def build_features(raw_dir=RAW_DIR, output_path=OUTPUT_PATH, state_dir=STATE_DIR, chunk_size=CHUNK_SIZE,
+                   as_of=None, refit_imputer=False):
+    """
+    원본 CSV → kkbox_v3.parquet 전체 빌드.
+    증분 업데이트를 위해 집계 state와 imputer도 함께 저장합니다.
+    as_of: 윈도우 로그 피처 기준일(YYYYMMDD). None이면 user_logs의 마지막 날짜.
+    refit_imputer: state_dir에 저장된 imputer가 있어도 표본으로 다시 학습합니다.
+    """
+    raw_dir = Path(raw_dir)
+    start = time.time()
+
+    print("[Step 1] train 로드 중...")
+    train = pd.read_csv(raw_dir / TRAIN_FILE, dtype={"msno": "object", "is_churn": "int8"})
+
+    # 사전은 한 번 만들고 계속 재사용 (새 train 유저만 뒤에 추가)
+    msno_dict = extend_msno_dict(load_msno_dict(state_dir), train["msno"])
+    train_ids = encode_msno(train["msno"], msno_dict)
+    order = np.argsort(train_ids, kind="stable")
+    train_ids = train_ids[order]
+    is_churn = train["is_churn"].to_numpy()[order]
+    del train
+
+    print("\n[Step 2] transactions 스트리밍 집계 및 결제 순서 요약 중...")
+    txn_state, seq_state = stream_transactions(raw_dir / TXN_FILE, msno_dict, chunk_size)
+
+    print("\n[Step 3] user_logs 스트리밍 집계 중...")
+    if as_of is None:
+        as_of = find_log_as_of(raw_dir / LOG_FILE, chunk_size)
+    else:
+        as_of = int(to_day_number([as_of])[0])
+    print(f"  기준일: {np.datetime64(as_of, 'D')} (최근 {', '.join(map(str, LOG_WINDOWS))}일 윈도우, 만료 잔여일)")
+    log_state, log_daily = stream_logs(raw_dir / LOG_FILE, msno_dict, daily_min_day(as_of), chunk_size)
+
+    print("\n[Step 4] members 로드 및 병합 중...")
+    members = load_members(raw_dir / MEMBERS_FILE, msno_dict, chunk_size)
+
+    # train이 unique한 msno를 가지므로 정렬된 msno_id 기준 sort-merge left join
+    df = pd.concat([
+        pd.DataFrame({"msno": decode_msno(train_ids, msno_dict), "is_churn": is_churn}),
+        sort_merge_left(train_ids, finalize_txn(txn_state)),
+        sort_merge_left(train_ids, finalize_txn_sequence(seq_state, as_of)),
+        sort_merge_left(train_ids, finalize_log(log_state, log_daily, as_of)),
+        sort_merge_left(train_ids, members),
+    ], axis=1)
+    print(f"After merge: {df.shape}")
+
+    print("\n[Step 5] 후처리 및 결측치 보간 중...")
+    df = finalize_features(df)
+    imputer = None if refit_imputer else load_imputer(state_dir)
+    print("  imputer: " + ("표본으로 학습" if imputer is None else "저장된 imputer 재사용"))
+    df, imputer = impute_knn_cols(df, imputer, chunk_size)
+    df = apply_schema(df, SCHEMAS["kkbox"])
+
+    write_parquet(df, output_path)
+    save_state(txn_state, seq_state, log_state, log_daily, imputer, msno_dict, as_of, state_dir)
+    print(f"\n저장 완료: {output_path} {df.shape} ({time.time() - start:.1f}초)")
+    print(f"집계 state 저장: {state_dir}")
+    return df
+
+
+def update_features(log_files=(), txn_files=(), output_path=OUTPUT_PATH, state_dir=STATE_DIR,
+                    chunk_size=CHUNK_SIZE):
+    """
+    새로 들어온 일별 user_logs / transactions 파일만 집계하여 state에 누적하고,
+    변경된 유저의 행만 다시 계산해 parquet에 반영합니다.
+    윈도우 기준일은 새 로그의 마지막 날짜까지 옮기며(전체 빌드 기본값과 같음), 기준일이 바뀌면
+    전체 유저의 윈도우/경과 일수/만료 잔여일이 달라지므로 모든 행을 state로부터 다시 계산합니다.
+    """
+    start = time.time()
+    output_path = Path(output_path)
+    txn_state, seq_state, log_state, log_daily, imputer, msno_dict, as_of = load_state(state_dir)
+
+    df = pd.read_parquet(output_path)
+    df.index = encode_msno(df["msno"], msno_dict)
+
+    touched = pd.Index([], dtype=np.int32)
+    for path in txn_files:
+        print(f"\n[증분] transactions 집계: {path}")
+        delta, seq_delta = stream_transactions(Path(path), msno_dict, chunk_size)
+        txn_state = fold_state(txn_state, delta, TXN_MAX_COLS)
+        seq_state = fold_sequence_state(seq_state, seq_delta)
+        touched = touched.union(delta.index)
+
+    new_as_of = as_of
+    for path in log_files:
+        print(f"\n[증분] user_logs 집계: {path}")
+        # 일별 state는 옮기기 전 기준일로 필요한 날짜까지 모두 누적하고, 마지막에 새 기준일로 정리
+        delta, log_daily = stream_logs(Path(path), msno_dict, daily_min_day(as_of), chunk_size, log_daily)
+        log_state = fold_state(log_state, delta)
+        touched = touched.union(delta.index)
+        new_as_of = max(new_as_of, find_log_as_of(Path(path), chunk_size))
+
+    recompute = touched
+    if new_as_of != as_of:
+        print(f"  윈도우 기준일 이동: {np.datetime64(as_of, 'D')} → {np.datetime64(new_as_of, 'D')} "
+              "(전체 유저의 윈도우/경과 일수/만료 잔여일 재계산)")
+        as_of = new_as_of
+        log_daily = log_daily[log_daily.index.get_level_values("day") >= daily_min_day(as_of)]
+        recompute = df.index
+
+    if len(recompute) == 0:
+        print("변경된 유저가 없습니다.")
+        return df.reset_index(drop=True)
+
+    # 다시 계산할 유저의 집계 컬럼만 state로부터 계산 (결제 이력이 없으면 NaN → imputer 적용)
+    recompute = recompute.intersection(df.index)
+    rows = df.loc[recompute].copy()
+    txn_agg = finalize_txn(txn_state.loc[txn_state.index.intersection(recompute)])
+    log_agg = finalize_log(log_state.loc[log_state.index.intersection(recompute)], log_daily, as_of)
+    seq_agg = finalize_txn_sequence(seq_state.loc[seq_state.index.intersection(recompute)], as_of)
+    rows[txn_agg.columns] = txn_agg.reindex(recompute)
+    rows[seq_agg.columns] = seq_agg.reindex(recompute)
+    rows[log_agg.columns] = log_agg.reindex(recompute)
+    rows = fill_log_cols(fill_txn_seq_cols(rows))
+    rows, _ = impute_knn_cols(rows, imputer, chunk_size)
+    rows = apply_schema(rows, SCHEMAS["kkbox"])
+
+    updated = list(txn_agg.columns) + list(seq_agg.columns) + list(log_agg.columns) + ["no_log_flag"]
+    df.loc[recompute, updated] = rows[updated]
+    df = df.reset_index(drop=True)
+    write_parquet(df, output_path)
+    save_state(txn_state, seq_state, log_state, log_daily, imputer, msno_dict, as_of, state_dir)
+    print(f"\n증분 업데이트 완료: 변경 유저 {len(touched.intersection(recompute)):,}명, "
+          f"재계산 {len(recompute):,}명 / 전체 {len(df):,}명 ({time.time() - start:.1f}초)")
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KKBox 원본 CSV → 모델링용 parquet 생성")
+    parser.add_argument("--raw-dir", default=str(RAW_DIR), help="원본 CSV 폴더")
+    parser.add_argument("--output", default=str(OUTPUT_PATH), help="저장할 parquet 경로")
+    parser.add_argument("--state-dir", default=str(STATE_DIR), help="증분 업데이트용 집계 state 폴더")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="청크당 CSV 행 수")
+    parser.add_argument("--as-of", type=int, default=None,
+                        help="윈도우 로그 피처 기준일 YYYYMMDD (기본: user_logs 마지막 날짜, 전체 빌드 전용)")
+    parser.add_argument("--refit-imputer", action="store_true",
+                        help="저장된 imputer를 쓰지 않고 표본으로 다시 학습 (전체 빌드 전용)")
+    parser.add_argument("--update-logs", nargs="+", default=[], help="새로 추가된 user_logs CSV (증분 모드)")
+    parser.add_argument("--update-txn", nargs="+", default=[], help="새로 추가된 transactions CSV (증분 모드)")
+    args = parser.parse_args()
+
+    print("="*50)
+    if args.update_logs or args.update_txn:
+        print("KKBox 피처 증분 업데이트")
+        print("="*50)
+        update_features(args.update_logs, args.update_txn, args.output, args.state_dir, args.chunk_size)
+    else:
+        print("KKBox 피처 빌드 (스트리밍 집계)")
+        print("="*50)
+        build_features(args.raw_dir, args.output, args.state_dir, args.chunk_size, args.as_of, args.refit_imputer)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+feature_cache.py - 전처리된 피처 행렬(X, y) 캐시.
+
+main.py / dl_main.py / predict.py / run_shap.py가 매번 parquet 로드와
+preprocess_for_modeling(파생 변수, get_dummies, df.copy())을 반복하지 않도록
+X(float32)와 y를 .npy로 저장해 두고 memory-map으로 바로 엽니다.
+
+캐시 키 = 원본 파일 내용 해시 + 로드/전처리 코드(data_loader.py, preprocessing.py) 해시 + 범주형 인코딩 방식
+→ 데이터나 전처리 코드가 바뀌면 자동으로 새 캐시가 만들어집니다.
+(native categorical 모드에서는 범주형 컬럼을 범주 코드(float32)로 저장하고 열 때 category로 복원)
+"""
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.data_loader import load_data
+from src.preprocessing import preprocess_for_modeling
+
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+CACHE_DIR = ROOT_DIR / "data" / "cache"
+
+# 캐시 파일 형식이 바뀌면 올려서 기존 캐시를 무효화
+CACHE_VERSION = "1"
+HASH_INDEX_FILE = "file_hashes.json"
+
+
+def _sha256_file(path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def file_fingerprint(path, cache_dir=CACHE_DIR):
+    """
+    파일 내용의 sha256.
+    (경로, 크기, 수정시각)이 같으면 이전에 계산한 해시를 재사용하여 매번 전체를 읽지 않습니다.
+    """
+    path = Path(path).resolve()
+    stat = path.stat()
+    stamp = f"{stat.st_size}:{stat.st_mtime_ns}"
+
+    index_path = Path(cache_dir) / HASH_INDEX_FILE
+    index = json.loads(index_path.read_text()) if index_path.exists() else {}
+    entry = index.get(str(path))
+    if entry and entry["stamp"] == stamp:
+        return entry["sha256"]
+
+    digest = _sha256_file(path)
+    index[str(path)] = {"stamp": stamp, "sha256": digest}
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    index_path.write_text(json.dumps(index, indent=2))
+    return digest
+
+
+def code_fingerprint():
+    """
+    로드/전처리 코드 버전 (캐시 형식 버전 + data_loader.py, preprocessing.py 소스 해시)
+    load_data의 스키마(SCHEMAS: dtype/범주형 처리)가 바뀌어도 새 캐시를 만듭니다.
+    """
+    import src.data_loader as data_loader
+    import src.preprocessing as preprocessing
+    h = hashlib.sha256(CACHE_VERSION.encode())
+    for module in (data_loader, preprocessing):
+        h.update(Path(module.__file__).read_bytes())
+    return h.hexdigest()
+
+
+def resolve_data_path(data_path):
+    """data_path가 없으면 루트/data 폴더에서 같은 이름의 파일을 사용합니다. (load_data와 같은 fallback)"""
+    data_path = Path(data_path)
+    if not data_path.exists():
+        data_path = ROOT_DIR / "data" / data_path.name
+    return data_path
+
+
+def cache_key(data_path, cache_dir=CACHE_DIR, encode_categoricals=True):
+    h = hashlib.sha256()
+    h.update(file_fingerprint(resolve_data_path(data_path), cache_dir).encode())
+    h.update(code_fingerprint().encode())
+    h.update(b"onehot" if encode_categoricals else b"native")
+    return h.hexdigest()[:16]
+
+
+def _open_entry(entry_dir):
+    """캐시 디렉토리를 memory-map으로 열어 (X, y)를 반환합니다. (복사 없음)"""
+    manifest = json.loads((entry_dir / "manifest.json").read_text())
+    X_arr = np.load(entry_dir / "X.npy", mmap_mode="r")
+    y_arr = np.load(entry_dir / "y.npy", mmap_mode="r")
+    X = pd.DataFrame(X_arr, columns=manifest["columns"], copy=False)
+    y = pd.Series(y_arr, name=manifest["target"], copy=False)
+
+    # native categorical: 범주 코드 → category 컬럼 복원 (해당 컬럼만 복사)
+    for col, categories in manifest.get("categories", {}).items():
+        codes = np.nan_to_num(X[col].to_numpy(), nan=-1).astype(np.int32)
+        X[col] = pd.Categorical.from_codes(codes, categories=categories)
+    return X, y
+
+
+def _write_entry(entry_dir, X, y):
+    """임시 폴더에 쓴 뒤 rename하여 중간에 끊겨도 깨진 캐시가 남지 않게 합니다."""
+    tmp_dir = entry_dir.with_name(entry_dir.name + f".tmp{os.getpid()}")
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    categories = {}
+    X = X.copy(deep=False)
+    for col in X.select_dtypes(include="category").columns:
+        categories[col] = [c.item() if hasattr(c, "item") else c for c in X[col].cat.categories]
+        X[col] = X[col].cat.codes.astype(np.float32).where(X[col].notna())
+
+    np.save(tmp_dir / "X.npy", np.ascontiguousarray(X.to_numpy(dtype=np.float32)))
+    np.save(tmp_dir / "y.npy", y.to_numpy())
+    (tmp_dir / "manifest.json").write_text(json.dumps({
+        "columns": list(X.columns),
+        "target": y.name,
+        "n_rows": len(X),
+        "dtype": "float32",
+        "categories": categories,
+    }, ensure_ascii=False, indent=2))
+    if entry_dir.exists():
+        shutil.rmtree(tmp_dir)
+    else:
+        tmp_dir.rename(entry_dir)
+
+
+def load_preprocessed(data_path, cache_dir=CACHE_DIR, use_cache=True, encode_categoricals=True):
+    """
+    preprocess_for_modeling(load_data(data_path), encode_categoricals)와 같은 (X, y)를 반환합니다.
+    캐시가 있으면 memory-map으로 즉시 열고, 없으면 한 번 계산하여 저장합니다.
+    X는 float32 (bool 더미 컬럼도 0/1 float32, native 모드의 범주형은 category)입니다.
+    """
+    if not use_cache:
+        return preprocess_for_modeling(load_data(data_path), encode_categoricals)
+
+    cache_dir = Path(cache_dir)
+    data_path = resolve_data_path(data_path)
+
+    entry_dir = cache_dir / cache_key(data_path, cache_dir, encode_categoricals)
+    if entry_dir.exists():
+        print(f"전처리 캐시 사용: {entry_dir}")
+        return _open_entry(entry_dir)
+
+    print("전처리 캐시 없음 → 전처리 후 캐시 생성 중...")
+    X, y = preprocess_for_modeling(load_data(data_path), encode_categoricals)
+    _write_entry(entry_dir, X, y)
+    print(f"전처리 캐시 저장: {entry_dir}")
+    return _open_entry(entry_dir)
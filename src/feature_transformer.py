@@ -0,0 +1,307 @@
+"""
+feature_transformer.py - 학습(fit)된 피처 변환기.
+
+preprocess_for_modeling은 그때그때 등장한 범주로 get_dummies를 만들기 때문에
+추론 시에는 pd.DataFrame([data_dict]).reindex(columns=feature_names)로 맞춰야 했습니다.
+FeatureTransformer는 학습 시점의 컬럼 순서와 범주 사전(vocabulary)을 고정해 저장하고,
+pandas 객체 생성 없이 미리 할당된 float32 버퍼에 바로 값을 씁니다.
+
+    transformer = FeatureTransformer().fit(df)         # df: kkbox_v3 원본 컬럼
+    transformer.save("results/feature_transformer.pkl")
+    X = transformer.transform_batch(df_or_arrow_table)  # (n, n_features) float32
+    x = transformer.transform_one({"txn_cnt": 10, ...}) # (1, n_features) float32
+
+encode_categoricals=False 이면 preprocess_for_modeling(df, encode_categoricals=False)와 같이
+범주형 컬럼을 원-핫 대신 범주 코드(학습 시 범주 순서, 처음 보는 범주/결측은 NaN) 한 컬럼으로 씁니다.
+(XGBoost enable_categorical=True 모델용)
+
+imputer(feature_build의 학습된 IterativeImputer)를 넘기면 결제 관련 컬럼(KNN_COLS)이 비어 있는
+입력(결제 이력이 없는 신규 유저 등)을 학습 데이터 빌드 때와 같은 방식으로 채운 뒤 파생 변수를 계산합니다.
+(transform_batch는 항상, transform_one은 impute=True일 때만 → 단일 예측 기본값은 0 채움으로 지연 유지)
+"""
+import joblib
+import numpy as np
+import pandas as pd
+
+from src.feature_build import KNN_COLS
+from src.preprocessing import DERIVED_FEATURES
+
+
+TRANSFORMER_FILE = "feature_transformer.pkl"
+DROP_COLS = ["is_churn", "msno"]
+
+
+class FeatureTransformer:
+    """
+    preprocess_for_modeling과 같은 X를 만드는 변환기.
+    출력 컬럼 = [원본 수치형] + [파생 변수] + [범주형 원-핫 (첫 범주 제외, drop_first=True)]
+    native 모드 = [원본 컬럼 (범주형은 코드)] + [파생 변수]
+    """
+    def __init__(self, encode_categoricals=True, imputer=None):
+        self.encode_categoricals = encode_categoricals
+        self.imputer = imputer
+        self.numeric_columns = []
+        self.categories = {}
+        self.feature_names = []
+
+    def fit(self, df):
+        """df의 컬럼 순서와 범주형 컬럼의 범주 목록을 고정합니다."""
+        cols = [c for c in df.columns if c not in DROP_COLS]
+        cat_cols = [c for c in cols if df[c].dtype == object or isinstance(df[c].dtype, pd.CategoricalDtype)]
+
+        self.numeric_columns = [str(c) for c in cols if c not in cat_cols]
+        self.categories = {}
+        for col in cat_cols:
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                self.categories[str(col)] = list(df[col].cat.categories)
+            else:
+                self.categories[str(col)] = sorted(df[col].dropna().unique())
+
+        if self.encode_categoricals:
+            dummy_names = [f"{col}_{cat}" for col, cats in self.categories.items() for cat in cats[1:]]
+            self.feature_names = self.numeric_columns + list(DERIVED_FEATURES) + dummy_names
+        else:
+            self.feature_names = [str(c) for c in cols] + list(DERIVED_FEATURES)
+        self._build_index()
+        return self
+
+    def fit_parquet(self, path):
+        """
+        parquet 전체를 읽지 않고 fit 합니다. (컬럼 순서는 스키마, 범주 목록은 범주형 컬럼만 읽어서)
+        load_data(path) 전체로 fit 한 결과와 같습니다.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        from src.data_loader import load_data
+
+        schema = pq.read_schema(path)
+        cat_cols = [
+            f.name for f in schema if f.name not in DROP_COLS
+            and (pa.types.is_dictionary(f.type) or pa.types.is_string(f.type) or pa.types.is_large_string(f.type))
+        ]
+        frame = schema.empty_table().to_pandas()
+        cats = load_data(path, columns=cat_cols)
+        for col in cat_cols:
+            values = cats[col]
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype("category")
+            frame[col] = pd.Categorical([], categories=values.cat.categories)
+        return self.fit(frame)
+
+    def with_encoding(self, encode_categoricals):
+        """같은 범주 사전으로 인코딩 방식만 바꾼 변환기 (예: native XGBoost + 원-핫 ResNet)"""
+        if encode_categoricals == self.encode_categoricals:
+            return self
+        other = FeatureTransformer(encode_categoricals, self.imputer)
+        other.numeric_columns = list(self.numeric_columns)
+        other.categories = {col: list(cats) for col, cats in self.categories.items()}
+        if encode_categoricals:
+            dummy_names = [f"{col}_{cat}" for col, cats in other.categories.items() for cat in cats[1:]]
+            other.feature_names = other.numeric_columns + list(DERIVED_FEATURES) + dummy_names
+        else:
+            # 원-핫 모드에는 원본 컬럼 순서가 남아 있지 않으므로 수치형 → 범주형 순서로 둡니다.
+            other.feature_names = other.numeric_columns + list(other.categories) + list(DERIVED_FEATURES)
+        other._build_index()
+        return other
+
+    @property
+    def category_mapping(self):
+        """범주형 컬럼 → 범주 목록 (native 모드의 코드 = 목록의 위치)"""
+        return {col: list(cats) for col, cats in self.categories.items()}
+
+    def _build_index(self):
+        """
+        컬럼명 → 버퍼 위치 조회 테이블
+        - 원-핫 모드: 범주 값 → 원-핫 위치
+        - native 모드: 범주 값 → 범주 코드
+        """
+        self._pos = {name: i for i, name in enumerate(self.feature_names)}
+        self._impute_pos = (
+            np.array([self._pos[col] for col in KNN_COLS]) if self.imputer is not None else None
+        )
+        if self.encode_categoricals:
+            self._cat_pos = {
+                col: {cat: self._pos[f"{col}_{cat}"] for cat in cats[1:]}
+                for col, cats in self.categories.items()
+            }
+        else:
+            self._cat_pos = {
+                col: {cat: float(code) for code, cat in enumerate(cats)}
+                for col, cats in self.categories.items()
+            }
+        # 숫자로 입력된 범주 값(예: city=13)도 찾을 수 있도록 문자열 키를 함께 등록
+        for col, lookup in self._cat_pos.items():
+            lookup.update({str(cat): pos for cat, pos in list(lookup.items())})
+
+    @property
+    def n_features(self):
+        return len(self.feature_names)
+
+    @property
+    def input_columns(self):
+        """transform_batch에 ndarray를 넘길 때의 컬럼 순서"""
+        return self.numeric_columns + list(self.categories)
+
+    def _column_getter(self, data):
+        """DataFrame / Arrow Table·RecordBatch / 2차원 ndarray에서 컬럼을 꺼내는 함수"""
+        if isinstance(data, pd.DataFrame):
+            return lambda col: data[col].to_numpy()
+        if isinstance(data, np.ndarray):
+            index = {col: i for i, col in enumerate(self.input_columns)}
+            return lambda col: data[:, index[col]]
+        # pyarrow.Table / pyarrow.RecordBatch
+        def get(col):
+            arr = data.column(col)
+            if col in self.categories:
+                return arr.to_pandas().to_numpy()
+            return arr.to_numpy(zero_copy_only=False)
+        return get
+
+    def _impute(self, out):
+        """버퍼에서 KNN_COLS에 결측이 있는 행만 imputer로 채웁니다. 채운 행이 있으면 True."""
+        if self._impute_pos is None:
+            return False
+        block = out[:, self._impute_pos]
+        missing = np.flatnonzero(np.isnan(block).any(axis=1))
+        if len(missing) == 0:
+            return False
+        out[np.ix_(missing, self._impute_pos)] = self.imputer.transform(block[missing].astype(np.float64))
+        return True
+
+    def _has_column(self, data, col):
+        if isinstance(data, np.ndarray):
+            return col in self.input_columns
+        if isinstance(data, pd.DataFrame):
+            return col in data.columns
+        return col in data.schema.names
+
+    def transform_batch(self, data, out=None):
+        """
+        여러 행을 한 번에 변환합니다.
+        data: DataFrame, pyarrow Table/RecordBatch, 또는 input_columns 순서의 2차원 ndarray
+        out : (n, n_features) float32 버퍼 (없으면 새로 할당)
+        """
+        n = len(data) if not hasattr(data, "num_rows") else data.num_rows
+        if out is None:
+            out = np.empty((n, self.n_features), dtype=np.float32)
+        get = self._column_getter(data)
+
+        # 1. 수치형 원본 컬럼: 버퍼에 바로 복사 (없는 컬럼은 0, imputer가 있으면 KNN_COLS는 결측)
+        impute_cols = KNN_COLS if self.imputer is not None else []
+        for col in self.numeric_columns:
+            pos = self._pos[col]
+            if self._has_column(data, col):
+                out[:, pos] = get(col)
+            else:
+                out[:, pos] = np.nan if col in impute_cols else 0.0
+
+        # 1-b. 결제 관련 결측치: 학습된 imputer로 결측 행만 채움
+        imputed = self._impute(out)
+
+        # 2. 파생 변수: 원본 dtype의 컬럼으로 계산 (preprocess_for_modeling과 같은 정밀도),
+        #    ndarray 입력, 없는 컬럼, imputer로 채운 컬럼은 버퍼의 컬럼 뷰 사용
+        view = {
+            col: get(col) if not isinstance(data, np.ndarray) and self._has_column(data, col)
+            and not (imputed and col in impute_cols)
+            else out[:, self._pos[col]]
+            for col in self.numeric_columns
+        }
+        for name, (_, fn) in DERIVED_FEATURES.items():
+            out[:, self._pos[name]] = fn(view)
+
+        # 3-a. native 모드: 범주 코드를 그대로 씀 (처음 보는 범주/결측은 NaN)
+        if not self.encode_categoricals:
+            for col, cats in self.categories.items():
+                pos = self._pos[col]
+                if not self._has_column(data, col):
+                    out[:, pos] = np.nan
+                    continue
+                codes = pd.Categorical(get(col), categories=cats).codes
+                out[:, pos] = np.where(codes >= 0, codes, np.nan)
+            return out
+
+        # 3-b. 범주형 원-핫: 범주 코드로 위치를 찾아 1을 씀 (첫 범주/처음 보는 범주는 모두 0)
+        rows = np.arange(n)
+        for col, cats in self.categories.items():
+            positions = [self._pos[f"{col}_{cat}"] for cat in cats[1:]]
+            out[:, positions] = 0.0
+            if not self._has_column(data, col) or not positions:
+                continue
+            codes = pd.Categorical(get(col), categories=cats).codes
+            hit = codes >= 1
+            out[rows[hit], np.asarray(positions)[codes[hit] - 1]] = 1.0
+        return out
+
+    def transform_one(self, data_dict, out=None, impute=False):
+        """
+        단일 샘플(dict)을 (1, n_features) float32로 변환합니다.
+        - 학습 컬럼명과 같은 키는 그대로, 없는 컬럼은 0 (기존 reindex(fill_value=0)과 동일)
+        - 범주형은 원본 값({"city": "13"}) 또는 원-핫 컬럼명({"city_13": 1}) 모두 허용
+          (native 모드는 원본 값만 허용, 없거나 처음 보는 범주는 NaN)
+        - impute=True이고 imputer가 있으면 주어지지 않은(또는 NaN인) KNN_COLS는 imputer로 채움
+          (IterativeImputer.transform 한 번에 ms 단위라 기본값은 다른 컬럼처럼 0)
+        - 파생 변수는 필요한 원본 값이 모두 주어졌거나 imputer로 채워졌을 때만 계산
+        """
+        if out is None:
+            out = np.zeros((1, self.n_features), dtype=np.float32)
+        else:
+            out.fill(0.0)
+        row = out[0]
+        pos = self._pos
+
+        if not self.encode_categoricals:
+            for col in self.categories:
+                row[pos[col]] = np.nan
+            for key, value in data_dict.items():
+                if key in self._cat_pos:
+                    row[pos[key]] = self._cat_pos[key].get(value, self._cat_pos[key].get(str(value), np.nan))
+                else:
+                    i = pos.get(key)
+                    if i is not None:
+                        row[i] = value
+        else:
+            for key, value in data_dict.items():
+                i = pos.get(key)
+                if i is not None:
+                    row[i] = value
+                elif key in self._cat_pos:
+                    i = self._cat_pos[key].get(value, self._cat_pos[key].get(str(value)))
+                    if i is not None:
+                        row[i] = 1.0
+
+        available = data_dict
+        if impute and self._impute_pos is not None:
+            filled = [col for col in KNN_COLS if data_dict.get(col) is None or data_dict[col] != data_dict[col]]
+            if filled:
+                for col in filled:
+                    row[pos[col]] = np.nan
+                self._impute(out)
+                available = dict(data_dict)
+                available.update({col: float(row[pos[col]]) for col in filled})
+
+        for name, (inputs, fn) in DERIVED_FEATURES.items():
+            if name not in data_dict and all(c in available for c in inputs):
+                row[pos[name]] = fn(available)
+        return out
+
+    def save(self, path):
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path):
+        return joblib.load(path)
+
+    def __setstate__(self, state):
+        state.setdefault("encode_categoricals", True)
+        state.setdefault("imputer", None)
+        self.__dict__.update(state)
+        self._build_index()
+
+    def __getstate__(self):
+        return {
+            "encode_categoricals": self.encode_categoricals,
+            "imputer": self.imputer,
+            "numeric_columns": self.numeric_columns,
+            "categories": self.categories,
+            "feature_names": self.feature_names,
+        }
@@ -1,12 +1,62 @@
+import argparse
 import os
+import sys
 from pathlib import Path
 import pickle
-from data_loader import load_data
-from preprocessing import preprocess_for_modeling
-from model_train import train_model
-from model_eval import evaluate_model, plot_shap_values
+
+# 🔹 `python src/main.py`로 실행해도 src 패키지를 찾을 수 있도록 루트 경로 등록
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.data_loader import load_data
+from src.feature_build import load_imputer
+from src.feature_cache import load_preprocessed, cache_key, resolve_data_path
+from src.feature_transformer import FeatureTransformer, TRANSFORMER_FILE
+from src.model_train import (PARQUET_BATCH_SIZE, load_best_params, train_model, train_model_from_parquet,
+                             train_xgb_kfold, update_model)
+from src.oof import open_store
+from src.backends import BACKENDS, get_backend, save_model, active_backend, model_path, feature_names as model_feature_names
+from src.model_eval import evaluate_model, plot_shap_values
 
 def main():
+    parser = argparse.ArgumentParser(description="KKBox 이탈 예측 파이프라인 (XGBoost / LightGBM)")
+    parser.add_argument("--backend", choices=list(BACKENDS), default="xgboost", help="트리 모델 학습 백엔드")
+    parser.add_argument("--native-categorical", action="store_true",
+                        help="범주형 컬럼을 원-핫 대신 category로 유지하여 학습 (enable_categorical=True)")
+    parser.add_argument("--n-trials", type=int, default=10, help="Optuna trial 수 (완료+중단 기준 목표)")
+    parser.add_argument("--n-workers", type=int, default=None, help="병렬 탐색 프로세스 수 (기본: 코어 수 / 2)")
+    parser.add_argument("--study-name", default=None,
+                        help="Optuna study 이름 (기본: 데이터/전처리 캐시 키 → 같은 데이터면 이어서 탐색)")
+    parser.add_argument("--stream", action="store_true",
+                        help="X 전체를 메모리에 올리지 않고 parquet 배치 반복자로 학습 (QuantileDMatrix)")
+    parser.add_argument("--external-memory", action="store_true",
+                        help="--stream + 양자화된 행렬도 디스크 캐시에 둠 (ExtMemQuantileDMatrix)")
+    parser.add_argument("--batch-size", type=int, default=PARQUET_BATCH_SIZE, help="--stream 배치 행 수")
+    parser.add_argument("--kfold", type=int, default=None,
+                        help="k-fold로 학습하여 OOF 예측만 results/oof/에 저장 (study의 최적 파라미터 사용, 모델 저장 없음)")
+    parser.add_argument("--update", nargs="?", const="continue", choices=["continue", "refresh"], default=None,
+                        help="저장된 XGBoost 모델을 새 데이터로 업데이트 (continue: 트리 추가, refresh: leaf 값 갱신). "
+                             "검증 AP가 기존보다 낮아지면 전체 재학습")
+    parser.add_argument("--update-data", default=None,
+                        help="--update에 사용할 새 데이터 parquet (기본: data/kkbox_v3.parquet)")
+    parser.add_argument("--multi-objective", action="store_true",
+                        help="검증 AP와 배치 추론 지연을 함께 탐색 (Pareto 최적 trial 표를 results/optuna/에 저장)")
+    parser.add_argument("--latency-budget", type=float, default=None,
+                        help="--multi-objective: 이 지연(ms) 이내 Pareto 후보 중 AP가 가장 높은 trial로 학습")
+    args = parser.parse_args()
+    encode_categoricals = not args.native_categorical
+    stream = args.stream or args.external_memory
+    if stream and args.kfold:
+        parser.error("--kfold는 --stream/--external-memory와 함께 쓸 수 없습니다.")
+    if args.backend != "xgboost" and (stream or args.kfold or args.update):
+        parser.error("--stream/--external-memory/--kfold/--update는 xgboost 백엔드에서만 지원합니다.")
+    if args.update and (stream or args.kfold):
+        parser.error("--update는 --stream/--external-memory/--kfold와 함께 쓸 수 없습니다.")
+    if args.latency_budget is not None and not args.multi_objective:
+        parser.error("--latency-budget은 --multi-objective와 함께 사용하세요.")
+    backend = get_backend(args.backend)
+
     print("="*50)
     print("KKBox 이탈 예측 파이프라인")
     print("="*50)
@@ -24,35 +74,100 @@ def main():
         print("⚠️ Parquet 파일을 찾을 수 없습니다. pkl로 대체 시도합니다.")
         data_path = DATA_DIR / "kkbox_v3.pkl"
 
+    # [Update] 저장된 모델과 같은 범주형 인코딩으로 새 데이터를 읽음
+    results_dir = "results"
+    base_model = None
+    if args.update:
+        if args.update_data:
+            data_path = Path(args.update_data)
+        if active_backend(results_dir).name != "xgboost" or not model_path(results_dir).exists():
+            print("⚠️ 업데이트할 XGBoost 모델이 없어 전체 학습을 진행합니다.")
+        else:
+            with open(model_path(results_dir), "rb") as f:
+                base_model = pickle.load(f)
+            encode_categoricals = not hasattr(base_model, "category_mapping_")
 
-    # 2. 데이터 로드
-    try:
-        df = load_data(data_path)
-    except Exception as e:
-        print(f"데이터 로드 중 오류 발생: {e}")
-        return
+    # 피처 변환기 (추론 시 컬럼 순서/범주 사전 고정, 피처 빌드의 imputer가 있으면 함께 저장)
+    imputer = load_imputer()
+    if imputer is None:
+        print("⚠️ 저장된 imputer가 없어 결제 정보 결측치 보간 없이 변환기를 저장합니다.")
+    transformer = FeatureTransformer(encode_categoricals, imputer)
 
-    # 3. 전처리
-    print("\n[Step 1] 데이터 전처리 중...")
-    X, y = preprocess_for_modeling(df)
-    
-    # 4. 모델 학습 (Optuna 튜닝 적용)
-    print("\n[Step 2] XGBoost 모델 학습 및 하이퍼파라미터 튜닝 중...")
-    model, X_va, va_proba, y_va = train_model(X, y, use_tuning=True)
+    # 같은 데이터/전처리면 같은 study를 이어서 탐색하고, 새 데이터면 이전 study의 상위 trial로 warm-start
+    # (--stream은 검증 분할 방식이 달라 AP가 비교되지 않으므로 별도 study, 다목적 탐색도 목적 수가 달라 별도 study)
+    study_name = args.study_name or (
+        f"{backend.study_prefix}_{'stream_' if stream else ''}{'latency_' if args.multi_objective else ''}"
+        f"{cache_key(data_path, encode_categoricals=encode_categoricals)}"
+    )
+
+    if stream:
+        # 2~4. 전처리 없이 parquet 배치를 변환기로 바로 변환하여 학습
+        print("\n[Step 1-2] parquet 배치 반복자로 XGBoost 학습 및 하이퍼파라미터 튜닝 중...")
+        transformer.fit_parquet(data_path)
+        model, X_va, va_proba, y_va = train_model_from_parquet(
+            data_path, transformer, use_tuning=True, n_trials=args.n_trials, n_workers=args.n_workers,
+            study_name=study_name, batch_size=args.batch_size, external_memory=args.external_memory,
+            multi_objective=args.multi_objective, latency_budget_ms=args.latency_budget
+        )
+    else:
+        # 2. 데이터 로드 & 3. 전처리 (전처리 캐시가 있으면 memory-map으로 바로 로드)
+        print("\n[Step 1] 데이터 로드 및 전처리 중...")
+        try:
+            X, y = load_preprocessed(data_path, encode_categoricals=encode_categoricals)
+        except Exception as e:
+            print(f"데이터 로드 중 오류 발생: {e}")
+            return
+
+        # [K-Fold] fold 모델을 병렬 학습하여 OOF 예측 저장 (ResNet과 같은 fold 배정 사용)
+        if args.kfold:
+            folds = open_store(y, n_splits=args.kfold, data_key=cache_key(data_path))
+            params = load_best_params(study_name, latency_budget_ms=args.latency_budget)
+            print("study 최적 파라미터 사용:" if params else "study가 없어 기본 파라미터 사용", params or "")
+            train_xgb_kfold(X, y, folds, params, enable_categorical=not encode_categoricals,
+                            n_workers=args.n_workers)
+            return
+
+        # [Update] 기존 모델에 새 데이터로 추가 학습, 검증 AP가 떨어지면 아래 전체 학습으로 대체
+        result = None
+        if base_model is not None:
+            print(f"\n[Step 2] 저장된 모델 업데이트 중 (warm-start: {args.update})...")
+            result = update_model(base_model, X, y, mode=args.update)
+            if result is None:
+                print("→ 전체 재학습(하이퍼파라미터 탐색 포함)으로 대체합니다.")
+
+        # 4. 모델 학습 (Optuna 튜닝 적용)
+        if result is not None:
+            model, X_va, va_proba, y_va = result
+        else:
+            print(f"\n[Step 2] {backend.name} 모델 학습 및 하이퍼파라미터 튜닝 중...")
+            model, X_va, va_proba, y_va = train_model(
+                X, y, use_tuning=True, enable_categorical=not encode_categoricals,
+                n_trials=args.n_trials, n_workers=args.n_workers, study_name=study_name, backend=backend,
+                multi_objective=args.multi_objective, latency_budget_ms=args.latency_budget
+            )
+        # 변환기는 컬럼 순서와 범주 목록만 필요하므로 parquet은 스키마 + 범주형 컬럼만 읽음
+        if resolve_data_path(data_path).suffix == ".parquet":
+            transformer.fit_parquet(resolve_data_path(data_path))
+        else:
+            transformer.fit(load_data(data_path))
     
     # 5. 결과 저장
-    results_dir = "results"
     if not os.path.exists(results_dir):
         os.makedirs(results_dir)
         
+    # 저장 전에 변환기와 모델의 컬럼을 확인 (불일치하면 기존 모델/변환기 쌍을 그대로 둠)
+    feature_names = model_feature_names(model)
+    if transformer.feature_names != list(feature_names):
+        raise ValueError("피처 변환기의 컬럼이 학습 데이터와 일치하지 않습니다.")
+
     print(f"\n[Step 3] 모델을 {results_dir}에 저장 중...")
-    with open(os.path.join(results_dir, "xgboost_model.pkl"), "wb") as f:
-        pickle.dump(model, f)
-    
-    # 피처 이름 저장
-    feature_names = model.get_booster().feature_names
+    # 피처 변환기 / 피처 이름 저장
+    transformer.save(os.path.join(results_dir, TRANSFORMER_FILE))
     with open(os.path.join(results_dir, "feature_names.pkl"), "wb") as f:
         pickle.dump(feature_names, f)
+
+    # 백엔드별 파일(xgboost_model.pkl / lightgbm_model.pkl)에 저장하고, 추론 시 불러올 모델로 기록
+    save_model(model, backend, results_dir)
         
     # 6. 평가 및 SHAP 분석
     print("\n[Step 4] 모델 평가 및 시각화 생성 중...")
@@ -96,7 +96,8 @@ def plot_shap_values(model, X_tr, X_va, results_dir="results"):
         X_va_sample = X_va
 
     print("SHAP 값 계산 중 (시간이 소요될 수 있습니다)...")
-    explainer = shap.TreeExplainer(model)
+    # LightGBMClassifier(backends)는 감싼 Booster를 설명
+    explainer = shap.TreeExplainer(getattr(model, "booster_", model))
     shap_values = explainer.shap_values(X_va_sample)
     
     # SHAP 요약 플롯
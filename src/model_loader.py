@@ -4,6 +4,9 @@ import pandas as pd
 import numpy as np
 import streamlit as st
 from pathlib import Path
+from src.feature_transformer import FeatureTransformer, TRANSFORMER_FILE
+from src.backends import model_path, feature_names as model_feature_names
+from src.tree_predictor import fast_predictor
 
 ROOT_DIR = Path(__file__).resolve().parents[1]
 MODELS_DIR = ROOT_DIR / "results"  # 모델이 results 폴더에 있음
@@ -11,8 +14,8 @@ MODELS_DIR = ROOT_DIR / "results"  # 모델이 results 폴더에 있음
 @st.cache_resource
 def get_resources():
     try:
-        # 1. XGBoost 로드 (.pkl)
-        xgb = joblib.load(MODELS_DIR / "xgboost_model.pkl")
+        # 1. 트리 모델 로드 (.pkl, 마지막으로 학습한 백엔드: xgboost / lightgbm)
+        xgb = joblib.load(model_path(MODELS_DIR))
         
         # 2. ResNet 로드 (.pth) - CPU  방식 로드.
         # 전체 저장 방식(torch.save) 기준으로 로드
@@ -23,9 +26,17 @@ def get_resources():
         scaler = joblib.load(MODELS_DIR / "resnet_scaler.pkl")
         
         # 피처 이름은 학습 데이터셋에서 직접 추출하거나 고정 (XGBoost 객체에서 추출 권장)
-        feature_names = xgb.get_booster().feature_names
+        feature_names = model_feature_names(xgb)
+        # XGBoost는 1행 예측용 NumPy 예측기로 변환 (predict_proba 동일, 호출당 네이티브 오버헤드 없음)
+        xgb = fast_predictor(xgb)
         
-        return xgb, resnet, scaler, feature_names
+        # 4. 피처 변환기 로드 (없으면 reindex 방식 사용)
+        #    (트리 모델용, ResNet용) 쌍: 트리 모델이 native categorical이면 ResNet용은 같은 범주 사전의 원-핫 변환기
+        transformer_path = MODELS_DIR / TRANSFORMER_FILE
+        transformer = FeatureTransformer.load(transformer_path) if transformer_path.exists() else None
+        transformers = (transformer, transformer.with_encoding(True) if transformer is not None else None)
+        
+        return xgb, resnet, scaler, feature_names, transformers
     except Exception as e:
         st.error(f"모델 로드 실패: {e}")
         return None
@@ -33,17 +44,23 @@ def get_resources():
 def predict_churn(data_dict):
     res = get_resources()
     if not res: return 0.0, 0.0, 0.0
-    xgb, resnet, scaler, feature_names = res
+    xgb, resnet, scaler, feature_names, (transformer, resnet_transformer) = res
     
-    # 데이터프레임 생성 및 정렬
-    df = pd.DataFrame([data_dict]).reindex(columns=feature_names, fill_value=0)
+    # 입력 벡터 생성 (학습 시 컬럼 순서의 float32 1행)
+    # (XGBoost가 native categorical이면 ResNet에는 같은 범주 사전의 원-핫 벡터를 사용)
+    if transformer is not None:
+        x = transformer.transform_one(data_dict)
+        x_resnet = x if resnet_transformer is transformer else resnet_transformer.transform_one(data_dict)
+    else:
+        x = pd.DataFrame([data_dict]).reindex(columns=feature_names, fill_value=0).to_numpy(np.float32)
+        x_resnet = x
     
     # XGBoost 예측
-    p_xgb = xgb.predict_proba(df)[0][1]
+    p_xgb = xgb.predict_proba(x)[0][1]
     
     # ResNet 예측 (0% 에러 방지용 Sigmoid 처리)
-    scaled_df = scaler.transform(df)
-    input_tensor = torch.tensor(scaled_df, dtype=torch.float32)
+    scaled_df = (x_resnet - scaler.mean_) / scaler.scale_
+    input_tensor = torch.from_numpy(scaled_df.astype(np.float32))
     with torch.no_grad():
         output = resnet(input_tensor)
         # 로짓(음수 포함)으로 나올 경우를 대비해 반드시 Sigmoid 적용
@@ -1,58 +1,707 @@
+import copy
+import os
+import time
+from functools import partial
+from pathlib import Path
+
+import xgboost as xgb
 from xgboost import XGBClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import average_precision_score
 import optuna
 import numpy as np
+import pandas as pd
+
+from src.data_loader import SCHEMAS, apply_schema, infer_table
+from src.oof import INNER_VALID_SIZE, OOF_DIR, fold_split, oof_writer, record_model
+from src.tuning import OPTUNA_STORAGE, finished_trials, get_storage, run_processes
+
+EARLY_STOPPING_ROUNDS = 20
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+# 이전 탐색의 상위 trial로 warm-start (저장소: tuning.OPTUNA_STORAGE)
+WARM_START_TOP_K = 5
+
+# pruning: 앞선 trial들의 같은 라운드 검증 AP 중앙값보다 낮으면 중단
+PRUNER_STARTUP_TRIALS = 5
+PRUNER_WARMUP_ROUNDS = EARLY_STOPPING_ROUNDS
+
+# 다목적 탐색 (검증 AP ↑, 추론 지연 ↓): 고정 벤치마크 배치의 predict 지연 중앙값
+# 워커 수(--n-workers)와 무관하게 비교되도록 스레드 수를 고정하고,
+# 탐색이 끝나면 Pareto 후보만 한 프로세스에서 차례로 다시 측정 (retime_pareto)
+LATENCY_BATCH_ROWS = 1024
+LATENCY_REPEATS = 10
+LATENCY_THREADS = 1
+
+# 기존 모델 warm-start 업데이트 (update_model)
+UPDATE_ROUNDS = 100                 # continue: 새 데이터로 추가할 최대 트리 수 (early stopping)
+UPDATE_AP_TOLERANCE = 0.005         # 업데이트 모델 AP가 기존 모델보다 이만큼 넘게 낮으면 실패 처리
+
+# parquet 배치 학습 (train_model_from_parquet)
+PARQUET_BATCH_SIZE = 100_000
+VALID_PCT = 20                      # msno 해시 기준 검증 비율 (%)
+EVAL_SAMPLE_ROWS = 10_000           # 반환할 검증 피처 표본 (SHAP 등 시각화용)
+EXTMEM_CACHE_DIR = ROOT_DIR / "data" / "cache" / "xgb_extmem"
+
+
+def build_dmatrices(X_tr, y_tr, X_va, y_va, enable_categorical=False):
+    """
+    학습/검증 데이터를 한 번만 양자화(histogram bin)하여 QuantileDMatrix로 만듭니다.
+    검증 행렬은 학습 행렬의 bin 경계(ref)를 공유합니다.
+    """
+    dtrain = xgb.QuantileDMatrix(X_tr, y_tr, enable_categorical=enable_categorical)
+    dvalid = xgb.QuantileDMatrix(X_va, y_va, ref=dtrain, enable_categorical=enable_categorical)
+    return dtrain, dvalid
+
+
+def _valid_mask(msno, valid_pct=VALID_PCT):
+    """
+    msno 해시로 검증 행을 고릅니다. (배치 크기/행 순서와 무관하게 항상 같은 분할)
+    반환: (검증 여부, 표본 추출용 해시 키)
+    """
+    h = pd.util.hash_array(np.asarray(msno, dtype=object))
+    return h % 100 < valid_pct, h // 100
+
+
+class ParquetBatchIter(xgb.DataIter):
+    """
+    parquet을 batch_size 행씩 읽어 FeatureTransformer로 변환한 뒤 XGBoost에 넘기는 데이터 반복자.
+    XGBoost가 행렬을 만들며 여러 번 순회하므로, 메모리에는 한 번에 한 배치만 올라갑니다.
+    split="train"/"valid": _valid_mask로 나눈 학습/검증 행만 넘김
+    """
+
+    def __init__(self, data_path, transformer, split="train", valid_pct=VALID_PCT,
+                 batch_size=PARQUET_BATCH_SIZE, cache_prefix=None):
+        self.data_path = Path(data_path)
+        self.transformer = transformer
+        self.split = split
+        self.valid_pct = valid_pct
+        self.batch_size = batch_size
+        self.schema = SCHEMAS.get(infer_table(self.data_path))
+        self.feature_types = None
+        if not transformer.encode_categoricals:
+            self.feature_types = ["c" if name in transformer.categories else "q"
+                                  for name in transformer.feature_names]
+        self._batches = None
+        super().__init__(cache_prefix=cache_prefix, release_data=True)
+
+    def _iter_frames(self, columns=None):
+        """(이 split의 행만 남긴 DataFrame, 표본 키) 배치를 차례로 반환 (load_data와 같은 스키마 적용)"""
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(self.data_path).iter_batches(batch_size=self.batch_size, columns=columns):
+            df = batch.to_pandas()
+            valid, key = _valid_mask(df["msno"], self.valid_pct)
+            keep = valid if self.split == "valid" else ~valid
+            df = df[keep].reset_index(drop=True)
+            if self.schema:
+                df = apply_schema(df, self.schema)
+            yield df, key[keep]
+
+    def next(self, input_data):
+        if self._batches is None:
+            self._batches = self._iter_frames()
+        for df, _ in self._batches:
+            if len(df) == 0:
+                continue
+            input_data(
+                data=self.transformer.transform_batch(df),
+                label=df["is_churn"].to_numpy(dtype=np.float32),
+                feature_names=self.transformer.feature_names,
+                feature_types=self.feature_types,
+            )
+            return True
+        return False
+
+    def reset(self):
+        self._batches = None
+
+    def label_counts(self):
+        """라벨 컬럼만 읽어 (음성 수, 양성 수)를 셉니다."""
+        counts = np.zeros(2, dtype=np.int64)
+        for df, _ in self._iter_frames(columns=["msno", "is_churn"]):
+            counts += np.bincount(df["is_churn"].to_numpy(dtype=np.int64), minlength=2)[:2]
+        return int(counts[0]), int(counts[1])
+
+    def sample(self, n_rows=EVAL_SAMPLE_ROWS):
+        """
+        해시 키가 가장 작은 n_rows개 행을 변환된 피처 DataFrame으로 반환합니다. (균등 표본, 배치마다 상위 n_rows만 유지)
+        native 모드의 범주형 컬럼은 category로 복원합니다. (학습 때의 pandas 입력과 같은 형태)
+        """
+        parts, keys = [], np.empty(0, dtype=np.uint64)
+        for df, key in self._iter_frames():
+            parts.append(pd.DataFrame(self.transformer.transform_batch(df),
+                                      columns=self.transformer.feature_names))
+            keys = np.concatenate([keys, key])
+            X = pd.concat(parts, ignore_index=True)
+            top = np.argsort(keys, kind="stable")[:n_rows]
+            parts, keys = [X.iloc[top].reset_index(drop=True)], keys[top]
+        X = parts[0] if parts else pd.DataFrame(columns=self.transformer.feature_names, dtype=np.float32)
+        if not self.transformer.encode_categoricals:
+            for col, cats in self.transformer.categories.items():
+                codes = np.nan_to_num(X[col].to_numpy(), nan=-1).astype(np.int32)
+                X[col] = pd.Categorical.from_codes(codes, categories=cats)
+        return X
+
+
+def build_parquet_dmatrices(data_path, transformer, batch_size=PARQUET_BATCH_SIZE, valid_pct=VALID_PCT,
+                            external_memory=False, cache_dir=EXTMEM_CACHE_DIR):
+    """
+    parquet을 배치 단위로 읽어 학습/검증 행렬을 만듭니다. (X 전체를 메모리에 올리지 않음)
+    - external_memory=False: 반복자로 만든 QuantileDMatrix (양자화된 행렬만 메모리에 남음)
+    - external_memory=True : ExtMemQuantileDMatrix (양자화된 페이지를 cache_dir 디스크 캐시에 두고 학습 중 읽음)
+    검증 행렬은 학습 행렬의 bin 경계(ref)를 공유합니다.
+    """
+    def make_iter(split):
+        prefix = None
+        if external_memory:
+            Path(cache_dir).mkdir(parents=True, exist_ok=True)
+            prefix = str(Path(cache_dir) / f"{split}-{os.getpid()}")
+        return ParquetBatchIter(data_path, transformer, split, valid_pct, batch_size, cache_prefix=prefix)
+
+    enable_categorical = not transformer.encode_categoricals
+    matrix = xgb.ExtMemQuantileDMatrix if external_memory else xgb.QuantileDMatrix
+    dtrain = matrix(make_iter("train"), enable_categorical=enable_categorical)
+    dvalid = matrix(make_iter("valid"), ref=dtrain, enable_categorical=enable_categorical)
+    return dtrain, dvalid
+
+
+def _booster_params(params):
+    """XGBClassifier 형식 파라미터 → (xgb.train 파라미터, 부스팅 라운드 수)"""
+    params = dict(params)
+    n_rounds = params.pop("n_estimators")
+    params.pop("enable_categorical", None)
+    params["seed"] = params.pop("random_state")
+    if "n_jobs" in params:
+        params["nthread"] = params.pop("n_jobs")
+    params.update(objective="binary:logistic", tree_method="hist")
+    return params, n_rounds
+
+
+def train_booster(params, dtrain, dvalid, callbacks=None):
+    """
+    미리 만든 QuantileDMatrix로 xgb.train 학습 (검증 logloss 기준 early stopping)
+    callbacks가 있으면 검증 aucpr(=AP)도 매 라운드 계산합니다. (early stopping은 마지막 지표인 logloss 기준)
+    """
+    booster_params, n_rounds = _booster_params(params)
+    if callbacks:
+        booster_params["eval_metric"] = ["aucpr", booster_params["eval_metric"]]
+    return xgb.train(
+        booster_params, dtrain, num_boost_round=n_rounds,
+        evals=[(dvalid, "valid")], early_stopping_rounds=EARLY_STOPPING_ROUNDS, verbose_eval=False,
+        callbacks=callbacks
+    )
+
+
+class OptunaPruningCallback(xgb.callback.TrainingCallback):
+    """매 라운드 검증 AP(aucpr)를 Optuna trial에 보고하고, pruner가 판단하면 학습을 중단합니다."""
+
+    def __init__(self, trial, data_name="valid", metric="aucpr"):
+        self.trial = trial
+        self.data_name = data_name
+        self.metric = metric
 
-def train_model(X, y, use_tuning=False):
+    def after_iteration(self, model, epoch, evals_log):
+        score = evals_log[self.data_name][self.metric][-1]
+        self.trial.report(score, step=epoch)
+        if self.trial.should_prune():
+            raise optuna.TrialPruned(f"{epoch}라운드에서 중단 (valid-{self.metric}: {score:.4f})")
+        return False
+
+
+def warm_start(study, storage, top_k=WARM_START_TOP_K):
+    """
+    새 study에 같은 저장소의 다른 study들에서 가장 좋았던 trial 파라미터를 먼저 시도하도록 등록합니다.
     """
-    XGBoost 분류기를 학습합니다. 
+    if study.trials:
+        return 0
+    previous = []
+    for summary in optuna.get_all_study_summaries(storage):
+        if summary.study_name == study.study_name:
+            continue
+        other = optuna.load_study(study_name=summary.study_name, storage=storage)
+        previous += other.get_trials(deepcopy=False, states=(optuna.trial.TrialState.COMPLETE,))
+    best = sorted(previous, key=lambda t: t.values[0], reverse=True)[:top_k]   # 다목적 study도 첫 목적은 AP
+    for trial in best:
+        study.enqueue_trial(trial.params, skip_if_exists=True)
+    return len(best)
+
+
+def measure_latency_ms(predict, repeats=LATENCY_REPEATS, sync=None):
+    """
+    predict()를 repeats번 호출한 지연 중앙값 (ms, 첫 호출은 워밍업으로 제외)
+    sync: 비동기 장치(CUDA)면 호출마다 연산 완료를 기다릴 함수 (torch.cuda.synchronize)
+    """
+    predict()
+    if sync is not None:
+        sync()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict()
+        if sync is not None:
+            sync()
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times))
+
+
+def trial_model_path(model_dir, number, suffix=".pkl"):
+    """다목적 탐색 trial 모델 파일 (Pareto 후보 재측정용)"""
+    return Path(model_dir) / f"trial_{number}{suffix}"
+
+
+def _objective(trial, backend, dtrain, dvalid, y_va, base_params, X_bench=None, model_dir=None):
+    """
+    검증 AP (X_bench가 있으면 (AP, X_bench 배치 추론 지연 ms)의 다목적 값)
+    다목적이면 지연은 LATENCY_THREADS 스레드로 재고, 탐색 후 재측정할 수 있도록 모델을 model_dir에 저장합니다.
+    """
+    param = {**backend.suggest_params(trial), **base_params}
+    # 다목적 study는 중간값 보고(pruning)를 지원하지 않음
+    booster = backend.train(param, dtrain, dvalid, trial if X_bench is None else None)
+    preds_proba = backend.predict(booster, dvalid)
+    ap = average_precision_score(y_va, preds_proba)
+    if X_bench is None:
+        return ap
+    backend.save(booster, trial_model_path(model_dir, trial.number))
+    return ap, measure_latency_ms(lambda: backend.predict_batch(booster, X_bench, LATENCY_THREADS))
+
+
+def _tuning_worker(storage, study_name, n_trials, build, base_params, backend="xgboost", X_bench=None,
+                   model_dir=None):
+    """
+    탐색 워커. build()로 학습/검증 행렬을 한 번 만들고,
+    저장소의 완료+중단 trial 수가 n_trials에 도달할 때까지 trial을 실행합니다.
+    만든 행렬을 반환합니다. (워커 1개일 때 같은 프로세스의 최종 학습에서 재사용)
+    """
+    from src.backends import get_backend
+
+    backend = get_backend(backend)
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    study = optuna.load_study(study_name=study_name, storage=get_storage(storage))
+    dtrain, dvalid = build()
+    y_va = dvalid.get_label()
+    stop = optuna.study.MaxTrialsCallback(
+        n_trials, states=(optuna.trial.TrialState.COMPLETE, optuna.trial.TrialState.PRUNED)
+    )
+    if len(finished_trials(study)) < n_trials:
+        study.optimize(
+            lambda trial: _objective(trial, backend, dtrain, dvalid, y_va, base_params, X_bench, model_dir),
+            callbacks=[stop]
+        )
+    return dtrain, dvalid
+
+
+def tune_params(X_tr, y_tr, X_va, y_va, base_params, n_trials=10, n_workers=None,
+                storage=None, study_name="xgb_churn", backend="xgboost", multi_objective=False,
+                latency_budget_ms=None):
+    """메모리의 학습/검증 데이터로 하이퍼파라미터를 탐색합니다. (run_tuning 참고)"""
+    from src.backends import get_backend
+
+    build = partial(get_backend(backend).build, X_tr, y_tr, X_va, y_va, base_params["enable_categorical"])
+    X_bench = X_va.iloc[:LATENCY_BATCH_ROWS] if multi_objective else None
+    return run_tuning(build, base_params, n_trials, n_workers, storage, study_name, backend,
+                      X_bench, latency_budget_ms)
+
+
+def run_tuning(build, base_params, n_trials=10, n_workers=None, storage=None, study_name="xgb_churn",
+               backend="xgboost", X_bench=None, latency_budget_ms=None):
+    """
+    Optuna로 하이퍼파라미터를 탐색하고 최적 파라미터를 반환합니다.
+    - build(): (dtrain, dvalid)를 만드는 함수 (워커마다 한 번 호출)
+    - backend: 학습 백엔드 이름 (src.backends, 탐색 공간/저장소는 백엔드별)
+    - n_workers개의 프로세스가 CPU 코어를 나눠 쓰며 trial을 병렬 실행
+    - 매 라운드 검증 AP로 가망 없는 trial은 중간에 중단(MedianPruner)
+    - study는 저장소에 남아, 같은 study_name으로 다시 실행하면 남은 trial만 이어서 실행
+    - 새 study는 저장소의 이전 study들의 상위 trial로 warm-start
+    - X_bench(고정 벤치마크 배치)를 주면 (AP ↑, X_bench 추론 지연 ↓) 다목적 탐색 (pruning 없음)
+      탐색 중 지연은 LATENCY_THREADS 스레드로 재고, 끝나면 Pareto 후보를 차례로 다시 측정해(retime_pareto)
+      Pareto 최적 trial 표를 <저장소 폴더>/<study_name>_pareto.csv로 저장하고,
+      latency_budget_ms 이내 후보 중 AP가 가장 높은 trial을 선택합니다. (select_trial)
+    반환: (최적 파라미터, 같은 프로세스에서 만든 (dtrain, dvalid) 또는 None)
+    """
+    from src.backends import get_backend
+
+    n_cores = os.cpu_count() or 1
+    if n_workers is None:
+        n_workers = max(1, n_cores // 2)
+    n_workers = max(1, min(n_workers, n_trials))
+    base_params = {**base_params, 'n_jobs': max(1, n_cores // n_workers)}
+    storage = storage or get_backend(backend).storage
+
+    optuna_storage = get_storage(storage)
+    multi_objective = X_bench is not None
+    study = optuna.create_study(
+        study_name=study_name, storage=optuna_storage, load_if_exists=True,
+        directions=['maximize', 'minimize'] if multi_objective else ['maximize'],
+        pruner=optuna.pruners.MedianPruner(n_startup_trials=PRUNER_STARTUP_TRIALS,
+                                           n_warmup_steps=PRUNER_WARMUP_ROUNDS)
+    )
+    done = len(finished_trials(study))
+    n_warm = warm_start(study, optuna_storage)
+    print(f"study '{study_name}': 완료된 trial {done}개 / 목표 {n_trials}개"
+          + (f" (이전 탐색 상위 {n_warm}개로 warm-start)" if n_warm else ""))
+    print(f"워커 {n_workers}개 × 스레드 {base_params['n_jobs']}개"
+          + (f" (다목적: AP + {len(X_bench)}행 배치 추론 지연)" if multi_objective else ""))
+
+    model_dir = candidate_dir(storage, study_name) if multi_objective else None
+    args = (storage, study_name, n_trials, build, base_params, backend, X_bench, model_dir)
+    dmatrices = None
+    if n_workers == 1:
+        dmatrices = _tuning_worker(*args)
+    else:
+        run_processes(_tuning_worker, [args] * n_workers, "Optuna 워커")
+
+    study = optuna.load_study(study_name=study_name, storage=optuna_storage)
+    states = [t.state for t in study.trials]
+    print(f"trial 완료 {states.count(optuna.trial.TrialState.COMPLETE)}개, "
+          f"중단(pruned) {states.count(optuna.trial.TrialState.PRUNED)}개, "
+          f"최고 AP {max(t.values[0] for t in finished_trials(study, (optuna.trial.TrialState.COMPLETE,))):.4f}")
+    if not multi_objective:
+        return dict(study.best_params), dmatrices
+
+    backend = get_backend(backend)
+
+    def measure(trial):
+        path = trial_model_path(model_dir, trial.number)
+        if not path.exists():
+            return None
+        booster = backend.load(path)
+        return measure_latency_ms(lambda: backend.predict_batch(booster, X_bench, LATENCY_THREADS))
+
+    trials = retime_pareto(study, measure, model_dir)
+    front = pareto_table(trials)
+    path = pareto_path(storage, study_name)
+    front.to_csv(path, index=False)
+    print(f"\n[Pareto] AP-추론 지연 최적 trial {len(front)}개 (지연 재측정) → {path}")
+    print(front.to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+    chosen = select_trial(trials, latency_budget_ms)
+    print(f"선택: trial {chosen.number} (AP {chosen.values[0]:.4f}, 지연 {chosen.values[1]:.2f}ms"
+          + (f", 예산 {latency_budget_ms}ms)" if latency_budget_ms else ")"))
+    return dict(chosen.params), dmatrices
+
+
+def pareto_table(trials):
+    """다목적 Pareto 최적 trial 표 (trial, ap, latency_ms, 파라미터; AP 내림차순)"""
+    rows = [{"trial": t.number, "ap": t.values[0], "latency_ms": t.values[1], **t.params} for t in trials]
+    return pd.DataFrame(rows).sort_values("ap", ascending=False, ignore_index=True)
+
+
+def pareto_path(storage, study_name):
+    """Pareto 표 저장 위치 (파일 저장소면 같은 폴더, URL 저장소면 results/optuna)"""
+    folder = OPTUNA_STORAGE.parent if isinstance(storage, str) and "://" in storage else Path(storage).parent
+    folder.mkdir(parents=True, exist_ok=True)
+    return folder / f"{study_name}_pareto.csv"
+
+
+def candidate_dir(storage, study_name):
+    """다목적 탐색 trial 모델 폴더 (<Pareto 표 폴더>/<study_name>_models)"""
+    folder = pareto_path(storage, study_name).with_name(f"{study_name}_models")
+    folder.mkdir(parents=True, exist_ok=True)
+    return folder
+
+
+def pareto_trials(study):
+    """
+    Pareto 최적 trial (재측정한 지연이 있으면 그 값으로 바꾼 복사본, 바꾼 값 기준으로 다시 비지배인 trial만)
+    """
+    retimed = study.user_attrs.get("retimed_latency_ms", {})
+    trials = []
+    for t in study.best_trials:
+        if str(t.number) in retimed:
+            t = copy.deepcopy(t)
+            t.values = [t.values[0], retimed[str(t.number)]]
+        trials.append(t)
+    return [
+        t for t in trials
+        if not any(o.values[0] >= t.values[0] and o.values[1] <= t.values[1] and o.values != t.values for o in trials)
+    ]
+
+
+def retime_pareto(study, measure, model_dir):
+    """
+    탐색 중 지연은 다른 워커의 학습과 동시에 잰 값이므로, 탐색이 끝난 뒤 Pareto 후보만 한 프로세스에서
+    차례로 다시 측정해 study user attr(retimed_latency_ms)에 기록합니다. (load_best_params도 같은 값 사용)
+    measure(trial): model_dir에 저장된 trial 모델의 지연(ms), 모델이 없으면 None (탐색 중 값 유지)
+    후보가 아닌 trial의 모델 파일은 지웁니다. (한 번 지배된 trial은 이후 trial이 늘어도 후보가 되지 않음)
+    반환: pareto_trials(study)
+    """
+    retimed = dict(study.user_attrs.get("retimed_latency_ms", {}))
+    front = study.best_trials
+    for t in front:
+        latency_ms = measure(t)
+        if latency_ms is not None:
+            retimed[str(t.number)] = latency_ms
+    study.set_user_attr("retimed_latency_ms", retimed)
+    keep = {trial_model_path(model_dir, t.number).stem for t in front}
+    for path in Path(model_dir).glob("trial_*"):
+        if path.stem not in keep:
+            path.unlink()
+    return pareto_trials(study)
+
+
+def select_trial(trials, latency_budget_ms=None):
+    """
+    Pareto 최적 trial 중 지연(values[1])이 latency_budget_ms 이내인 것의 AP 최고 trial
+    (예산이 없으면 AP 최고, 예산 안에 드는 trial이 없으면 가장 빠른 trial)
+    """
+    within = [t for t in trials if latency_budget_ms is None or t.values[1] <= latency_budget_ms]
+    if not within:
+        print(f"⚠️ 지연 예산 {latency_budget_ms}ms 이내 후보가 없어 가장 빠른 trial을 선택합니다.")
+        return min(trials, key=lambda t: t.values[1])
+    return max(within, key=lambda t: t.values[0])
+
+
+def load_best_params(study_name, storage=OPTUNA_STORAGE, latency_budget_ms=None):
+    """저장소에 완료된 trial이 있는 study면 최적 파라미터 (다목적 study는 select_trial), 아니면 None"""
+    try:
+        study = optuna.load_study(study_name=study_name, storage=get_storage(storage))
+    except KeyError:
+        return None
+    if not finished_trials(study, states=(optuna.trial.TrialState.COMPLETE,)):
+        return None
+    if len(study.directions) > 1:
+        return dict(select_trial(pareto_trials(study), latency_budget_ms).params)
+    return dict(study.best_params)
+
+
+def to_classifier(booster, params):
+    """학습된 Booster를 XGBClassifier로 감쌉니다. (predict_proba / pickle / SHAP 등 기존 사용처 호환)"""
+    model = XGBClassifier(**params, early_stopping_rounds=EARLY_STOPPING_ROUNDS)
+    model.load_model(booster.save_raw("ubj"))
+    return model
+
+
+def train_model(X, y, use_tuning=False, enable_categorical=False, n_trials=10, n_workers=None,
+                storage=None, study_name="xgb_churn", backend="xgboost", multi_objective=False,
+                latency_budget_ms=None):
+    """
+    트리 모델 분류기(기본 XGBoost)를 학습합니다. 
     - use_tuning=True일 경우 Optuna를 사용해 최적의 하이퍼파라미터를 찾습니다.
+      (병렬 워커, 라운드별 AP pruning, 저장소 기반 재개/warm-start: tune_params 참고)
+    - enable_categorical=True일 경우 X의 category 컬럼을 원-핫 없이 그대로 학습하고
+      범주 목록을 model.category_mapping_에 저장합니다.
+    - backend: "xgboost" / "lightgbm" (src.backends)
+    - multi_objective=True면 검증 AP와 LATENCY_BATCH_ROWS행 배치 추론 지연을 함께 탐색하고,
+      Pareto 최적 trial 중 latency_budget_ms 이내에서 AP가 가장 높은 파라미터로 학습합니다.
+    학습/검증 데이터는 프로세스마다 QuantileDMatrix(LightGBM은 Dataset)로 한 번만 양자화하여
+    모든 trial과 최종 학습에서 재사용합니다.
     """
+    from src.backends import get_backend
+
+    backend = get_backend(backend)
     # 데이터 분리 (8:2)
     X_tr, X_va, y_tr, y_va = train_test_split(
         X, y, test_size=0.2, random_state=42, stratify=y
     )
     
     scale_pos_weight = (y_tr == 0).sum() / (y_tr == 1).sum()
+    base_params = backend.base_params(scale_pos_weight, enable_categorical)
     
     if use_tuning:
-        print("\n[Optuna] 하이퍼파라미터 튜닝 시작 (10회 시도)...")
-        
-        def objective(trial):
-            param = {
-                'n_estimators': trial.suggest_int('n_estimators', 100, 500),
-                'max_depth': trial.suggest_int('max_depth', 3, 10),
-                'learning_rate': trial.suggest_float('learning_rate', 0.01, 0.3, log=True),
-                'subsample': trial.suggest_float('subsample', 0.5, 1.0),
-                'colsample_bytree': trial.suggest_float('colsample_bytree', 0.5, 1.0),
-                'min_child_weight': trial.suggest_int('min_child_weight', 1, 10),
-                'scale_pos_weight': scale_pos_weight,
-                'eval_metric': 'logloss',
-                'random_state': 42
-            }
-            model = XGBClassifier(**param, early_stopping_rounds=20)
-            model.fit(X_tr, y_tr, eval_set=[(X_va, y_va)], verbose=False)
-            preds_proba = model.predict_proba(X_va)[:, 1]
-            return average_precision_score(y_va, preds_proba)
-
-        study = optuna.create_study(direction='maximize')
-        study.optimize(objective, n_trials=10)
+        print(f"\n[Optuna] {backend.name} 하이퍼파라미터 튜닝 시작 ({n_trials}회 시도)...")
+        best_params, dmatrices = tune_params(X_tr, y_tr, X_va, y_va, base_params,
+                                             n_trials, n_workers, storage, study_name, backend.name,
+                                             multi_objective, latency_budget_ms)
         
-        print("\n최적의 파라미터:", study.best_params)
-        best_params = study.best_params
-        best_params.update({'scale_pos_weight': scale_pos_weight, 'eval_metric': 'logloss', 'random_state': 42})
+        print("\n최적의 파라미터:", best_params)
+        best_params.update(base_params)
     else:
-        best_params = {
-            'n_estimators': 300, 'max_depth': 10, 'learning_rate': 0.05,
-            'scale_pos_weight': scale_pos_weight, 'eval_metric': 'logloss', 'random_state': 42
-        }
+        dmatrices = None
+        best_params = {**backend.default_params(), **base_params}
 
-    print(f"최종 모델 학습 시작... (파생 변수 포함, scale_pos_weight: {scale_pos_weight:.2f})")
-    model = XGBClassifier(**best_params, early_stopping_rounds=20)
-    model.fit(X_tr, y_tr, eval_set=[(X_va, y_va)], verbose=False)
+    # 탐색을 같은 프로세스에서 했다면 그때 만든 행렬 재사용 (병렬 워커는 각자 만들고 종료)
+    dtrain, dvalid = dmatrices or backend.build(X_tr, y_tr, X_va, y_va, enable_categorical)
+
+    print(f"최종 모델 학습 시작... ({backend.name}, 파생 변수 포함, scale_pos_weight: {scale_pos_weight:.2f})")
+    model = backend.fit_final(best_params, dtrain, dvalid, X_tr, y_tr, X_va, y_va)
+
+    # 범주 사전 저장 (추론 시 범주 코드 = 이 목록의 위치)
+    if enable_categorical:
+        model.category_mapping_ = {
+            col: list(X[col].cat.categories) for col in X.select_dtypes(include="category").columns
+        }
     
     va_proba = model.predict_proba(X_va)[:, 1]
     print("모델 학습 완료.")
     
     return model, X_va, va_proba, y_va
+
+
+def train_model_from_parquet(data_path, transformer, use_tuning=False, n_trials=10, n_workers=None,
+                             storage=OPTUNA_STORAGE, study_name="xgb_churn_parquet",
+                             batch_size=PARQUET_BATCH_SIZE, external_memory=False, multi_objective=False,
+                             latency_budget_ms=None):
+    """
+    X를 메모리에 만들지 않고 parquet 배치 반복자로 XGBoost를 학습합니다. (최대 메모리 ≈ 한 배치 + 양자화 캐시)
+    - transformer: 학습 컬럼/범주 사전이 고정된 FeatureTransformer (fit_parquet 등으로 미리 fit)
+    - external_memory=True면 양자화된 행렬도 디스크 캐시(ExtMemQuantileDMatrix)에 둡니다.
+    - 검증 분할은 msno 해시 기준 VALID_PCT% (train_model의 층화 분할과 다르므로 AP를 직접 비교하지 마세요)
+    - multi_objective / latency_budget_ms: train_model과 같음 (벤치마크 배치는 검증 분할 표본)
+    반환: (model, 검증 피처 표본 EVAL_SAMPLE_ROWS행, 전체 검증 예측 확률, 전체 검증 라벨)
+    """
+    data_path = Path(data_path)
+    enable_categorical = not transformer.encode_categoricals
+    n_neg, n_pos = ParquetBatchIter(data_path, transformer, "train", batch_size=batch_size).label_counts()
+    scale_pos_weight = n_neg / n_pos
+    base_params = {'scale_pos_weight': scale_pos_weight, 'eval_metric': 'logloss', 'random_state': 42,
+                   'enable_categorical': enable_categorical}
+    build = partial(build_parquet_dmatrices, data_path, transformer, batch_size, VALID_PCT, external_memory)
+
+    if use_tuning:
+        print(f"\n[Optuna] 하이퍼파라미터 튜닝 시작 ({n_trials}회 시도)...")
+        X_bench = None
+        if multi_objective:
+            X_bench = ParquetBatchIter(data_path, transformer, "valid", batch_size=batch_size).sample(LATENCY_BATCH_ROWS)
+        best_params, dmatrices = run_tuning(build, base_params, n_trials, n_workers, storage, study_name,
+                                            X_bench=X_bench, latency_budget_ms=latency_budget_ms)
+        print("\n최적의 파라미터:", best_params)
+        best_params.update(base_params)
+    else:
+        dmatrices = None
+        best_params = {'n_estimators': 300, 'max_depth': 10, 'learning_rate': 0.05, **base_params}
+
+    mode = "external memory" if external_memory else "iterator"
+    print(f"parquet 배치({batch_size:,}행) {mode} 행렬 생성 중...")
+    dtrain, dvalid = dmatrices or build()
+    print(f"학습 {dtrain.num_row():,}행 / 검증 {dvalid.num_row():,}행")
+
+    print(f"최종 모델 학습 시작... (파생 변수 포함, scale_pos_weight: {scale_pos_weight:.2f})")
+    booster = train_booster(best_params, dtrain, dvalid)
+    model = to_classifier(booster, best_params)
+    if enable_categorical:
+        model.category_mapping_ = transformer.category_mapping
+
+    va_proba = booster.predict(dvalid, iteration_range=(0, booster.best_iteration + 1))
+    y_va = dvalid.get_label().astype(np.int8)
+    X_va = ParquetBatchIter(data_path, transformer, "valid", batch_size=batch_size).sample(EVAL_SAMPLE_ROWS)
+    print("모델 학습 완료.")
+
+    return model, X_va, va_proba, y_va
+
+
+def _kfold_worker(fold_ids, X, y, folds, params, oof_dir):
+    """fold_ids의 fold 모델을 차례로 학습하고 OOF 행의 예측 확률을 저장소 memory-map에 바로 씁니다."""
+    oof = oof_writer("xgb", oof_dir)
+    for k in fold_ids:
+        fit_idx, stop_idx, oof_idx = fold_split(folds, y, k)
+        y_fit = y[fit_idx]
+        fold_params = {**params, 'scale_pos_weight': (y_fit == 0).sum() / (y_fit == 1).sum()}
+        dtrain, dvalid = build_dmatrices(X.iloc[fit_idx], y_fit, X.iloc[stop_idx], y[stop_idx],
+                                         params['enable_categorical'])
+        booster = train_booster(fold_params, dtrain, dvalid)
+        dtest = xgb.DMatrix(X.iloc[oof_idx], enable_categorical=params['enable_categorical'])
+        oof[oof_idx] = booster.predict(dtest, iteration_range=(0, booster.best_iteration + 1))
+        print(f"  fold {k}: {booster.best_iteration + 1}라운드, OOF {len(oof_idx):,}행 저장")
+    oof.flush()
+
+
+def train_xgb_kfold(X, y, folds, params=None, enable_categorical=False, n_workers=None, oof_dir=OOF_DIR):
+    """
+    층화 k-fold(folds: oof.open_store의 행별 fold 번호)로 XGBoost를 학습하여 OOF 예측을 저장합니다.
+    - n_workers개의 프로세스가 fold를 나눠 동시에 학습 (CPU 코어를 나눠 씀)
+    - fold마다 학습 fold의 일부로 early stopping, scale_pos_weight도 fold 학습 데이터 기준
+    - params: 하이퍼파라미터 (None이면 train_model의 기본값)
+    반환: fold별 OOF AP 목록
+    """
+    n_splits = int(folds.max()) + 1
+    n_cores = os.cpu_count() or 1
+    if n_workers is None:
+        n_workers = max(1, n_cores // 2)
+    n_workers = max(1, min(n_workers, n_splits))
+    params = {
+        **(params or {'n_estimators': 300, 'max_depth': 10, 'learning_rate': 0.05}),
+        'eval_metric': 'logloss', 'random_state': 42, 'enable_categorical': enable_categorical,
+        'n_jobs': max(1, n_cores // n_workers),
+    }
+    y = np.asarray(y)
+    print(f"\n[K-Fold] XGBoost {n_splits}-fold 학습 (워커 {n_workers}개 × 스레드 {params['n_jobs']}개)")
+
+    oof_writer("xgb", oof_dir)  # 워커 시작 전에 파일 생성
+    args_list = [(list(range(w, n_splits, n_workers)), X, y, folds, params, oof_dir) for w in range(n_workers)]
+    if n_workers == 1:
+        _kfold_worker(*args_list[0])
+    else:
+        run_processes(_kfold_worker, args_list, "k-fold 워커")
+
+    oof = oof_writer("xgb", oof_dir)
+    fold_ap = [average_precision_score(y[folds == k], oof[folds == k]) for k in range(n_splits)]
+    total_ap = average_precision_score(y, oof)
+    record_model("xgb", {"params": params, "fold_ap": fold_ap, "ap": total_ap}, oof_dir)
+    print(f"fold별 AP: {np.round(fold_ap, 4).tolist()} / 전체 OOF AP: {total_ap:.4f}")
+    return fold_ap
+
+
+def classifier_params(model):
+    """저장된 XGBClassifier의 파라미터 (to_classifier / _booster_params 형식)"""
+    skip = ("early_stopping_rounds", "missing", "callbacks", "feature_types")
+    return {k: v for k, v in model.get_params().items() if v is not None and k not in skip}
+
+
+def update_model(model, X, y, mode="continue", n_rounds=UPDATE_ROUNDS, ap_tolerance=UPDATE_AP_TOLERANCE):
+    """
+    저장된 XGBoost 분류기를 새 데이터(X, y)로 업데이트합니다. (하이퍼파라미터 탐색 없음)
+    - mode="continue": 기존 트리(best iteration까지) 위에 새 데이터로 트리를 추가 (early stopping)
+    - mode="refresh" : 트리 구조는 그대로 두고 새 데이터로 leaf 값만 다시 계산
+    새 데이터를 train_model과 같이 8:2로 나눠, 업데이트 모델의 검증 AP가 기존 모델의 AP보다
+    ap_tolerance 넘게 낮거나 피처 구성/범주 사전이 달라졌으면 None을 반환합니다. (전체 재학습 필요)
+    continue의 early stopping은 학습 쪽에서 따로 떼어 낸 INNER_VALID_SIZE 비율로 하므로
+    AP 비교에 쓰는 검증 행은 업데이트 모델 선택에 쓰이지 않습니다. (oof.fold_split과 같은 방식)
+    반환: (model, X_va, va_proba, y_va) 또는 None
+    """
+    if not hasattr(model, "get_booster"):
+        print("⚠️ XGBoost 모델만 업데이트할 수 있습니다.")
+        return None
+    old = model.get_booster()
+    if old.feature_names != [str(c) for c in X.columns]:
+        print("⚠️ 피처 구성이 기존 모델과 달라 업데이트할 수 없습니다.")
+        return None
+    enable_categorical = hasattr(model, "category_mapping_")
+    if enable_categorical:
+        mapping = {col: list(X[col].cat.categories) for col in X.select_dtypes(include="category").columns}
+        if mapping != model.category_mapping_:
+            print("⚠️ 범주 사전이 기존 모델과 달라 업데이트할 수 없습니다.")
+            return None
+
+    X_tr, X_va, y_tr, y_va = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y
+    )
+    base_ap = average_precision_score(y_va, model.predict_proba(X_va)[:, 1])
+
+    params = classifier_params(model)
+    params['scale_pos_weight'] = (y_tr == 0).sum() / (y_tr == 1).sum()
+    best_iteration = getattr(model, "best_iteration", None)
+    old = old[: best_iteration + 1] if best_iteration is not None else old
+    booster_params, _ = _booster_params({**params, 'n_estimators': 0})
+
+    if mode == "continue":
+        X_fit, X_stop, y_fit, y_stop = train_test_split(
+            X_tr, y_tr, test_size=INNER_VALID_SIZE, random_state=42, stratify=y_tr
+        )
+        dtrain, dvalid = build_dmatrices(X_fit, y_fit, X_stop, y_stop, enable_categorical)
+        booster = xgb.train(
+            booster_params, dtrain, num_boost_round=n_rounds, xgb_model=old,
+            evals=[(dvalid, "valid")], early_stopping_rounds=EARLY_STOPPING_ROUNDS, verbose_eval=False
+        )
+    elif mode == "refresh":
+        # refresh updater는 QuantileDMatrix를 지원하지 않아 DMatrix 사용 (tree_method 대신 updater 지정)
+        booster_params.pop("tree_method")
+        booster_params.update(process_type="update", updater="refresh", refresh_leaf=True)
+        dtrain = xgb.DMatrix(X_tr, y_tr, enable_categorical=enable_categorical)
+        booster = xgb.train(booster_params, dtrain, num_boost_round=old.num_boosted_rounds(), xgb_model=old)
+        booster.best_iteration = booster.num_boosted_rounds() - 1
+    else:
+        raise ValueError(f"지원하지 않는 업데이트 방식입니다: {mode} (continue / refresh)")
+
+    params['n_estimators'] = booster.num_boosted_rounds()
+    updated = to_classifier(booster, params)
+    if enable_categorical:
+        updated.category_mapping_ = model.category_mapping_
+    va_proba = updated.predict_proba(X_va)[:, 1]
+    new_ap = average_precision_score(y_va, va_proba)
+
+    print(f"[Update:{mode}] 트리 {old.num_boosted_rounds()}개 → {booster.num_boosted_rounds()}개, "
+          f"새 데이터 검증 AP: 기존 {base_ap:.4f} → 업데이트 {new_ap:.4f}")
+    if new_ap < base_ap - ap_tolerance:
+        print(f"⚠️ 업데이트 모델 AP가 기존보다 {ap_tolerance} 넘게 낮아 사용하지 않습니다.")
+        return None
+    return updated, X_va, va_proba, y_va
@@ -0,0 +1,50 @@
+"""
+msno_dict.py - msno(44자 base64 문자열) ↔ msno_id(int32) 영구 사전.
+
+한 번 부여된 id는 바뀌지 않으며(append-only), 새 유저는 뒤에 추가됩니다.
+피처 빌드의 groupby / join은 문자열 대신 이 정수 id로 수행합니다.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+MSNO_DICT_FILE = "msno_dict.parquet"
+
+
+def load_msno_dict(state_dir):
+    """저장된 사전을 불러옵니다. 없으면 빈 사전을 반환합니다."""
+    path = Path(state_dir) / MSNO_DICT_FILE
+    if not path.exists():
+        return pd.Index([], dtype=object, name="msno")
+    return pd.Index(pd.read_parquet(path)["msno"], name="msno")
+
+
+def save_msno_dict(msno_dict, state_dir):
+    """사전을 msno_id 순서대로 저장합니다."""
+    state_dir = Path(state_dir)
+    state_dir.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame({
+        "msno_id": np.arange(len(msno_dict), dtype=np.int32),
+        "msno": msno_dict,
+    }).to_parquet(state_dir / MSNO_DICT_FILE, index=False)
+
+
+def extend_msno_dict(msno_dict, msno):
+    """사전에 없는 msno를 등장 순서대로 뒤에 추가합니다. (기존 id 유지)"""
+    new = pd.Index(pd.unique(np.asarray(msno, dtype=object)))
+    new = new[msno_dict.get_indexer(new) < 0]
+    if len(new) == 0:
+        return msno_dict
+    return msno_dict.append(new).rename("msno")
+
+
+def encode_msno(msno, msno_dict):
+    """msno 배열 → msno_id(int32) 배열. 사전에 없는 msno는 -1."""
+    return msno_dict.get_indexer(np.asarray(msno, dtype=object)).astype(np.int32)
+
+
+def decode_msno(msno_id, msno_dict):
+    """msno_id 배열 → msno 문자열 배열"""
+    return msno_dict.to_numpy()[np.asarray(msno_id)]
@@ -0,0 +1,219 @@
+"""
+oof.py - k-fold 교차 검증의 out-of-fold(OOF) 예측 저장소.
+
+XGBoost / ResNet을 같은 층화 k-fold로 학습하여, 각 행이 학습에 쓰이지 않은 fold 모델의 예측 확률을
+results/oof/<모델>.npy (memory-map, 행 번호 = kkbox_v3.parquet의 행 위치)에 저장합니다.
+앙상블 가중치/임계값은 저장된 예측만으로 다시 학습하지 않고 바로 조정할 수 있습니다.
+
+    folds = open_store(y, n_splits=5, data_key=cache_key(data_path))   # fold 배정 (모델 간 공유)
+    oof = load_oof()                                                   # DataFrame: y, fold, xgb, resnet
+    config = tune_ensemble(oof["y"], oof["xgb"], oof["resnet"], segment=txn_cnt >= 5)
+    save_ensemble_config(config)
+"""
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import StratifiedKFold, train_test_split
+
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+OOF_DIR = ROOT_DIR / "results" / "oof"
+MANIFEST_FILE = "manifest.json"
+ENSEMBLE_FILE = "ensemble.json"
+
+# fold 내부 early stopping용 검증 비율 (OOF 행은 early stopping에도 쓰지 않음)
+INNER_VALID_SIZE = 0.1
+
+# 저장된 앙상블 설정이 없을 때의 기존 확정값
+DEFAULT_ENSEMBLE = {
+    "w_xgb": {"experienced": 0.7, "new": 0.3},   # txn_cnt >= 5 / < 5
+    "threshold_xgb": 0.6,
+    "threshold_resnet": 0.8,
+}
+SEGMENT_MIN_TXN = 5
+
+
+def _manifest(oof_dir):
+    path = Path(oof_dir) / MANIFEST_FILE
+    return json.loads(path.read_text()) if path.exists() else None
+
+
+def open_store(y, n_splits=5, data_key=None, oof_dir=OOF_DIR, random_state=42):
+    """
+    OOF 저장소를 열고 행별 fold 번호(int8)를 반환합니다.
+    같은 데이터(data_key)/fold 수로 이미 만든 저장소가 있으면 그 fold 배정을 그대로 재사용하고
+    (XGBoost와 ResNet이 같은 fold로 학습되도록), 아니면 저장소를 새로 만듭니다.
+    """
+    oof_dir = Path(oof_dir)
+    manifest = _manifest(oof_dir)
+    y = np.asarray(y)
+    if (manifest and manifest["data_key"] == data_key and manifest["n_splits"] == n_splits
+            and manifest["n_rows"] == len(y) and manifest["random_state"] == random_state):
+        return np.load(oof_dir / "fold.npy")
+
+    if manifest:
+        print(f"⚠️ 데이터/fold 설정이 달라 OOF 저장소를 새로 만듭니다: {oof_dir}")
+        for name in list(manifest.get("models", {})) + ["fold", "y"]:
+            (oof_dir / f"{name}.npy").unlink(missing_ok=True)
+    oof_dir.mkdir(parents=True, exist_ok=True)
+
+    folds = np.empty(len(y), dtype=np.int8)
+    skf = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+    for k, (_, idx) in enumerate(skf.split(np.zeros(len(y)), y)):
+        folds[idx] = k
+    np.save(oof_dir / "fold.npy", folds)
+    np.save(oof_dir / "y.npy", y.astype(np.int8))
+    (oof_dir / MANIFEST_FILE).write_text(json.dumps({
+        "data_key": data_key, "n_rows": len(y), "n_splits": n_splits,
+        "random_state": random_state, "models": {},
+    }, indent=2))
+    return folds
+
+
+def fold_split(folds, y, k, inner_valid_size=INNER_VALID_SIZE, random_state=42):
+    """
+    k번째 fold의 행 번호: (학습, early stopping 검증, OOF 예측 대상)
+    early stopping 검증은 학습 fold에서 층화 추출하므로 OOF 행은 모델 선택에 전혀 쓰이지 않습니다.
+    """
+    oof_idx = np.flatnonzero(folds == k)
+    rest = np.flatnonzero(folds != k)
+    fit_idx, stop_idx = train_test_split(
+        rest, test_size=inner_valid_size, random_state=random_state, stratify=np.asarray(y)[rest]
+    )
+    return np.sort(fit_idx), np.sort(stop_idx), oof_idx
+
+
+def oof_writer(name, oof_dir=OOF_DIR):
+    """
+    모델 name의 OOF 예측 배열을 쓰기 모드 memory-map으로 엽니다. (없으면 NaN으로 생성)
+    fold마다 서로 다른 행만 쓰므로 여러 프로세스가 동시에 열어 써도 됩니다.
+    """
+    oof_dir = Path(oof_dir)
+    manifest = _manifest(oof_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"OOF 저장소가 없습니다. open_store를 먼저 호출하세요: {oof_dir}")
+    path = oof_dir / f"{name}.npy"
+    if not path.exists():
+        arr = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(manifest["n_rows"],))
+        arr[:] = np.nan
+        arr.flush()
+        del arr
+    return np.lib.format.open_memmap(path, mode="r+")
+
+
+def record_model(name, info, oof_dir=OOF_DIR):
+    """OOF 예측을 다 쓴 모델의 정보(파라미터, fold별 AP 등)를 manifest에 기록합니다."""
+    path = Path(oof_dir) / MANIFEST_FILE
+    manifest = json.loads(path.read_text())
+    manifest["models"][name] = info
+    path.write_text(json.dumps(manifest, indent=2, default=float))
+
+
+def load_oof(oof_dir=OOF_DIR):
+    """저장된 OOF 예측을 DataFrame(index=행 번호; y, fold, 모델별 확률)으로 엽니다. (memory-map, 복사 없음)"""
+    oof_dir = Path(oof_dir)
+    manifest = _manifest(oof_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"OOF 저장소가 없습니다: {oof_dir}")
+    columns = {"y": np.load(oof_dir / "y.npy", mmap_mode="r"), "fold": np.load(oof_dir / "fold.npy", mmap_mode="r")}
+    for name in manifest["models"]:
+        columns[name] = np.load(oof_dir / f"{name}.npy", mmap_mode="r")
+    oof = pd.DataFrame(columns, copy=False)
+    oof.index.name = "row_id"
+    return oof
+
+
+def average_precision(y, score):
+    """
+    sklearn average_precision_score와 같은 값을 정렬 한 번으로 계산합니다. (같은 점수는 한 임계값으로 묶음)
+    """
+    y = np.asarray(y)
+    score = np.asarray(score)
+    order = np.argsort(-score, kind="mergesort")
+    score, y = score[order], y[order]
+    last = np.r_[np.flatnonzero(np.diff(score)), len(score) - 1]
+    tp = np.cumsum(y, dtype=np.int64)[last]
+    if tp[-1] == 0:
+        return 0.0
+    precision = tp / (last + 1)
+    recall = tp / tp[-1]
+    return float(np.sum(np.diff(recall, prepend=0.0) * precision))
+
+
+def best_threshold(y, score, thresholds=np.arange(0.1, 0.91, 0.05)):
+    """임계값 후보 중 F1이 가장 높은 값 → (임계값, F1, precision, recall). 정렬 + searchsorted로 한 번에 계산"""
+    y = np.asarray(y)
+    order = np.argsort(score, kind="mergesort")
+    score_sorted = np.asarray(score)[order]
+    pos_after = np.cumsum(y[order][::-1], dtype=np.int64)[::-1]     # i번째 이후 양성 수
+    first = np.searchsorted(score_sorted, thresholds, side="left")  # score >= thr 인 첫 위치
+    n_pred = len(score_sorted) - first
+    tp = np.where(first < len(score_sorted), pos_after[np.minimum(first, len(score_sorted) - 1)], 0)
+    precision = np.divide(tp, n_pred, out=np.zeros(len(thresholds)), where=n_pred > 0)
+    recall = tp / max(int(y.sum()), 1)
+    f1 = np.divide(2 * precision * recall, precision + recall,
+                   out=np.zeros(len(thresholds)), where=precision + recall > 0)
+    i = int(np.argmax(f1))
+    return round(float(thresholds[i]), 2), float(f1[i]), float(precision[i]), float(recall[i])
+
+
+def best_weight(y, p_xgb, p_resnet, weights=np.linspace(0, 1, 21)):
+    """가중 평균 w * p_xgb + (1 - w) * p_resnet의 AP가 가장 높은 w → (w, AP)"""
+    scores = [average_precision(y, w * p_xgb + (1 - w) * p_resnet) for w in weights]
+    i = int(np.argmax(scores))
+    return round(float(weights[i]), 2), float(scores[i])
+
+
+def tune_ensemble(y, p_xgb, p_resnet, segment=None):
+    """
+    OOF 예측으로 앙상블 가중치와 모델별 임계값을 조정합니다. (재학습 없음)
+    segment: 숙련 유저 여부(txn_cnt >= 5) → 구간별 가중치 ("experienced" / "new")
+    반환 형식은 DEFAULT_ENSEMBLE과 같고, 구간별 AP 등 참고 지표를 "report"에 담습니다.
+    """
+    y = np.asarray(y).astype(np.int8)
+    p_xgb = np.asarray(p_xgb, dtype=np.float32)
+    p_resnet = np.asarray(p_resnet, dtype=np.float32)
+    segment = np.ones(len(y), dtype=bool) if segment is None else np.asarray(segment, dtype=bool)
+
+    config = {"w_xgb": {}, "report": {}}
+    for name, mask in (("experienced", segment), ("new", ~segment)):
+        if mask.sum() == 0 or y[mask].min() == y[mask].max():
+            config["w_xgb"][name] = DEFAULT_ENSEMBLE["w_xgb"][name]
+            continue
+        w, ap = best_weight(y[mask], p_xgb[mask], p_resnet[mask])
+        config["w_xgb"][name] = w
+        config["report"][name] = {
+            "rows": int(mask.sum()), "ap_ensemble": ap,
+            "ap_xgb": average_precision(y[mask], p_xgb[mask]),
+            "ap_resnet": average_precision(y[mask], p_resnet[mask]),
+        }
+
+    for name, proba in (("xgb", p_xgb), ("resnet", p_resnet)):
+        thr, f1, p, r = best_threshold(y, proba)
+        config[f"threshold_{name}"] = thr
+        config["report"][f"threshold_{name}"] = {"f1": f1, "precision": p, "recall": r}
+    return config
+
+
+def save_ensemble_config(config, oof_dir=OOF_DIR):
+    path = Path(oof_dir) / ENSEMBLE_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(config, indent=2))
+    return path
+
+
+def load_ensemble_config(oof_dir=OOF_DIR):
+    """tune_ensemble로 저장한 앙상블 설정 (없으면 DEFAULT_ENSEMBLE)"""
+    path = Path(oof_dir) / ENSEMBLE_FILE
+    config = json.loads(json.dumps(DEFAULT_ENSEMBLE))
+    if path.exists():
+        config.update(json.loads(path.read_text()))
+    return config
+
+
+def ensemble_weights(config, txn_cnt):
+    """txn_cnt 구간에 맞는 (XGBoost 가중치, ResNet 가중치)"""
+    w = config["w_xgb"]["experienced" if txn_cnt >= SEGMENT_MIN_TXN else "new"]
+    return w, round(1 - w, 2)
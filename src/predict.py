@@ -7,28 +7,40 @@ predict.py - 저장된 XGBoost / ResNet 모델을 불러와서 이탈 예측만
 """
 import os
 import pickle
+from functools import lru_cache
 import numpy as np
 import pandas as pd
 import torch
 
-from src.data_loader import load_data
-from src.preprocessing import preprocess_for_modeling
-from src.dl_model import ChurnResNet, get_device
+from src.feature_cache import load_preprocessed
+from src.feature_transformer import FeatureTransformer, TRANSFORMER_FILE
+from src.dl_model import ChurnResNet, compile_model, get_device
+from src.oof import load_ensemble_config
+from src.backends import model_path, feature_names as model_feature_names
+from src.tree_predictor import fast_predictor
 
 
 RESULTS_DIR  = "results"
-XGB_MODEL    = os.path.join(RESULTS_DIR, "xgboost_model.pkl")
+XGB_MODEL    = str(model_path(RESULTS_DIR))  # 트리 모델 (마지막으로 학습한 백엔드: xgboost / lightgbm)
 RESNET_MODEL = os.path.join(RESULTS_DIR, "resnet_model.pth")
 RESNET_SCALER= os.path.join(RESULTS_DIR, "resnet_scaler.pkl")
+TRANSFORMER  = os.path.join(RESULTS_DIR, TRANSFORMER_FILE)
 
 
-def predict_xgboost(X, threshold=0.6):
-    """저장된 XGBoost 모델로 이탈 예측 (임계값 0.6 확정)"""
+@lru_cache(maxsize=1)
+def load_tree_model():
+    """저장된 트리 모델(XGBoost / LightGBM 분류기)을 한 번만 로드합니다. (프로세스 내에서 재사용)"""
     if not os.path.exists(XGB_MODEL):
         raise FileNotFoundError(f"XGBoost 모델 없음: {XGB_MODEL}\n→ 먼저 'python main.py'를 실행하세요.")
 
     with open(XGB_MODEL, "rb") as f:
-        model = pickle.load(f)
+        return pickle.load(f)
+
+
+def predict_xgboost(X, threshold=0.6, model=None):
+    """저장된 XGBoost 모델로 이탈 예측 (임계값 0.6 확정, model이 없으면 load_tree_model())"""
+    if model is None:
+        model = load_tree_model()
 
     proba = model.predict_proba(X)[:, 1]
     preds = (proba >= threshold).astype(int)
@@ -37,8 +49,12 @@ def predict_xgboost(X, threshold=0.6):
     return proba, preds
 
 
-def predict_resnet(X, device=None):
-    """저장된 ResNet 모델로 이탈 예측 (임계값 0.8 확정)"""
+def predict_resnet(X, device=None, threshold=None, bf16=None, use_compile=None):
+    """
+    저장된 ResNet 모델로 이탈 예측 (임계값: 지정하지 않으면 체크포인트의 확정값 0.8)
+    bf16 / use_compile: bfloat16 autocast / torch.compile 추론
+    (지정하지 않으면 dl_main.py --bf16/--compile 학습 때 fp32와 AP가 같다고 확인된 체크포인트 설정, 없으면 fp32)
+    """
     if not os.path.exists(RESNET_MODEL):
         raise FileNotFoundError(f"ResNet 모델 없음: {RESNET_MODEL}\n→ 먼저 'python dl_main.py'를 실행하세요.")
     if not os.path.exists(RESNET_SCALER):
@@ -51,7 +67,8 @@ def predict_resnet(X, device=None):
 
     # 모델 구조 및 가중치 복원
     checkpoint = torch.load(RESNET_MODEL, map_location="cpu")
-    threshold  = checkpoint['threshold']
+    if threshold is None:
+        threshold = checkpoint['threshold']
     if device is None:
         device = get_device()
 
@@ -64,9 +81,15 @@ def predict_resnet(X, device=None):
     model.load_state_dict(checkpoint['model_state_dict'])
     model.eval()
 
-    X_tensor = torch.FloatTensor(X_scaled).to(device)
-    with torch.no_grad():
-        proba = model(X_tensor).cpu().numpy().flatten()
+    bf16 = checkpoint.get('bf16', False) if bf16 is None else bf16
+    use_compile = checkpoint.get('compile', False) if use_compile is None else use_compile
+    if bf16 or use_compile:
+        from src.dl_train import predict_dl_proba
+        proba = predict_dl_proba(compile_model(model, use_compile), X_scaled, device=device, bf16=bf16)
+    else:
+        X_tensor = torch.FloatTensor(X_scaled).to(device)
+        with torch.no_grad():
+            proba = model(X_tensor).cpu().numpy().flatten()
 
     preds = (proba >= threshold).astype(int)
     print(f"\n[ResNet] 임계값 {threshold} 적용 (Val AP: {checkpoint['best_val_ap']:.4f})")
@@ -83,16 +106,22 @@ def main():
     data_path = "data/kkbox_v3.parquet"
     if not os.path.exists(data_path):
         data_path = "kkbox_v3.parquet"
-    df = load_data(data_path)
-    X, y = preprocess_for_modeling(df)
+    X, y = load_preprocessed(data_path)
 
-    # XGBoost 예측
+    # 임계값: scripts/tune_ensemble.py로 OOF 예측에서 조정한 값 (없으면 확정값 0.6 / 0.8)
+    ensemble = load_ensemble_config()
+
+    # XGBoost 예측 (native categorical 모델이면 범주형을 category로 유지한 X 사용)
     print("\n--- XGBoost 예측 ---")
-    xgb_proba, xgb_preds = predict_xgboost(X)
+    xgb_model = load_tree_model()
+    X_xgb = X
+    if hasattr(xgb_model, "category_mapping_"):
+        X_xgb, _ = load_preprocessed(data_path, encode_categoricals=False)
+    xgb_proba, xgb_preds = predict_xgboost(X_xgb, threshold=ensemble["threshold_xgb"], model=xgb_model)
 
     # ResNet 예측
     print("\n--- ResNet 예측 ---")
-    rn_proba, rn_preds = predict_resnet(X)
+    rn_proba, rn_preds = predict_resnet(X, threshold=ensemble["threshold_resnet"])
 
     # 두 모델 동의율
     agree = (xgb_preds == rn_preds).mean() * 100
@@ -106,43 +135,61 @@ def main():
     print("="*50)
 
 
+@lru_cache(maxsize=1)
+def load_resources():
+    """
+    단일 샘플 예측에 필요한 모델/스케일러/피처 변환기를 한 번만 로드합니다.
+    (프로세스 내에서 재사용)
+    변환기는 (XGBoost용, ResNet용) 쌍이며, XGBoost가 native categorical이면
+    ResNet용은 같은 범주 사전의 원-핫 변환기입니다.
+    XGBoost 모델은 1행 예측 오버헤드가 없는 NumPy 예측기(tree_predictor)로 변환해 둡니다.
+    """
+    # XGBoost 로드
+    xgb = load_tree_model()
+
+    # ResNet 로드
+    checkpoint = torch.load(RESNET_MODEL, map_location='cpu')
+    resnet = ChurnResNet(
+        input_dim=checkpoint['input_dim'],
+        hidden_dim=checkpoint['hidden_dim'],
+        num_blocks=checkpoint['num_blocks'],
+        dropout=checkpoint['dropout']
+    )
+    resnet.load_state_dict(checkpoint['model_state_dict'])
+    resnet.eval()
+
+    # 스케일러 로드
+    with open(RESNET_SCALER, "rb") as f:
+        scaler = pickle.load(f)
+
+    # 피처 변환기 로드 (없으면 XGBoost 피처 이름으로 reindex 방식 사용)
+    transformer = FeatureTransformer.load(TRANSFORMER) if os.path.exists(TRANSFORMER) else None
+    transformers = (transformer, transformer.with_encoding(True) if transformer is not None else None)
+    feature_names = model_feature_names(xgb)
+    return fast_predictor(xgb), resnet, scaler, transformers, feature_names
+
+
 def predict_churn(data_dict):
     """
     단일 샘플 예측용 함수 (스트림릿용)
     """
     # 모델 리소스 로드
     try:
-        # XGBoost 로드
-        with open(XGB_MODEL, "rb") as f:
-            xgb = pickle.load(f)
-        
-        # ResNet 로드
-        checkpoint = torch.load(RESNET_MODEL, map_location='cpu')
-        from src.dl_model import ChurnResNet
-        resnet = ChurnResNet(
-            input_dim=checkpoint['input_dim'],
-            hidden_dim=checkpoint['hidden_dim'],
-            num_blocks=checkpoint['num_blocks'],
-            dropout=checkpoint['dropout']
-        )
-        resnet.load_state_dict(checkpoint['model_state_dict'])
-        resnet.eval()
-        
-        # 스케일러 로드
-        with open(RESNET_SCALER, "rb") as f:
-            scaler = pickle.load(f)
-        
-        # 피처 이름 로드 (XGBoost에서 가져옴)
-        feature_names = xgb.get_booster().feature_names
+        xgb, resnet, scaler, (transformer, resnet_transformer), feature_names = load_resources()
     except Exception as e:
         print(f"모델 로드 실패: {e}")
         return 0.0, 0.0, 0.0
     
-    # 데이터 프레임 생성 및 정렬
-    df = pd.DataFrame([data_dict]).reindex(columns=feature_names, fill_value=0)
+    # 입력 벡터 생성 (학습 시 컬럼 순서의 float32 1행)
+    if transformer is not None:
+        x = transformer.transform_one(data_dict)
+        x_resnet = x if resnet_transformer is transformer else resnet_transformer.transform_one(data_dict)
+    else:
+        x = pd.DataFrame([data_dict]).reindex(columns=feature_names, fill_value=0).to_numpy(np.float32)
+        x_resnet = x
     
     # XGBoost 예측
-    p_xgb_raw = float(xgb.predict_proba(df)[0][1])
+    p_xgb_raw = float(xgb.predict_proba(x)[0][1])
     
     # XGBoost scale_pos_weight 보정
     if p_xgb_raw > 0.5:
@@ -154,9 +201,9 @@ def predict_churn(data_dict):
     else:
         p_xgb = p_xgb_raw
     
-    # ResNet 예측
-    scaled_data = scaler.transform(df)
-    input_tensor = torch.tensor(scaled_data, dtype=torch.float32)
+    # ResNet 예측 (StandardScaler 변환을 직접 계산)
+    scaled_data = (x_resnet - scaler.mean_) / scaler.scale_
+    input_tensor = torch.from_numpy(scaled_data.astype(np.float32))
     
     try:
         with torch.no_grad():
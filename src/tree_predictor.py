@@ -0,0 +1,195 @@
+"""
+tree_predictor.py - 학습된 XGBoost 트리 앙상블을 NumPy 배열로 펼친 예측기.
+
+단일 유저 예측(predict_churn)에서는 xgb predict_proba의 호출당 오버헤드(DMatrix 생성, 네이티브 스레드 풀)가
+실제 트리 계산보다 큽니다. FlatTreeEnsemble은 모든 트리의 노드를 하나의 평평한 배열
+(분기 피처, 임계값, 왼쪽/오른쪽 자식, 결측 방향, leaf 값)로 모아 두고, 배치의 모든 행 × 모든 트리를
+깊이 단위로 한 번에 내려갑니다. (네이티브 라이브러리 호출 없음, 호출 스레드에서만 실행)
+단일 행 / 작은 배치용이며, 전체 데이터 배치 예측은 멀티스레드인 xgb predict_proba가 더 빠릅니다.
+
+    predictor = compile_xgboost(model)        # XGBClassifier → FlatTreeEnsemble (best iteration까지)
+    predictor.predict_proba(x)                # (n, 2), model.predict_proba(x)와 float 오차 내 동일
+    predictor = fast_predictor(model)         # XGBoost가 아니면(LightGBM) 모델을 그대로 반환
+
+native categorical 모델은 범주 코드(transform_one / cat.codes) 입력을 받습니다.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+
+# 배치 예측 시 한 번에 처리할 (행 × 트리) 수 (중간 배열이 CPU 캐시에 머무는 크기)
+CHUNK_CELLS = 1 << 16
+
+
+class FlatTreeEnsemble:
+    """
+    평평한 노드 배열로 표현한 이진 분류 트리 앙상블. (gbtree, binary:logistic)
+    leaf는 자기 자신을 자식으로 가리키므로 최대 깊이만큼 내려가면 모든 행이 leaf에 도착합니다.
+    """
+    def __init__(self, feature, threshold, left, right, default_left, value, roots, max_depth,
+                 base_margin, feature_names, cat_row=None, cat_table=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.base_margin = base_margin
+        self.feature_names = feature_names
+        self.cat_row = cat_row        # 노드별 범주 분기 행 번호 (수치 분기는 -1), 범주 분기가 없으면 None
+        self.cat_table = cat_table    # (범주 분기 수, 최대 코드 + 1) bool: 오른쪽으로 가는 범주
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def _as_array(self, X):
+        """DataFrame(범주형은 코드, 결측 NaN) / ndarray → (n, n_features) float32"""
+        if isinstance(X, pd.DataFrame):
+            X = X[self.feature_names]
+            cat_cols = X.select_dtypes(include="category").columns
+            if len(cat_cols):
+                X = X.copy()
+                for col in cat_cols:
+                    X[col] = X[col].cat.codes.replace(-1, np.nan)
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        if X.shape[1] != len(self.feature_names):
+            raise ValueError(f"피처 수가 다릅니다: 입력 {X.shape[1]}개, 모델 {len(self.feature_names)}개")
+        return X
+
+    def _step(self, nodes, v):
+        """현재 노드들에서 피처 값 v로 한 단계 내려간 자식 노드 (leaf는 그대로)"""
+        go_left = v < np.take(self.threshold, nodes)  # 결측(NaN)/leaf/범주 분기는 아래에서 결정
+        if self.cat_row is not None:
+            row = self.cat_row[nodes]
+            is_cat = row >= 0
+            if is_cat.any():
+                code = v[is_cat]
+                width = self.cat_table.shape[1]
+                valid = (code >= 0) & (code < width)     # NaN은 False
+                in_set = np.zeros(len(code), dtype=bool)
+                in_set[valid] = self.cat_table[row[is_cat][valid], code[valid].astype(np.int64)]
+                go_left[is_cat] = ~in_set
+        missing = np.isnan(v)
+        if missing.any():
+            go_left[missing] = self.default_left[nodes[missing]]
+        return np.where(go_left, np.take(self.left, nodes), np.take(self.right, nodes))
+
+    def _margin_one(self, x):
+        """1행 fast path: (n_trees,) 노드 번호만 유지"""
+        nodes = self.roots
+        for _ in range(self.max_depth):
+            nodes = self._step(nodes, x[self.feature[nodes]])
+        return self.base_margin + self.value[nodes].sum(dtype=np.float64)
+
+    def _margin_batch(self, X):
+        flat = X.ravel()
+        row_offset = (np.arange(len(X), dtype=np.int32) * X.shape[1])[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_trees))
+        for _ in range(self.max_depth):
+            nodes = self._step(nodes, np.take(flat, row_offset + np.take(self.feature, nodes)))
+        return self.base_margin + self.value[nodes].sum(axis=1, dtype=np.float64)
+
+    def predict_margin(self, X):
+        """트리 leaf 값의 합 + base margin (로짓)"""
+        X = self._as_array(X)
+        if len(X) == 1:
+            return np.array([self._margin_one(X[0])])
+        step = max(1, CHUNK_CELLS // self.n_trees)
+        return np.concatenate([self._margin_batch(X[i:i + step]) for i in range(0, len(X), step)])
+
+    def predict_proba(self, X):
+        """XGBClassifier.predict_proba와 같은 (n, 2) 확률"""
+        p = 1.0 / (1.0 + np.exp(-self.predict_margin(X)))
+        return np.column_stack([1.0 - p, p])
+
+
+def _parse_base_score(value):
+    """learner_model_param의 base_score ("5E-1" 또는 xgboost 3의 "[5E-1]")"""
+    return float(str(value).strip("[]").split(",")[0])
+
+
+def compile_xgboost(model, n_rounds=None):
+    """
+    XGBClassifier(또는 Booster)의 트리를 FlatTreeEnsemble로 변환합니다.
+    n_rounds를 지정하지 않으면 predict_proba와 같이 best iteration까지의 트리만 사용합니다.
+    """
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    learner = json.loads(booster.save_raw("json"))["learner"]
+    if learner["objective"]["name"] != "binary:logistic" or learner["gradient_booster"]["name"] != "gbtree":
+        raise ValueError("binary:logistic / gbtree 모델만 변환할 수 있습니다.")
+    gbtree = learner["gradient_booster"]["model"]
+
+    if n_rounds is None:
+        try:
+            n_rounds = booster.best_iteration + 1
+        except AttributeError:
+            n_rounds = booster.num_boosted_rounds()
+    trees = gbtree["trees"][: int(gbtree["iteration_indptr"][n_rounds])]
+
+    feature, threshold, left, right, default_left, value, roots = [], [], [], [], [], [], []
+    cat_row, cat_sets = [], []
+    has_cat = False
+    max_depth = 0
+    offset = 0
+    for tree in trees:
+        lc = np.asarray(tree["left_children"], dtype=np.int32)
+        rc = np.asarray(tree["right_children"], dtype=np.int32)
+        cond = np.asarray(tree["split_conditions"], dtype=np.float32)
+        n = len(lc)
+        ids = np.arange(n, dtype=np.int32)
+        is_leaf = lc == -1
+
+        feature.append(np.where(is_leaf, 0, tree["split_indices"]).astype(np.int32))
+        threshold.append(np.where(is_leaf, np.nan, cond).astype(np.float32))
+        left.append(np.where(is_leaf, ids, lc) + offset)
+        right.append(np.where(is_leaf, ids, rc) + offset)
+        default_left.append(np.asarray(tree["default_left"], dtype=bool))
+        value.append(np.where(is_leaf, cond, 0.0).astype(np.float32))   # leaf의 split_conditions = leaf 값
+        roots.append(offset)
+
+        # 범주 분기: categories_nodes[i] 노드에서 categories[segment:segment+size]의 코드는 오른쪽
+        rows = np.full(n, -1, dtype=np.int32)
+        for node, seg, size in zip(tree["categories_nodes"], tree["categories_segments"], tree["categories_sizes"]):
+            rows[node] = len(cat_sets)
+            cat_sets.append(tree["categories"][seg:seg + size])
+            has_cat = True
+        cat_row.append(rows)
+
+        depth = np.zeros(n, dtype=np.int32)
+        for i in range(n):   # 부모가 자식보다 먼저 오는 노드 순서
+            if not is_leaf[i]:
+                depth[lc[i]] = depth[rc[i]] = depth[i] + 1
+        max_depth = max(max_depth, int(depth.max()))
+        offset += n
+
+    cat_table = None
+    if has_cat:
+        width = max((max(s) for s in cat_sets if len(s)), default=0) + 1
+        cat_table = np.zeros((len(cat_sets), width), dtype=bool)
+        for i, codes in enumerate(cat_sets):
+            cat_table[i, codes] = True
+
+    base_score = _parse_base_score(learner["learner_model_param"]["base_score"])
+    return FlatTreeEnsemble(
+        feature=np.concatenate(feature), threshold=np.concatenate(threshold),
+        left=np.concatenate(left), right=np.concatenate(right),
+        default_left=np.concatenate(default_left), value=np.concatenate(value),
+        roots=np.asarray(roots, dtype=np.int32), max_depth=max_depth,
+        base_margin=float(np.log(base_score / (1.0 - base_score))),
+        feature_names=list(booster.feature_names or range(int(learner["learner_model_param"]["num_feature"]))),
+        cat_row=np.concatenate(cat_row) if has_cat else None, cat_table=cat_table,
+    )
+
+
+def fast_predictor(model):
+    """XGBoost 분류기는 FlatTreeEnsemble로 변환하고, 그 외(LightGBM 등)는 그대로 반환합니다."""
+    if hasattr(model, "get_booster"):
+        return compile_xgboost(model)
+    return model
@@ -0,0 +1,53 @@
+"""
+tuning.py - 트리 모델(model_train)과 딥러닝(dl_train) Optuna 탐색이 함께 쓰는 저장소/병렬 실행 도우미.
+
+    storage = get_storage(OPTUNA_STORAGE)                 # 파일 경로면 JournalFileStorage
+    done = len(finished_trials(study))                   # 완료+중단(pruned) trial
+    run_processes(worker, [args] * n_workers, "Optuna 워커")  # 워커 프로세스 실행 후 대기
+"""
+import multiprocessing as mp
+from pathlib import Path
+
+import optuna
+
+
+# Optuna study 저장소 (중단된 탐색 재개 / 이전 탐색의 상위 trial로 warm-start)
+ROOT_DIR = Path(__file__).resolve().parent.parent
+OPTUNA_STORAGE = ROOT_DIR / "results" / "optuna" / "xgb_tuning.log"
+
+
+def get_storage(storage=OPTUNA_STORAGE):
+    """
+    Optuna 저장소.
+    - "sqlite:///..." 등 URL은 그대로 사용
+    - 그 외 경로는 JournalFileStorage(프로세스 간 파일 잠금 지원, 추가 의존성 없음)
+    """
+    if isinstance(storage, str) and "://" in storage:
+        return storage
+    from optuna.storages import JournalStorage
+    from optuna.storages.journal import JournalFileBackend
+
+    path = Path(storage)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return JournalStorage(JournalFileBackend(str(path)))
+
+
+def finished_trials(study, states=(optuna.trial.TrialState.COMPLETE, optuna.trial.TrialState.PRUNED)):
+    """끝난 trial 목록 (기본: 완료 + 중단, 목표 trial 수 계산용)"""
+    return study.get_trials(deepcopy=False, states=states)
+
+
+def run_processes(target, args_list, name="워커"):
+    """
+    args_list 항목마다 프로세스를 하나씩 띄워 target(*args)를 실행하고 모두 끝날 때까지 기다립니다.
+    fork: 워커가 부모의 X/y(또는 build)를 복사 없이 물려받음 (지원하지 않는 OS에서는 spawn)
+    """
+    ctx = mp.get_context("fork" if "fork" in mp.get_all_start_methods() else "spawn")
+    workers = [ctx.Process(target=target, args=args) for args in args_list]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    failed = [w.exitcode for w in workers if w.exitcode != 0]
+    if failed:
+        raise RuntimeError(f"{name} 비정상 종료 (exit code: {failed})")
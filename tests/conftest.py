@@ -0,0 +1,114 @@
+"""
+pytest 공통 설정: 저장소 루트를 sys.path에 추가해 src 패키지를 import 합니다. (scripts/와 같은 방식)
+
+raw_frames / raw_dir: feature_build 입력과 같은 형식의 작은 합성 원본 CSV
+(결제/로그가 없는 유저, train에 없는 유저, 파일 순서와 다른 결제 날짜 순서를 포함)
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+N_USERS = 60
+LOG_START = pd.Timestamp("2017-02-01")
+LOG_END = pd.Timestamp("2017-03-31")
+
+
+def yyyymmdd(dates):
+    return pd.DatetimeIndex(dates).strftime("%Y%m%d").astype(int)
+
+
+def make_raw_frames(seed=0):
+    """합성 원본 프레임: train / transactions / user_logs / members (컬럼은 KKBox v2 CSV와 같음)"""
+    rng = np.random.default_rng(seed)
+    users = [f"user{i:03d}" for i in range(N_USERS)]
+    train = pd.DataFrame({"msno": users, "is_churn": (rng.random(N_USERS) < 0.3).astype(int)})
+    train = train.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+    # 결제: 앞쪽 45명(+ train에 없는 유저)만, 유저별로 이어지는 결제를 만든 뒤 행 순서를 섞음
+    txn_rows = []
+    for msno in users[:45] + ["ghost000", "ghost001"]:
+        day = pd.Timestamp("2016-12-01") + pd.Timedelta(days=int(rng.integers(0, 30)))
+        for _ in range(int(rng.integers(1, 6))):
+            plan = int(rng.choice([7, 30, 30, 90]))
+            expire = day + pd.Timedelta(days=plan)
+            txn_rows.append({
+                "msno": msno,
+                "payment_method_id": int(rng.integers(30, 42)),
+                "payment_plan_days": plan,
+                "plan_list_price": plan * 5,
+                "actual_amount_paid": int(plan * 5 * rng.choice([0.0, 1.0, 1.0])),
+                "is_auto_renew": int(rng.random() < 0.7),
+                "transaction_date": yyyymmdd([day])[0],
+                "membership_expire_date": yyyymmdd([expire])[0],
+                "is_cancel": int(rng.random() < 0.1),
+            })
+            day = expire + pd.Timedelta(days=int(rng.integers(-3, 10)))
+    transactions = pd.DataFrame(txn_rows).sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+    # 로그: 유저 10~54(+ train에 없는 유저), 같은 날 여러 행 허용, 날짜 순서와 무관한 행 순서
+    n_logs = 1500
+    log_users = np.array(users[10:55] + ["ghost000"])
+    dates = LOG_START + pd.to_timedelta(rng.integers(0, (LOG_END - LOG_START).days + 1, n_logs), unit="D")
+    plays = rng.poisson(lam=[3, 1, 1, 1, 8], size=(n_logs, 5))
+    user_logs = pd.DataFrame({
+        "msno": rng.choice(log_users, n_logs),
+        "date": yyyymmdd(dates),
+        "num_25": plays[:, 0],
+        "num_50": plays[:, 1],
+        "num_75": plays[:, 2],
+        "num_985": plays[:, 3],
+        "num_100": plays[:, 4],
+        "num_unq": plays.sum(axis=1) // 2 + 1,
+        "total_secs": rng.gamma(2.0, 900.0, n_logs).round(3),
+    })
+
+    # members: 마지막 5명은 없음, bd 이상치와 결측 범주 포함
+    n_members = N_USERS - 5
+    members = pd.DataFrame({
+        "msno": users[:n_members],
+        "city": rng.choice([1, 4, 5, 13, 22], n_members),
+        "bd": rng.choice([0, 18, 25, 33, 47, 61, 150, -3], n_members),
+        "gender": rng.choice(["male", "female", None], n_members),
+        "registered_via": rng.choice([3, 4, 7, 9], n_members),
+        "registration_init_time": rng.choice([20150101, 20160315, 20161120], n_members),
+    })
+    return {"train": train, "transactions": transactions, "user_logs": user_logs, "members": members}
+
+
+def write_raw(raw_dir, frames, transactions=None, user_logs=None):
+    """원본 프레임을 feature_build가 읽는 파일명으로 씁니다. (transactions / user_logs만 바꿔 쓰기 가능)"""
+    from src.feature_build import LOG_FILE, MEMBERS_FILE, TRAIN_FILE, TXN_FILE
+
+    raw_dir = Path(raw_dir)
+    raw_dir.mkdir(parents=True, exist_ok=True)
+    frames["train"].to_csv(raw_dir / TRAIN_FILE, index=False)
+    frames["members"].to_csv(raw_dir / MEMBERS_FILE, index=False)
+    (frames["transactions"] if transactions is None else transactions).to_csv(raw_dir / TXN_FILE, index=False)
+    (frames["user_logs"] if user_logs is None else user_logs).to_csv(raw_dir / LOG_FILE, index=False)
+    return raw_dir
+
+
+@pytest.fixture(scope="session")
+def raw_frames():
+    return make_raw_frames()
+
+
+@pytest.fixture(scope="session")
+def raw_dir(raw_frames, tmp_path_factory):
+    return write_raw(tmp_path_factory.mktemp("raw"), raw_frames)
+
+
+@pytest.fixture(scope="session")
+def built(raw_dir, tmp_path_factory):
+    """합성 원본 CSV의 전체 빌드 결과 (kkbox_v3.parquet와 같은 컬럼/dtype)"""
+    from src.feature_build import build_features
+
+    work = tmp_path_factory.mktemp("built")
+    return build_features(raw_dir, work / "kkbox.parquet", work / "state", chunk_size=200)
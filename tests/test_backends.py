@@ -0,0 +1,49 @@
+"""
+backends.py - LightGBM 최종 모델(LightGBMClassifier)의 pickle 왕복과 예측 일치 확인.
+"""
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+lgb = pytest.importorskip("lightgbm")
+
+from src.backends import LightGBMClassifier, feature_names, get_backend
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(600, 5)), columns=[f"f{i}" for i in range(5)])
+    y = pd.Series((X["f0"] + rng.normal(scale=0.5, size=len(X)) > 0.8).astype(int))
+    X_tr, X_va, y_tr, y_va = X.iloc[:480], X.iloc[480:], y.iloc[:480], y.iloc[480:]
+
+    backend = get_backend("lightgbm")
+    params = {**backend.default_params(), **backend.base_params(1.0, False), "n_estimators": 50, "n_jobs": 1}
+    dtrain, dvalid = backend.build(X_tr, y_tr, X_va, y_va)
+    model = backend.fit_final(params, dtrain, dvalid, X_tr, y_tr, X_va, y_va)
+    return model, X_va
+
+
+def test_fit_final_returns_wrapped_booster(fitted):
+    model, X_va = fitted
+    assert isinstance(model, LightGBMClassifier)
+    assert isinstance(model.booster_, lgb.Booster)
+    assert feature_names(model) == [f"f{i}" for i in range(5)]
+    assert list(model.classes_) == [0, 1]
+
+
+def test_pickle_round_trip_matches_booster_predict(fitted):
+    model, X_va = fitted
+    expected = model.booster_.predict(X_va, num_iteration=model.booster_.best_iteration or None)
+
+    restored = pickle.loads(pickle.dumps(model))
+    proba = restored.predict_proba(X_va)
+
+    assert proba.shape == (len(X_va), 2)
+    np.testing.assert_allclose(proba[:, 1], expected, rtol=1e-12)
+    np.testing.assert_allclose(proba.sum(axis=1), 1.0)
+    np.testing.assert_array_equal(restored.predict(X_va), (expected >= 0.5).astype(int))
+    # 1행 numpy 입력 (단일 예측 경로)
+    np.testing.assert_allclose(restored.predict_proba(X_va.to_numpy()[:1])[:, 1], expected[:1], rtol=1e-12)
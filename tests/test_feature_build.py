@@ -0,0 +1,148 @@
+"""
+feature_build.py - 스트리밍 집계가 노트북의 pandas 집계(txn_agg / log_agg)와 같고,
+청크 크기와 증분 업데이트가 결과를 바꾸지 않는지 확인합니다.
+"""
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import write_raw
+from src.feature_build import (
+    IMPUTER_FILE, LOG_FILE, LOG_WINDOWS, RECENCY_CAP, RECENCY_COL, TXN_FILE,
+    build_features, daily_min_day, finalize_features, finalize_log, finalize_txn,
+    stream_logs, stream_transactions, update_features,
+)
+from src.msno_dict import decode_msno, extend_msno_dict
+
+CHUNK = 97   # 유저/날짜 경계와 맞지 않는 작은 청크
+
+
+def to_date(yyyymmdd):
+    return pd.to_datetime(yyyymmdd.astype(str), format="%Y%m%d")
+
+
+@pytest.fixture(scope="module")
+def msno_dict(raw_frames):
+    return extend_msno_dict(pd.Index([], dtype=object, name="msno"), raw_frames["train"]["msno"])
+
+
+def by_msno(agg, msno_dict):
+    agg = agg.copy()
+    agg.index = pd.Index(decode_msno(agg.index.to_numpy(), msno_dict), name="msno")
+    return agg.sort_index()
+
+
+def test_streamed_txn_matches_pandas_txn_agg(raw_frames, raw_dir, msno_dict):
+    txn = raw_frames["transactions"]
+    txn = txn[txn["msno"].isin(raw_frames["train"]["msno"])]
+    txn = txn.assign(membership_duration=(
+        to_date(txn["membership_expire_date"]) - to_date(txn["transaction_date"])).dt.days)
+    expected = txn.groupby("msno").agg(
+        txn_cnt=("transaction_date", "count"),
+        total_paid=("actual_amount_paid", "sum"),
+        avg_paid=("actual_amount_paid", "mean"),
+        avg_plan_days=("payment_plan_days", "mean"),
+        auto_renew_rate=("is_auto_renew", "mean"),
+        cancel_rate=("is_cancel", "mean"),
+        total_cancel=("is_cancel", "sum"),
+        avg_duration=("membership_duration", "mean"),
+        max_duration=("membership_duration", "max"),
+    )
+
+    txn_state, _ = stream_transactions(raw_dir / TXN_FILE, msno_dict, chunk_size=CHUNK)
+    result = by_msno(finalize_txn(txn_state), msno_dict)
+
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_streamed_logs_match_pandas_log_agg(raw_frames, raw_dir, msno_dict):
+    logs = raw_frames["user_logs"]
+    logs = logs[logs["msno"].isin(raw_frames["train"]["msno"])]
+    expected = logs.groupby("msno").agg(
+        total_secs_sum=("total_secs", "sum"),
+        total_secs_mean=("total_secs", "mean"),
+        num_unq_mean=("num_unq", "mean"),
+        num_100_sum=("num_100", "sum"),
+        num_985_sum=("num_985", "sum"),
+        num_75_sum=("num_75", "sum"),
+        num_50_sum=("num_50", "sum"),
+        num_25_sum=("num_25", "sum"),
+    )
+    # 최근 윈도우: 기준일(마지막 로그 날짜)로부터 0 ~ w-1일 전 로그
+    as_of_date = to_date(logs["date"]).max()
+    days_ago = (as_of_date - to_date(logs["date"])).dt.days
+    for w in LOG_WINDOWS:
+        recent = logs[days_ago < w].groupby("msno")
+        window = pd.DataFrame({
+            "total_secs_sum": recent["total_secs"].sum(),
+            "total_secs_mean": recent["total_secs"].mean(),
+            "num_unq_mean": recent["num_unq"].mean(),
+            **{f"{c}_sum": recent[c].sum() for c in ["num_100", "num_985", "num_75", "num_50", "num_25"]},
+        })
+        window = window.reindex(expected.index).fillna(0)
+        window.columns = [f"{c}_{w}d" for c in window.columns]
+        expected = expected.join(window)
+    expected[RECENCY_COL] = days_ago.groupby(logs["msno"]).min().clip(upper=RECENCY_CAP)
+
+    as_of = int((as_of_date - pd.Timestamp("1970-01-01")).days)
+    log_state, daily = stream_logs(raw_dir / LOG_FILE, msno_dict, daily_min_day(as_of), chunk_size=CHUNK)
+    result = by_msno(finalize_log(log_state, daily, as_of), msno_dict)
+    result[RECENCY_COL] = result[RECENCY_COL].fillna(RECENCY_CAP)
+
+    pd.testing.assert_frame_equal(result[expected.columns], expected, check_dtype=False, check_names=False)
+
+
+def test_chunked_build_matches_single_chunk(raw_dir, built, tmp_path):
+    whole = build_features(raw_dir, tmp_path / "kkbox.parquet", tmp_path / "state", chunk_size=1_000_000)
+    pd.testing.assert_frame_equal(built, whole)
+
+
+def test_incremental_update_matches_full_rebuild(raw_frames, tmp_path):
+    txn, logs = raw_frames["transactions"], raw_frames["user_logs"]
+    # 새 파일 = 기존 파일 이후 날짜의 결제/로그 (일별 증분과 같은 가정)
+    txn_cut = int(np.percentile(txn["transaction_date"], 80))
+    log_cut = 20170320
+    base_dir = write_raw(tmp_path / "base_raw", raw_frames,
+                         transactions=txn[txn["transaction_date"] <= txn_cut],
+                         user_logs=logs[logs["date"] <= log_cut])
+    new_txn, new_logs = tmp_path / "txn_new.csv", tmp_path / "logs_new.csv"
+    txn[txn["transaction_date"] > txn_cut].to_csv(new_txn, index=False)
+    logs[logs["date"] > log_cut].to_csv(new_logs, index=False)
+
+    base_out, base_state = tmp_path / "base.parquet", tmp_path / "base_state"
+    build_features(base_dir, base_out, base_state, chunk_size=CHUNK)
+    update_features([new_logs], [new_txn], base_out, base_state, chunk_size=CHUNK)
+
+    # 전체 재빌드는 같은 imputer를 사용 (증분 업데이트는 imputer를 다시 학습하지 않음)
+    full_dir = write_raw(tmp_path / "full_raw", raw_frames,
+                         transactions=pd.concat([txn[txn["transaction_date"] <= txn_cut],
+                                                 txn[txn["transaction_date"] > txn_cut]]),
+                         user_logs=pd.concat([logs[logs["date"] <= log_cut], logs[logs["date"] > log_cut]]))
+    full_out, full_state = tmp_path / "full.parquet", tmp_path / "full_state"
+    full_state.mkdir()
+    shutil.copy(base_state / IMPUTER_FILE, full_state / IMPUTER_FILE)
+    build_features(full_dir, full_out, full_state, chunk_size=CHUNK)
+
+    pd.testing.assert_frame_equal(pd.read_parquet(base_out), pd.read_parquet(full_out))
+
+
+def test_finalize_features_keeps_notebook_category_labels(built):
+    assert set(built["city"].cat.categories) <= {"1.0", "4.0", "5.0", "13.0", "22.0", "unknown"}
+    assert "unknown" in built["city"].cat.categories
+    assert set(built["registered_via"].cat.categories) <= {"3.0", "4.0", "7.0", "9.0", "unknown"}
+    assert "city_13.0" in pd.get_dummies(built[["city"]]).columns
+
+    df = finalize_features(pd.DataFrame({
+        "city": [7.0, np.nan], "gender": ["male", np.nan], "registered_via": [9.0, 9.0],
+        "bd": [25.0, 300.0], "registration_init_time": [20150101.0, 20150101.0],
+        **{c: [np.nan, np.nan] for c in ["last_plan_days", "last_paid", "last_auto_renew", "last_cancel",
+                                         "days_to_expire", "renewal_gap_mean", "renewal_gap_max",
+                                         "plan_change_cnt"]},
+        **{c: [1.0, np.nan] for c in built.columns if c.startswith(("total_secs", "num_"))},
+        RECENCY_COL: [3.0, np.nan],
+    }))
+    assert list(df["city"]) == ["7.0", "unknown"]
+    assert list(df["age_group"]) == ["20s", "unknown"]
+    assert list(df["no_log_flag"]) == [0, 1]
@@ -0,0 +1,72 @@
+"""
+feature_transformer.py / tree_predictor.py - 학습된 변환기와 펼친 트리 예측기가
+원래 경로(preprocess_for_modeling, XGBClassifier.predict_proba)와 같은 값을 내는지 확인합니다.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+xgboost = pytest.importorskip("xgboost")
+
+from src.feature_transformer import FeatureTransformer
+from src.preprocessing import preprocess_for_modeling
+from src.tree_predictor import FlatTreeEnsemble, fast_predictor
+
+
+def as_float_matrix(X):
+    """preprocess_for_modeling 출력 → float32 행렬 (native 범주형은 코드, 결측은 NaN)"""
+    X = X.copy()
+    for col in X.select_dtypes(include="category").columns:
+        X[col] = X[col].cat.codes.where(X[col].cat.codes >= 0)
+    return X.to_numpy(dtype=np.float32)
+
+
+def input_dict(row):
+    """parquet 한 행 → predict_churn 입력과 같은 dict (범주형은 원본 문자열)"""
+    return {k: (v if isinstance(v, str) else float(v)) for k, v in row.items() if k not in ("msno", "is_churn")}
+
+
+@pytest.mark.parametrize("encode", [True, False])
+def test_transform_batch_matches_preprocess_for_modeling(built, encode):
+    X, _ = preprocess_for_modeling(built, encode_categoricals=encode)
+    transformer = FeatureTransformer(encode_categoricals=encode).fit(built)
+
+    out = transformer.transform_batch(built)
+
+    assert transformer.feature_names == list(X.columns)
+    np.testing.assert_allclose(out, as_float_matrix(X), rtol=1e-6)
+
+
+@pytest.mark.parametrize("encode", [True, False])
+def test_transform_one_matches_transform_batch(built, encode):
+    transformer = FeatureTransformer(encode_categoricals=encode).fit(built)
+    batch = transformer.transform_batch(built)
+
+    for i in range(0, len(built), 7):
+        x = transformer.transform_one(input_dict(built.iloc[i]))
+        np.testing.assert_allclose(x[0], batch[i], rtol=1e-5)
+
+
+@pytest.mark.parametrize("encode", [True, False])
+def test_flat_tree_predictor_matches_xgboost(built, encode):
+    X, y = preprocess_for_modeling(built, encode_categoricals=encode)
+    model = xgboost.XGBClassifier(
+        n_estimators=40, max_depth=4, learning_rate=0.3, min_child_weight=0, tree_method="hist",
+        enable_categorical=not encode, early_stopping_rounds=10, eval_metric="logloss", n_jobs=1,
+    )
+    model.fit(X, y, eval_set=[(X, y)], verbose=False)
+
+    predictor = fast_predictor(model)
+    assert isinstance(predictor, FlatTreeEnsemble)
+
+    # 수치형 일부를 결측으로 바꿔 결측 방향(default_left)까지 확인
+    numeric = X.select_dtypes(include="number").columns
+    X_missing = X.copy()
+    X_missing.loc[X.index[::3], numeric[::2]] = np.nan
+    for frame in (X, X_missing):
+        expected = model.predict_proba(frame)
+        assert expected[:, 1].std() > 0
+        np.testing.assert_allclose(predictor.predict_proba(as_float_matrix(frame)), expected, atol=1e-6)
+        # 1행 입력 (predict_churn 경로)
+        np.testing.assert_allclose(predictor.predict_proba(as_float_matrix(frame.iloc[:1])), expected[:1],
+                                   atol=1e-6)